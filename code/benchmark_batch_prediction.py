@@ -0,0 +1,134 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file benchmarks the prediction throughput of the station models
+#       (rows predicted per second) for blocks of 1, 100 and 10000 rows, where
+#       each row is tagged with a random station model. It compares:
+#
+#       sklearn: `RandomForestRegressor.predict()` once per station in block.
+#       compact: `CompactForest.predict()` once per station in block.
+#       batch: `ForestBatchEvaluator.predict()` once for the complete block.
+#
+#       Refer "utilities/compact_forest.py". The rows are sampled from the
+#       stations' training data, and the maximum absolute difference of the
+#       compact and batch predictions from sklearn's is printed too.
+#
+#       To run this file execute:
+#       python benchmark_batch_prediction.py rfr 1
+#
+#       where "1" can be <1|2|3|4|5> as per the value of n in n-previous-station
+#       models. The compact models are exported in memory from the *.sav models,
+#       "export_compact_models.py" need not be executed first.
+#
+
+import joblib
+import numpy as np
+import sys
+import time
+
+from collections import OrderedDict
+
+from utilities.compact_forest import (CompactForest, ForestBatchEvaluator,
+    get_compact_forest_bytes)
+from utilities.tt_utils import TrainingTestUtils as TTU
+
+BLOCK_SIZES = [1, 100, 10000]
+MIN_BENCHMARK_SECS = 2.0 # Each block size is predicted at least this long.
+
+def get_station_rows_dict(ttu, stns, n):
+  """
+  Returns an ordered dict of station vs its training rows (2D numpy array) to
+  be predicted by its n previous station model.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    stns <[string]>: Station codes.
+    n <int>: n in n-previous-station models.
+  """
+  stn_rows_dict = OrderedDict()
+  for s in stns:
+    df = ttu._cdr.get_n_prev_station_csv_df(s, "training", n)
+    df = ttu._get_labenc_station_df(df, n)
+    df.pop("crnt_stn_late_mins")
+    df = ttu.remove_unwanted_columns_df(df, n)
+    if not df.empty:
+      stn_rows_dict[s] = df.values.astype(np.float64)
+  return stn_rows_dict
+
+def get_block_tuple(stn_rows_dict, block_size, random_state):
+  """
+  Returns a tuple of (rows 2D numpy array, list of their stations) of a block
+  of rows sampled from random stations.
+
+  Args:
+    stn_rows_dict <dict>: Refer `get_station_rows_dict()`.
+    block_size <int>: Number of rows in the block.
+    random_state <numpy.random.RandomState>: Random number generator.
+  """
+  stns = list(stn_rows_dict.keys())
+  block_stns = [stns[i] for i in random_state.randint(len(stns),
+                                                      size=block_size)]
+  rows = np.vstack([stn_rows_dict[s][random_state.randint(
+      stn_rows_dict[s].shape[0])] for s in block_stns])
+  return rows, block_stns
+
+def predict_per_station(models, rows, block_stns):
+  """
+  Returns the predictions of the block's rows by one `predict()` call of each
+  station's model on its rows.
+
+  Args:
+    models <dict>: Station vs its model having `predict()`.
+    rows <numpy.ndarray>: The rows of block.
+    block_stns <[string]>: Station of each row.
+  """
+  block_stns = np.array(block_stns)
+  predictions = np.empty(rows.shape[0])
+  for s in np.unique(block_stns):
+    mask = block_stns == s
+    predictions[mask] = models[s].predict(rows[mask])
+  return predictions
+
+def get_rows_per_sec(predict_func):
+  """
+  Returns the rows predicted per second by the function, calling it repeatedly
+  for at least MIN_BENCHMARK_SECS, along with its predictions.
+
+  Args:
+    predict_func <function>: Function which predicts a block and returns the
+                             tuple of (number of rows, predictions).
+  """
+  num_rows, num_calls, start_time = 0, 0, time.time()
+  while num_calls == 0 or time.time() - start_time < MIN_BENCHMARK_SECS:
+    block_rows, predictions = predict_func()
+    num_rows, num_calls = num_rows + block_rows, num_calls + 1
+  return num_rows / (time.time() - start_time), predictions
+
+if __name__ == "__main__":
+  mdl = sys.argv[1]
+  n = int(sys.argv[2])
+  ttu = TTU()
+  stns = ttu._pdr.get_stations_having_nps_model_list(n)
+  stn_rows_dict = get_station_rows_dict(ttu, stns, n)
+  sklearn_models = dict((s, joblib.load(ttu._get_station_model_file_path(
+      s, n, mdl))) for s in stn_rows_dict)
+  compact_models = dict((s, CompactForest(get_compact_forest_bytes(model)))
+                        for s, model in sklearn_models.items())
+  evaluator = ForestBatchEvaluator(compact_models)
+
+  print "Stations: ", len(stn_rows_dict)
+  print "block_size sklearn compact batch compact_diff batch_diff (rows/sec)"
+  for block_size in BLOCK_SIZES:
+    rows, block_stns = get_block_tuple(stn_rows_dict, block_size,
+                                       np.random.RandomState(block_size))
+    sklearn_rps, sklearn_preds = get_rows_per_sec(lambda: (
+        block_size, predict_per_station(sklearn_models, rows, block_stns)))
+    compact_rps, compact_preds = get_rows_per_sec(lambda: (
+        block_size, predict_per_station(compact_models, rows, block_stns)))
+    batch_rps, batch_preds = get_rows_per_sec(lambda: (
+        block_size, evaluator.predict(rows, block_stns)))
+    print block_size, sklearn_rps, compact_rps, batch_rps, (
+        np.abs(compact_preds - sklearn_preds).max()), (
+        np.abs(batch_preds - sklearn_preds).max())
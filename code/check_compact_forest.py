@@ -0,0 +1,180 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file checks the compact models ("utilities/compact_forest.py") and
+#       the model archive ("utilities/model_archive.py") against small synthetic
+#       sklearn forests, i.e. without any trained station models. It checks the
+#       predictions of CompactForest and ForestBatchEvaluator (forests with
+#       different number of trees and features, a forest of single leaf trees,
+#       max_trees), and the round trips through `write_compact_forest()` and
+#       ModelArchive ("sav" and "compact" variants).
+#
+#       To run this file execute:
+#       python check_compact_forest.py
+#
+#       Prints each check done and raises AssertionError on the first failure.
+#
+
+import joblib
+import numpy as np
+import os
+import shutil
+import tempfile
+
+from sklearn.ensemble import RandomForestRegressor
+
+from utilities.compact_forest import (CompactForest, ForestBatchEvaluator,
+                                      get_compact_forest_bytes,
+                                      load_compact_forest,
+                                      write_compact_forest)
+from utilities.model_archive import ModelArchive, write_model_archive
+
+# Relative tolerance of the compact predictions, whose leaf values are float32.
+RTOL = 1e-5
+
+def get_synthetic_forest(n_trees, n_features, constant=False, seed=0):
+  """
+  Returns a RandomForestRegressor trained on random rows.
+
+  Args:
+    n_trees <int>: Number of trees.
+    n_features <int>: Number of features.
+    constant <bool>: If True, the target is constant hence each tree is a
+                     single leaf.
+    seed <int>: Seed of the random rows.
+  """
+  rng = np.random.RandomState(seed)
+  X = rng.uniform(-50, 50, (300, n_features)).astype(np.float32)
+  y = (np.full(300, 7.5) if constant else
+       X[:, 0] * 2 + np.sin(X[:, -1]) * 10 + rng.normal(0, 1, 300))
+  return RandomForestRegressor(n_estimators=n_trees, max_depth=8,
+                               random_state=seed).fit(X, y)
+
+def get_sklearn_predictions_array(model, X, max_trees=None):
+  """
+  Returns the mean of predictions of the first max_trees trees of the model.
+
+  Args:
+    model <RandomForestRegressor()>: A trained sklearn forest.
+    X <numpy.ndarray>: The rows to be predicted.
+    max_trees <int>: Number of trees, default all.
+  """
+  return np.mean([tree.predict(X) for tree in model.estimators_[:max_trees]],
+                 axis=0)
+
+def assert_close(expected, actual, what):
+  """
+  Raises AssertionError if the predictions differ by more than RTOL.
+
+  Args:
+    expected <numpy.ndarray>: Predictions of sklearn.
+    actual <numpy.ndarray>: Predictions of the compact models.
+    what <string>: Description of the check.
+  """
+  assert np.allclose(expected, actual, rtol=RTOL, atol=RTOL), (
+      "%s: max abs diff %s" % (what, np.abs(expected - actual).max()))
+  print "OK:", what
+
+def check_compact_forest(models, X):
+  """
+  Checks CompactForest predictions of each model with all and fewer trees.
+
+  Args:
+    models <dict>: Key vs RandomForestRegressor().
+    X <numpy.ndarray>: The rows to be predicted, having maximum features.
+  """
+  for key, model in models.items():
+    X_model = X[:, :model.n_features_]
+    forest = CompactForest(get_compact_forest_bytes(model))
+    assert forest.get_num_trees() == len(model.estimators_)
+    assert_close(model.predict(X_model), forest.predict(X_model),
+                 "CompactForest %s" % key)
+    for max_trees in [1, 2, len(model.estimators_) + 3]:
+      assert_close(get_sklearn_predictions_array(model, X_model, max_trees),
+                   forest.predict(X_model, max_trees),
+                   "CompactForest %s max_trees=%s" % (key, max_trees))
+
+def check_forest_batch_evaluator(models, X):
+  """
+  Checks ForestBatchEvaluator predictions of rows of all the models mixed.
+
+  Args:
+    models <dict>: Key vs RandomForestRegressor().
+    X <numpy.ndarray>: The rows to be predicted, having maximum features.
+  """
+  evaluator = ForestBatchEvaluator(dict(
+      (key, CompactForest(get_compact_forest_bytes(model)))
+      for key, model in models.items()))
+  assert sorted(evaluator.get_keys_list()) == sorted(models.keys())
+  keys = [sorted(models.keys())[i % len(models)] for i in range(X.shape[0])]
+  for max_trees in [None, 1, 2, 100]:
+    expected = np.empty(X.shape[0])
+    for key, model in models.items():
+      rows = np.array([k == key for k in keys])
+      expected[rows] = get_sklearn_predictions_array(
+          model, X[rows, :model.n_features_], max_trees)
+    assert_close(expected, evaluator.predict(X, keys, max_trees),
+                 "ForestBatchEvaluator max_trees=%s" % max_trees)
+  assert evaluator.predict(X[:0], []).size == 0
+  print "OK: ForestBatchEvaluator no rows"
+
+def check_round_trips(models, X, tmp_dir):
+  """
+  Checks the predictions of the models written to compact files and to "sav"
+  and "compact" model archives, and read back.
+
+  Args:
+    models <dict>: Key vs RandomForestRegressor().
+    X <numpy.ndarray>: The rows to be predicted, having maximum features.
+    tmp_dir <string>: Directory to write the files in.
+  """
+  cf_files, sav_files = [], []
+  for key, model in sorted(models.items()):
+    cf_path = os.path.join(tmp_dir, key + ".cf")
+    sav_path = os.path.join(tmp_dir, key + ".sav")
+    nbytes = write_compact_forest(model, cf_path)
+    assert nbytes == os.path.getsize(cf_path)
+    joblib.dump(model, sav_path)
+    cf_files.append((key, cf_path))
+    sav_files.append((key, sav_path))
+    X_model = X[:, :model.n_features_]
+    forest = load_compact_forest(cf_path)
+    assert forest.get_nbytes() == nbytes
+    assert_close(model.predict(X_model), forest.predict(X_model),
+                 "write_compact_forest %s" % key)
+
+  for variant, files in [("compact", cf_files), ("sav", sav_files)]:
+    archive_path = os.path.join(tmp_dir, "models_%s.pack" % variant)
+    write_model_archive(files, variant, archive_path)
+    archive = ModelArchive(archive_path)
+    assert archive.get_variant() == variant
+    assert archive.get_stations_list() == [key for key, _ in files]
+    assert archive.get_corrupt_stations_list() == []
+    for key, file_path in files:
+      assert archive.get_model_length(key) == os.path.getsize(file_path)
+      X_model = X[:, :models[key].n_features_]
+      assert_close(models[key].predict(X_model),
+                   archive.load_model(key).predict(X_model),
+                   "ModelArchive %s %s" % (variant, key))
+
+if __name__ == "__main__":
+  # Forests with different number of trees and features, and a forest whose
+  # trees are single leaves.
+  models = {"S01": get_synthetic_forest(3, 4, seed=1),
+            "S02": get_synthetic_forest(7, 4, seed=2),
+            "S03": get_synthetic_forest(5, 3, seed=3),
+            "S04": get_synthetic_forest(2, 4, constant=True, seed=4)}
+  assert all(tree.tree_.node_count == 1
+             for tree in models["S04"].estimators_)
+  X = np.random.RandomState(0).uniform(-60, 60, (500, 4)).astype(np.float32)
+
+  check_compact_forest(models, X)
+  check_forest_batch_evaluator(models, X)
+  tmp_dir = tempfile.mkdtemp()
+  try:
+    check_round_trips(models, X, tmp_dir)
+  finally:
+    shutil.rmtree(tmp_dir)
+  print "All checks passed."
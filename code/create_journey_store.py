@@ -0,0 +1,56 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file converts the csv data files of trains' journeys (and the
+#       station training data frames, if created) to the columnar journey store
+#       in "data/journey_store/" directory. Refer "readers/journey_store_reader.py"
+#       for the store format.
+#
+#       To run this file execute:
+#
+#       python create_journey_store.py
+#
+#       Once converted, create the CSVDataReader with backend="store" to read
+#       from the journey store. Re-run this file whenever the csv files change,
+#       since changed csv files are read as csv till then.
+#
+
+from utilities.env import data_path
+
+import glob
+import os
+import pandas as pd
+
+from readers.journey_store_reader import write_journey_store
+
+# Directories (relative to data directory) of csv files of trains' journeys.
+TRAINS_CSV_DIRS = ["52_known_trains_training_folder",
+                   "52_known_trains_cross_validation_folder",
+                   "52_known_trains_known_test_folder",
+                   "83_unknown_trains_unknown_test_folder",
+                   "csv_Mar16_Feb18_all_trains_135_months_weekdays"]
+
+def convert_csv_dir_to_journey_store(csv_rel_dir):
+  """
+  Converts all the csv files in the directory to the journey store.
+
+  Args:
+    csv_rel_dir <string>: Directory of csv files relative to data directory.
+  """
+  csv_paths = sorted(glob.glob(data_path+csv_rel_dir+"/*.csv"))
+  for csv_path in csv_paths:
+    df = pd.read_csv(csv_path)
+    csv_rel_path = csv_path[len(data_path):]
+    write_journey_store(df, data_path+"journey_store/"+csv_rel_path[:-4],
+                        csv_path)
+  print "Directory: ", csv_rel_dir, "Converted files: ", len(csv_paths)
+
+if __name__ == "__main__":
+  csv_rel_dirs = [d for d in TRAINS_CSV_DIRS if os.path.isdir(data_path+d)]
+  # Station training data frames e.g. "52tr_stations_training_data/1ps_..".
+  csv_rel_dirs.extend(sorted(
+      d[len(data_path):] for d in glob.glob(data_path+"52tr_stations_*/*ps_*")))
+  for csv_rel_dir in csv_rel_dirs:
+    convert_csv_dir_to_journey_store(csv_rel_dir)
@@ -0,0 +1,112 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file packs the station models of a (mdl, n, variant) into a single
+#       archive (refer "utilities/model_archive.py"), and verifies an archive.
+#
+#       To build the archive of 1ps RFR sklearn models, execute:
+#       python create_model_archive.py build rfr 1 sav
+#
+#       It packs all the "models/rfr_models/1ps_rfr_labenc_models/
+#       *_label_encoding_model.sav" files into "models/rfr_models/
+#       1ps_rfr_labenc_models.sav.pack". Similarly "compact" in place of "sav"
+#       packs the compact models (*.cf) created by "export_compact_models.py".
+#       The models are then loaded from the archive (for the stations in it)
+#       by `TrainingTestUtils`, re-run the build after retraining the models.
+#
+#       To verify the archive (checksums of all models, the archived bytes of
+#       each model against its file if present, and the model files newer than
+#       the archive, which are loaded instead of the stale archived models),
+#       execute:
+#       python create_model_archive.py verify rfr 1 sav
+#
+
+import os
+import sys
+
+from utilities.model_archive import ModelArchive, write_model_archive
+from utilities.tt_utils import TrainingTestUtils as TTU
+
+MODEL_FILE_SUFFIX = "_label_encoding_model."
+
+def get_station_files_list(ttu, mdl, n, variant):
+  """
+  Returns a list of (station, model file path) of all the station models in
+  the directory of the mdl and n, in order of station codes.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    mdl <string>: <"rfr"|"lmr"|"nnr">
+    n <int>: n in n-previous-station models.
+    variant <string>: <"sav"|"compact">
+  """
+  models_dir = os.path.dirname(ttu._get_station_model_file_path("", n, mdl))
+  suffix = MODEL_FILE_SUFFIX + ("cf" if variant == "compact" else "sav")
+  return [(file_name[:-len(suffix)], os.path.join(models_dir, file_name))
+          for file_name in sorted(os.listdir(models_dir))
+          if file_name.endswith(suffix)]
+
+def build_model_archive(ttu, mdl, n, variant):
+  """
+  Builds the archive of the station models and prints its number of stations
+  and size (MB).
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    mdl <string>: <"rfr"|"lmr"|"nnr">
+    n <int>: n in n-previous-station models.
+    variant <string>: <"sav"|"compact">
+  """
+  station_files_list = get_station_files_list(ttu, mdl, n, variant)
+  archive_path = ttu._get_station_models_archive_path(n, mdl, variant)
+  nbytes = write_model_archive(station_files_list, variant, archive_path)
+  print "Archived: ", archive_path, len(station_files_list), nbytes / 1024.0**2
+
+def verify_model_archive(ttu, mdl, n, variant):
+  """
+  Verifies the archive of the station models, prints the corrupt stations, the
+  stations whose model files differ from (or are missing in) the archive, and
+  the stations whose model files (or "sav" model files, of compact models) are
+  newer than the archive. Returns True if the archive is verified.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    mdl <string>: <"rfr"|"lmr"|"nnr">
+    n <int>: n in n-previous-station models.
+    variant <string>: <"sav"|"compact">
+  """
+  archive = ModelArchive(ttu._get_station_models_archive_path(n, mdl, variant))
+  corrupt_stations = archive.get_corrupt_stations_list()
+  stale_stations = []
+  newer_stations = [station for station in archive.get_stations_list()
+                    if archive.is_station_stale(station,
+                        ttu._get_station_model_file_path(station, n, mdl,
+                                                         variant)) or
+                    archive.is_station_stale(station,
+                        ttu._get_station_model_file_path(station, n, mdl))]
+  for station, file_path in get_station_files_list(ttu, mdl, n, variant):
+    if not archive.has_station(station):
+      stale_stations.append(station)
+      continue
+    if station in corrupt_stations:
+      continue
+    with open(file_path, "rb") as f:
+      if f.read() != archive._get_model_bytes(station):
+        stale_stations.append(station)
+
+  print "Stations: ", len(archive.get_stations_list())
+  print "Corrupt stations: ", corrupt_stations
+  print "Stations whose model files differ from archive: ", stale_stations
+  print "Stations whose model files are newer than archive: ", newer_stations
+  return not corrupt_stations and not stale_stations and not newer_stations
+
+if __name__ == "__main__":
+  action, mdl, n, variant = (sys.argv[1], sys.argv[2], int(sys.argv[3]),
+                             sys.argv[4])
+  ttu = TTU()
+  if action == "build":
+    build_model_archive(ttu, mdl, n, variant)
+  elif not verify_model_archive(ttu, mdl, n, variant):
+    sys.exit(1)
@@ -8,12 +8,30 @@
 #       repo. Make sure you have create "pickle_data" folder under "data"
 #       directory.
 #
+#       To precompute the nearest neighbors (Known Stations) of all the stations
+#       for each n-prev-station models, after training the models, execute:
+#
+#       `python create_pickle_data.py nearest_neighbors 10 1,2,3,4,5`
+#
+#       where 10 is the number of nearest neighbors and 1,2,3,4,5 (optional,
+#       default) are the n of n-prev-station models. The n whose models are not
+#       trained (i.e. "stations_having_<n>ps_models.p" is absent) are skipped.
+#
+#       To save the station registry (station IDs and numpy arrays of station
+#       features), execute:
+#
+#       `python create_pickle_data.py station_registry`
+#
 
 import numpy as np
+import os
 import pandas as pd
 import pickle
+import sys
 
+from readers.station_registry import write_station_registry
 from utilities.df_utils import TrainDataFrameUtils as TDFU
+from utilities.tt_utils import TrainingTestUtils as TTU
 
 class CreatePickleData(object):
   def __init__(self):
@@ -68,7 +86,64 @@ class CreatePickleData(object):
     print "135 Trains inline stations dict dumped in pickle_data directory"
     print "-" * 80
 
+  def create_stations_nearest_neighbors_pickle(self, nn, nps_list=range(1, 6)):
+    """
+    Creates a dict of nps vs a dict of station vs its nn nearest neighbors among
+    the Known Stations having nps models, for all the stations of 135 trains.
+    It is used to look up the nearest Known Station of an Unknown Station,
+    hence create it after training the n-prev-station models.
+
+    Args:
+      nn <int>: Number of nearest neighbors.
+      nps_list <[int]>: List of n in n-prev-station models, the ones not having
+                        "stations_having_<n>ps_models.p" are skipped.
+    """
+    ttu = TTU()
+    reg = ttu._stn_registry
+    stations = np.array(self._pdr.get_all_135trains_stations())
+    stn_ids = reg.get_station_ids_array(stations)
+    stations = stations[stn_ids >= 0]
+    stn_ids = stn_ids[stn_ids >= 0]
+    # Choose the stations having all the features.
+    stations = stations[reg.get_array("has_coordinates")[stn_ids] &
+                        reg.get_array("has_deg")[stn_ids] &
+                        reg.get_array("has_tfc")[stn_ids]].tolist()
+    stns_nearest_neighbors = {}
+    for nps in nps_list:
+      if not os.path.exists(
+          self._pdr._pdpath+"stations_having_"+str(nps)+"ps_models.p"):
+        print "No %s-prev-station models trained, skipping them" % nps
+        continue
+      stns_nearest_neighbors[nps] = ttu.get_stations_nearest_neighbors_dict(
+          stations, nps, nn)
+      print "Nearest neighbors of stations for %s-prev-station models done" % nps
+
+    pickle.dump(stns_nearest_neighbors, open(
+        self._pdr._pdpath+"stations_"+str(nn)+"_nearest_neighbors_dict.p", "wb"))
+    print ("Stations %s nearest neighbors dict dumped in pickle_data directory."
+           " Number of stations: %s" % (nn, len(stations)))
+    print "-" * 80
+
+  def create_station_registry(self):
+    """
+    Creates the station registry i.e. station IDs and numpy arrays of station
+    coordinates, strengths and labels, from the station pickle dicts. Refer
+    "readers/station_registry.py".
+    """
+    num_stations = write_station_registry(
+        self._pdr, self._pdr._pdpath+"station_registry/")
+    print ("Station registry dumped in pickle_data/station_registry directory."
+           " Number of stations: %s" % num_stations)
+    print "-" * 80
+
 if __name__ == "__main__":
   ob = CreatePickleData()
-  ob.create_52trains_unique_stations_pickle()
-  ob.create_135trains_unique_stations_pickle()
+  if len(sys.argv) > 1 and sys.argv[1] == "nearest_neighbors":
+    nps_list = ([int(nps) for nps in sys.argv[3].split(",")]
+                if len(sys.argv) > 3 else range(1, 6))
+    ob.create_stations_nearest_neighbors_pickle(int(sys.argv[2]), nps_list)
+  elif len(sys.argv) > 1 and sys.argv[1] == "station_registry":
+    ob.create_station_registry()
+  else:
+    ob.create_52trains_unique_stations_pickle()
+    ob.create_135trains_unique_stations_pickle()
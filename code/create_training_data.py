@@ -20,6 +20,22 @@
 #       It creates data frames of "training" setting for a current station with
 #       3 previous stations.
 #
+#       To create the data frames for all the values of n <1|2|3|4|5> in a
+#       single run, execute:
+#
+#       python create_training_data.py training all
+#
+#       Each Known Train's journeys are scanned only once and every (station, n)
+#       feature row found in that scan is routed to its station data frame,
+#       instead of scanning all the trains once for every station.
+#
+#       With "all", it also creates a wide data frame of each station in
+#       "data/52tr_stations_training_data/5ps_wide_training_data/", having the
+#       rows of all the values of n, where the features of ith previous station
+#       are empty for the rows having less than i previous stations. All the
+#       n-prev-station models of a station are trained from it in one run by
+#       `python rfr_stn_models_training_file.py all`.
+#
 #       This file also has a function to generate the known 596 stations
 #       features data frame.
 #       Station Features DF: ["Station", "latitude", "longitude",
@@ -36,6 +52,48 @@ from joblib import Parallel, delayed
 
 from utilities.df_utils import TrainDataFrameUtils as TDFU
 
+def get_station_feature_list(tdfu, train_num, sj_df, j, n):
+  """
+  Returns a list of features (a row in station data frame) of the station at
+  row index j in the single journey data frame, with n previous stations.
+
+  Args:
+    tdfu <TDFU()>: An object of TrainDataFrameUtils
+    train_num <string>: A five digit train number eg. "12307"
+    sj_df <pandas.DataFrame>: A single journey data frame.
+    j <int>: The row index of the current station in sj_df.
+    n <int>: Number of previous stations to the current station.
+  """
+  # train_type. zone. is_superfast, month, weekday
+  feature_list = [tdfu._generate_train_type_str(train_num),
+       tdfu._generate_zone_str(train_num),
+       tdfu._is_superfast_str(train_num),
+       tdfu._generate_month_str(sj_df, j),
+       tdfu._generate_weekday_str(sj_df, j)]
+  # n_prev_station
+  feature_list.extend(tdfu._generate_n_prev_station_codes_list(sj_df, j, n))
+  # n_ps_late_mins
+  feature_list.extend(tdfu._generate_n_prev_stn_late_mins_list(sj_df, j, n))
+  # dist_bwn_stn_n-1_n
+  feature_list.extend(tdfu._generate_n_prev_dist_bwn_stn_list(sj_df, j, n))
+  # stn_n_dist_frm_src
+  feature_list.extend(
+      tdfu._generate_n_prev_stn_dist_from_source_list(sj_df, j, n))
+  # tfc_of_stn_n
+  feature_list.extend(tdfu._generate_n_prev_stn_tfc_strength_list(sj_df, j, n))
+  # deg_of_stn_n
+  feature_list.extend(tdfu._generate_n_prev_stn_deg_strength_list(sj_df, j, n))
+  # crnt_stn_tfc, set n = 0
+  feature_list.extend(tdfu._generate_n_prev_stn_tfc_strength_list(sj_df, j, 0))
+  # crnt_stn_deg, set n = 0
+  feature_list.extend(tdfu._generate_n_prev_stn_deg_strength_list(sj_df, j, 0))
+  # crnt_stn_dist_frm_src, set n = 0
+  feature_list.extend(
+      tdfu._generate_n_prev_stn_dist_from_source_list(sj_df, j, 0))
+  # crnt_stn_late_mins, set n = 0
+  feature_list.extend(tdfu._generate_n_prev_stn_late_mins_list(sj_df, j, 0))
+  return feature_list
+
 def generate_known_current_station_df(
     tdfu, current_station, setting="complete_training", n=3):
   """
@@ -87,43 +145,8 @@ def generate_known_current_station_df(
         for j in range(n+source_rows[i], len(station_list)+source_rows[i]):
           station = station_list[j-source_rows[i]]
           if station == current_station:
-            # train_type. zone. is_superfast, month, weekday
-            feature_list = [tdfu._generate_train_type_str(train_num),
-                 tdfu._generate_zone_str(train_num),
-                 tdfu._is_superfast_str(train_num),
-                 tdfu._generate_month_str(sj_df, j),
-                 tdfu._generate_weekday_str(sj_df, j)]
-            # n_prev_station
-            feature_list.extend(
-                tdfu._generate_n_prev_station_codes_list(sj_df, j, n))
-            # n_ps_late_mins
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_late_mins_list(sj_df, j, n))
-            # dist_bwn_stn_n-1_n
-            feature_list.extend(
-                tdfu._generate_n_prev_dist_bwn_stn_list(sj_df, j, n))
-            # stn_n_dist_frm_src
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_dist_from_source_list(sj_df, j, n))
-            # tfc_of_stn_n
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_tfc_strength_list(sj_df, j, n))
-            # deg_of_stn_n
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_deg_strength_list(sj_df, j, n))
-            # crnt_stn_tfc, set n = 0
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_tfc_strength_list(sj_df, j, 0))
-            # crnt_stn_deg, set n = 0
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_deg_strength_list(sj_df, j, 0))
-            # crnt_stn_dist_frm_src, set n = 0
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_dist_from_source_list(sj_df, j, 0))
-            # crnt_stn_late_mins, set n = 0
-            feature_list.extend(
-                tdfu._generate_n_prev_stn_late_mins_list(sj_df, j, 0))
-
+            feature_list = get_station_feature_list(
+                tdfu, train_num, sj_df, j, n)
             station_df.append(feature_list)
 
   station_df = pd.DataFrame(station_df, columns = column_names_list)
@@ -133,6 +156,116 @@ def generate_known_current_station_df(
   print "Station: ", current_station, " Done!"
   return station_df
 
+def get_train_stations_df_dict(tdfu, train_num, setting, n_list, wide=False):
+  """
+  Returns a dict with keys as (n, station) and values as the data frame of
+  feature rows of that station with n previous stations, obtained from all the
+  journeys of the train. The train data frame is read only once for all the
+  values of n in n_list, and features of all the stations in a journey are
+  obtained at once by `generate_train_n_prev_stn_features_tuple()`. Returns
+  None if a wrong journey data frame is found.
+
+  Args:
+    tdfu <TDFU()>: An object of TrainDataFrameUtils
+    train_num <string>: A five digit train number eg. "12307"
+    setting <string>: <"training"|"cross_validation"|"complete_training">
+    n_list <[int]>: Values of n in n previous stations eg. [1, 2, 3, 4, 5]
+    wide <bool>: If True, the wide data frames of stations with maximum n in
+                 n_list are also obtained, with keys as ("wide", station).
+  """
+  train_df = tdfu._cdr.get_train_journey_df(train_num, setting)
+
+  # Get all the source station rows of each journey
+  source_rows = train_df[train_df.scharr=="Source"].index.tolist()
+  for i in range(len(source_rows)):
+    sj_df = tdfu._generate_single_journey_df(train_df, i, source_rows)
+    station_list = sj_df["station_code"].tolist() # Obtain the station list
+
+    # Check if the sj_df is wrong due to extended journey
+    if station_list != sj_df.station_code.unique().tolist():
+      print "Repeated stations found, Wrong DF, Check Train: ", train_num
+      print "Obtained stations: ", station_list
+      print "Actual stations: ", sj_df.station_code.unique().tolist()
+      return None
+
+  # Obtain the feature rows of all the current stations in all the journeys
+  # for each n, and route them to their station data frames.
+  stations_df_dict = {}
+  for n in n_list:
+    features_df, crnt_stns = tdfu.generate_train_n_prev_stn_features_tuple(
+        train_num, train_df, n)
+    for station, station_df in features_df.groupby(crnt_stns, sort=False):
+      stations_df_dict[(n, station)] = station_df
+  if wide:
+    features_df, crnt_stns = (
+        tdfu.generate_train_n_prev_stn_wide_features_tuple(
+            train_num, train_df, max(n_list)))
+    for station, station_df in features_df.groupby(crnt_stns, sort=False):
+      stations_df_dict[("wide", station)] = station_df
+  print "Train: ", train_num, " Done!"
+  return stations_df_dict
+
+def generate_all_known_stations_dfs(tdfu, setting="complete_training",
+                                    n_list=[1, 2, 3, 4, 5], wide=False,
+                                    trains=None, stations=None):
+  """
+  Creates the data frames of all the Known Stations for all the values of n in
+  n_list in a single pass over the journeys of Known Trains. The output data
+  frames are same as those created by `generate_known_current_station_df()`
+  for each station and each n. Returns False if a wrong journey data frame is
+  found, else True.
+
+  Args:
+    tdfu <TDFU()>: An object of TrainDataFrameUtils
+    setting <string>: <"training"|"cross_validation"|"complete_training">
+    n_list <[int]>: Values of n in n previous stations eg. [1, 2, 3, 4, 5]
+    wide <bool>: If True, the wide data frames of all the Known Stations (with
+                 maximum n in n_list) are also created in "<max n>ps_wide_
+                 <setting>_data" directory.
+    trains <[string]>: If passed, only these Known Trains are scanned. They must
+                       include all the Known Trains having the stations below.
+    stations <[string]>: If passed, only these Known Stations' data frames are
+                         created, e.g. by "incremental_training.py".
+  """
+  trains52 = tdfu._pdr.get_all_trains()[:52] # First 52 are Known Trains.
+  stns_of_52trains = tdfu._pdr.get_all_52trains_stations()
+  if trains is not None:
+    trains52 = [train_num for train_num in trains52 if train_num in trains]
+  if stations is not None:
+    stns_of_52trains = [stn for stn in stns_of_52trains if stn in stations]
+
+  # Scan the trains parallely, the per train outputs are kept in train order so
+  # that rows in station data frames are in the same order as before.
+  trains_stations_df_dicts = Parallel(n_jobs=-1)(
+      delayed(get_train_stations_df_dict)(tdfu, train_num, setting, n_list,
+                                          wide)
+      for train_num in trains52)
+  if None in trains_stations_df_dicts:
+    return False
+
+  # Key of station data frames in trains_stations_df_dicts vs the prefix of
+  # their output directory.
+  keys_dirs = [(n, str(n)+"ps_") for n in n_list]
+  if wide:
+    keys_dirs.append(("wide", str(max(n_list))+"ps_wide_"))
+
+  for key, dir_prefix in keys_dirs:
+    column_names_list = tdfu._get_column_names_list(
+        max(n_list) if key == "wide" else key)
+    for station in stns_of_52trains:
+      station_dfs = [stations_df_dict[(key, station)]
+                     for stations_df_dict in trains_stations_df_dicts
+                     if (key, station) in stations_df_dict]
+      if station_dfs:
+        station_df = pd.concat(station_dfs, ignore_index=True)
+      else:
+        station_df = pd.DataFrame([], columns=column_names_list)
+      station_df.to_csv((tdfu._cdr._cdpath + "52tr_stations_" + setting +
+                         "_data/" + dir_prefix + setting +
+                         "_data/Station_" + station + ".csv"), index=False)
+    print "All stations with n: ", key, " Done!"
+  return True
+
 def generate_known_stations_features_df(pdr):
   """
   This function generates known stations features data frame helpful in
@@ -157,14 +290,21 @@ def generate_known_stations_features_df(pdr):
 
 if __name__ == '__main__':
   setting = sys.argv[1]
-  n = int(sys.argv[2])
+  # Accept the n <1|2|3|4|5> or "all" to create data frames for all n at once.
+  n_list = ([1, 2, 3, 4, 5] if sys.argv[2] == "all" else [int(sys.argv[2])])
   tdfu = TDFU()
   pdr = tdfu._pdr
-  stns_of_52trains = pdr.get_all_52trains_stations() # Get all Known Stations.
 ################################################################################
-  # To create training or cross-validation data, runs parallely on 4 processors.
-  Parallel(n_jobs=-1)(delayed(generate_known_current_station_df)(tdfu, stn,
-      setting, n) for stn in stns_of_52trains)
+  # To create training or cross-validation data of all Known Stations in a
+  # single pass over the Known Trains, runs parallely on all processors.
+  generate_all_known_stations_dfs(tdfu, setting, n_list,
+                                  wide=(sys.argv[2] == "all"))
+################################################################################
+  # To create training or cross-validation data station by station (slower),
+  # uncomment the following lines.
+  # stns_of_52trains = pdr.get_all_52trains_stations() # Get Known Stations.
+  # Parallel(n_jobs=-1)(delayed(generate_known_current_station_df)(tdfu, stn,
+  #     setting, n_list[0]) for stn in stns_of_52trains)
 ################################################################################
   # To create stations' features data frame.
   # generate_known_stations_features_df(pdr)
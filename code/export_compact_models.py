@@ -0,0 +1,83 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file exports the trained RFR station models (*.sav) to the compact
+#       format (*.cf) of "utilities/compact_forest.py", saved alongside them in
+#       "models/<mdl>_models/<n>ps_<mdl>_labenc_models/".
+#
+#       To run this file execute:
+#       python export_compact_models.py rfr 1
+#
+#       where "1" can be <1|2|3|4|5> as per the value of n in n-previous-station
+#       models. To also verify that the compact models predict the same as the
+#       sklearn models on the stations' training data, execute:
+#       python export_compact_models.py rfr 1 verify
+#
+#       Prints the station, size of its sklearn and compact model (MB) and the
+#       maximum absolute difference of predictions (if verified). To predict
+#       with the compact models, set `station_model_format` to "compact" in
+#       "utilities/env.py".
+#
+
+import joblib
+import numpy as np
+import os
+import sys
+
+from utilities.compact_forest import load_compact_forest, write_compact_forest
+from utilities.tt_utils import TrainingTestUtils as TTU
+from utilities.training_pool import atomic_dump
+
+def get_max_abs_diff_of_predictions(ttu, s, n, model, compact_model):
+  """
+  Returns the maximum absolute difference of the predictions of the sklearn
+  and compact models on the station's training data.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    s <string>: The station code.
+    n <int>: n in n-previous-station models.
+    model <RandomForestRegressor()>: The sklearn model.
+    compact_model <CompactForest()>: The compact model.
+  """
+  df = ttu._cdr.get_n_prev_station_csv_df(s, "training", n)
+  df = ttu._get_labenc_station_df(df, n)
+  df.pop("crnt_stn_late_mins")
+  df = ttu.remove_unwanted_columns_df(df, n)
+  if df.empty:
+    return 0.0
+  return np.abs(model.predict(df) - compact_model.predict(df)).max()
+
+def export_compact_models(ttu, mdl, n, verify=False):
+  """
+  Exports the models of all the stations having n previous station models.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    mdl <string>: <"rfr">
+    n <int>: n in n-previous-station models.
+    verify <bool>: If True, verifies the predictions of compact models.
+  """
+  total_sav_bytes, total_cf_bytes = 0, 0
+  for s in ttu._pdr.get_stations_having_nps_model_list(n):
+    sav_path = ttu._get_station_model_file_path(s, n, mdl)
+    cf_path = ttu._get_station_model_file_path(s, n, mdl, "compact")
+    model = joblib.load(sav_path)
+    atomic_dump(write_compact_forest, model, cf_path)
+    sav_bytes, cf_bytes = os.path.getsize(sav_path), os.path.getsize(cf_path)
+    total_sav_bytes, total_cf_bytes = (total_sav_bytes + sav_bytes,
+                                       total_cf_bytes + cf_bytes)
+    line = "%s %.2f %.2f" % (s, sav_bytes / 1024.0**2, cf_bytes / 1024.0**2)
+    if verify:
+      line += " %s" % get_max_abs_diff_of_predictions(
+          ttu, s, n, model, load_compact_forest(cf_path))
+    print line
+  print "Total: ", total_sav_bytes / 1024.0**2, total_cf_bytes / 1024.0**2
+
+if __name__ == "__main__":
+  mdl = sys.argv[1]
+  n = int(sys.argv[2])
+  verify = len(sys.argv) > 3 and sys.argv[3] == "verify"
+  export_compact_models(TTU(), mdl, n, verify)
@@ -0,0 +1,377 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file retrains the RFR station models incrementally on a new data
+#       drop of Known Trains' running status in "data/52_known_trains_training_
+#       folder/". Instead of regenerating all the station data frames and
+#       refitting all the models:
+#
+#       1> The trains whose csv files have changed since the latest run are
+#          found by their content fingerprints (refer
+#          "utilities/training_manifest.py"), and only the data frames of their
+#          stations are regenerated (scanning only the trains having those
+#          stations).
+#       2> Only the stations whose data frame fingerprint differs from the one
+#          their model was fit on are refit. If the data frame only has new rows
+#          appended by the trains' new journeys, the existing forest is grown
+#          with new trees (warm_start) in proportion of the new rows, else (or
+#          if the forest would become too large) it is fit afresh.
+#       3> A report of what was regenerated or refit and why is printed and
+#          saved in "models/rfr_models/incremental_training_report.csv".
+#
+#       The compact models of the refit stations are re-exported (if exported
+#       earlier). The model archives are not rebuilt, the refit models (newer
+#       than the archive) are loaded from their files instead, rebuild them by
+#       "create_model_archive.py".
+#
+#       To run this file execute:
+#       python incremental_training.py train 1 [cores] [mem_gb]
+#
+#       where "1" can be <1|2|3|4|5|all> as the value of n in n-previous-station
+#       models, and cores and memory cap are same as in
+#       "rfr_stn_models_training_file.py".
+#
+#       The first run trains all the stations as nothing is fingerprinted yet.
+#       If the existing models are already trained on the current data, record
+#       their fingerprints instead by executing:
+#       python incremental_training.py record 1
+#
+
+import joblib
+import math
+import os
+import pandas as pd
+import sys
+
+from create_training_data import generate_all_known_stations_dfs
+from rfr_stn_models_training_file import N_ESTIMATORS, fit_station_model
+from utilities.tt_utils import TrainingTestUtils as TTU
+from utilities.training_manifest import (TrainingManifest,
+    get_file_fingerprint_dict, is_appended_fingerprint)
+from utilities.training_pool import (StationTrainingPool, atomic_dump,
+    get_station_memory_bytes, get_station_n_jobs, pickle_dump)
+
+SETTING = "training"
+# Maximum number of trees a forest is grown to, beyond it the forest is fit
+# afresh so that the old trees (fit on old rows only) do not dominate.
+MAX_TREES = 2 * N_ESTIMATORS
+
+def get_station_df_path(ttu, s, n):
+  """
+  Returns the path of the station's n previous station training data frame.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    s <string>: The station code.
+    n <int>: n in n-previous-station models.
+  """
+  return ttu._cdr._cdpath + ttu._cdr._get_n_prev_station_csv_rel_path(
+      s, SETTING, n, False)
+
+def get_station_model_path(ttu, s, n):
+  """
+  Returns the path of the station's n previous station RFR model.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    s <string>: The station code.
+    n <int>: n in n-previous-station models.
+  """
+  return (ttu._model_path + "rfr_models/" + str(n) + "ps_rfr_labenc_models/" +
+          s + "_label_encoding_model.sav")
+
+def get_trains_tuples_dict(ttu, manifest, n):
+  """
+  Returns a dict of Known Train vs tuple of (fingerprint of its current csv
+  file, stations in it, change since the latest regeneration of n previous
+  station data frames: None|"new"|"appended"|"rewritten"|"removed").
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    manifest <TrainingManifest()>: The training manifest.
+    n <int>: n in n-previous-station models.
+  """
+  trains_tuples = {}
+  for train_num in ttu._pdr.get_all_trains()[:52]: # First 52 are Known Trains.
+    csv_path = ttu._cdr._cdpath + ttu._cdr._get_train_csv_rel_path(
+        train_num, SETTING)
+    fingerprint = get_file_fingerprint_dict(csv_path)
+    recorded = manifest.get_train_tuple(n, train_num)
+    if recorded is not None and recorded[0] == fingerprint:
+      trains_tuples[train_num] = recorded + (None,)
+      continue
+
+    stations = []
+    if fingerprint is not None:
+      stations = sorted(set(ttu._cdr.get_train_journey_df(
+          train_num, SETTING, ["station_code"])["station_code"]))
+    if recorded is None:
+      change = "new" if fingerprint is not None else None
+    elif fingerprint is None:
+      change = "removed"
+    elif is_appended_fingerprint(recorded[0], fingerprint, csv_path):
+      change = "appended"
+    else:
+      change = "rewritten"
+    trains_tuples[train_num] = (fingerprint, stations, change)
+  return trains_tuples
+
+def regenerate_changed_stations_dfs(ttu, manifest, n_list):
+  """
+  Regenerates the n previous station data frames (for n in n_list) of the
+  stations of changed Known Trains. Returns a tuple of (dict of station vs list
+  of (train, change) which caused its regeneration, dict of (n, station) vs
+  fingerprint of its data frame before regeneration), None if a wrong journey
+  data frame is found.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    manifest <TrainingManifest()>: The training manifest.
+    n_list <[int]>: Values of n in n previous stations eg. [1, 2, 3, 4, 5]
+  """
+  # The trains changed for any n are regenerated for all n in n_list at once.
+  n_trains_tuples = dict((n, get_trains_tuples_dict(ttu, manifest, n))
+                         for n in n_list)
+  stations_causes = {}
+  for n in n_list:
+    for train_num, (_, stations, change) in n_trains_tuples[n].items():
+      if change is None:
+        continue
+      recorded = manifest.get_train_tuple(n, train_num)
+      for s in set(stations) | set(recorded[1] if recorded else []):
+        if (train_num, change) not in stations_causes.setdefault(s, []):
+          stations_causes[s].append((train_num, change))
+
+  prev_fingerprints = {}
+  if stations_causes:
+    for n in n_list:
+      for s in stations_causes:
+        prev_fingerprints[(n, s)] = get_file_fingerprint_dict(
+            get_station_df_path(ttu, s, n))
+    trains_tuples = n_trains_tuples[n_list[0]]
+    trains = [train_num for train_num, (fingerprint, stations, _) in
+              trains_tuples.items()
+              if fingerprint is not None and set(stations) & set(stations_causes)]
+    if not generate_all_known_stations_dfs(ttu._tdfu, SETTING, n_list,
+                                           trains=trains,
+                                           stations=stations_causes.keys()):
+      return None
+
+  for n in n_list:
+    for train_num, (fingerprint, stations, change) in (
+        n_trains_tuples[n].items()):
+      if change is not None:
+        manifest.set_train_tuple(n, train_num, fingerprint, stations)
+  manifest.save()
+  return stations_causes, prev_fingerprints
+
+def get_causes_str(causes):
+  """
+  Returns a string of the trains (and their changes) causing a regeneration.
+
+  Args:
+    causes <[(string, string)]>: List of (train, change).
+  """
+  return ", ".join("%s %s" % cause for cause in sorted(causes))
+
+def get_station_jobs_and_report_tuple(ttu, manifest, n, stations_causes,
+                                      prev_fingerprints, num_cores):
+  """
+  Returns a tuple of (list of training jobs of the stations to be refit, list
+  of report rows of the stations regenerated but not refit). Each job is a
+  training job (refer `StationTrainingPool.run()`) having "action" ("fit" or
+  "grow") and its "reason" along with the data frame's "fingerprint".
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    manifest <TrainingManifest()>: The training manifest.
+    n <int>: n in n-previous-station models.
+    stations_causes <dict>: Refer `regenerate_changed_stations_dfs()`.
+    prev_fingerprints <dict>: Refer `regenerate_changed_stations_dfs()`.
+    num_cores <int>: Number of cores available for training.
+  """
+  num_cols = len(ttu._tdfu._get_column_names_list(n))
+  jobs, report = [], []
+  for s in ttu._pdr.get_all_52trains_stations():
+    fingerprint = get_file_fingerprint_dict(get_station_df_path(ttu, s, n))
+    fit_fingerprint = manifest.get_station_fingerprint(n, s)
+    model_path = get_station_model_path(ttu, s, n)
+    causes = stations_causes.get(s, [])
+    num_rows = fingerprint["nrows"] if fingerprint else 0
+
+    if num_rows == 0:
+      if fit_fingerprint is not None or os.path.isfile(model_path):
+        report.append({"n": n, "station": s, "action": "dropped",
+                       "reason": "no training rows", "rows": 0})
+      continue
+    if fingerprint == fit_fingerprint and os.path.isfile(model_path):
+      if causes:
+        report.append({"n": n, "station": s, "action": "unchanged",
+                       "reason": "regenerated with same rows (%s)" %
+                       get_causes_str(causes), "rows": num_rows})
+      continue
+
+    job = {"station": s, "n": n, "fingerprint": fingerprint,
+           "model_path": model_path,
+           "n_jobs": get_station_n_jobs(num_rows, num_cores),
+           "memory_bytes": get_station_memory_bytes(
+               num_rows, num_cols, N_ESTIMATORS)}
+    if fit_fingerprint is None or not os.path.isfile(model_path):
+      job["action"], job["reason"] = "fit", "no model fit on recorded rows"
+    elif (causes and all(change == "appended" for _, change in causes) and
+          prev_fingerprints.get((n, s)) == fit_fingerprint and
+          num_rows > fit_fingerprint["nrows"]):
+      new_rows = num_rows - fit_fingerprint["nrows"]
+      job["action"] = "grow"
+      job["reason"] = "%s rows appended (%s)" % (new_rows,
+                                                 get_causes_str(causes))
+      job["new_trees"] = int(math.ceil(N_ESTIMATORS * new_rows /
+                                       float(num_rows)))
+      job["memory_bytes"] = get_station_memory_bytes(
+          num_rows, num_cols, MAX_TREES)
+    elif causes:
+      job["action"] = "fit"
+      job["reason"] = "rows changed (%s)" % get_causes_str(causes)
+    else:
+      job["action"], job["reason"] = "fit", "rows changed since latest fit"
+    jobs.append(job)
+  return jobs, report
+
+def train_station_job(ttu, job):
+  """
+  Fits (or grows) the RFR model of a job's station, saves it and returns a
+  report row dict of it.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    job <dict>: A training job, refer `get_station_jobs_and_report_tuple()`.
+  """
+  s, n = job["station"], job["n"]
+  df = ttu._cdr.get_n_prev_station_csv_df(s, SETTING, n)
+  df = ttu._get_labenc_station_df(df, n)
+  action, reason = job["action"], job["reason"]
+  model, num_trees = None, N_ESTIMATORS
+  if action == "grow":
+    model = joblib.load(job["model_path"])
+    num_trees = model.n_estimators + job["new_trees"]
+    if num_trees > MAX_TREES:
+      model, num_trees, action = None, N_ESTIMATORS, "fit"
+      reason += ", forest would exceed %s trees" % MAX_TREES
+    else:
+      model.set_params(n_estimators=num_trees, warm_start=True)
+  rmse = fit_station_model(ttu, s, n, df, job["n_jobs"], print_n=True,
+                           model=model)
+  return {"n": n, "station": s, "action": action, "reason": reason,
+          "rows": job["fingerprint"]["nrows"], "trees": num_trees,
+          "rmse": rmse}
+
+def update_stations_having_model_list(ttu, n, fit_stations, dropped_stations):
+  """
+  Adds the fit stations to (and removes the dropped stations from) the list of
+  stations having n previous station models, and saves it.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    n <int>: n in n-previous-station models.
+    fit_stations <[string]>: Stations whose models are fit.
+    dropped_stations <[string]>: Stations having no training rows now.
+  """
+  try:
+    stns_having_model = set(ttu._pdr.get_stations_having_nps_model_list(n))
+  except (IOError, OSError):
+    stns_having_model = set()
+  stns_having_model = (stns_having_model | set(fit_stations)) - set(
+      dropped_stations)
+  atomic_dump(pickle_dump, [s for s in ttu._pdr.get_all_52trains_stations()
+                            if s in stns_having_model],
+              ttu._pdr._pdpath + "stations_having_"+str(n)+"ps_models.p")
+
+def train_incrementally(ttu, manifest, n_list, pool):
+  """
+  Regenerates the changed station data frames, refits the changed station
+  models and returns the report data frame. Refer the file description.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    manifest <TrainingManifest()>: The training manifest.
+    n_list <[int]>: Values of n in n previous stations eg. [1, 2, 3, 4, 5]
+    pool <StationTrainingPool()>: The pool of processes to train stations.
+  """
+  regenerated = regenerate_changed_stations_dfs(ttu, manifest, n_list)
+  if regenerated is None:
+    print "Station data frames could not be regenerated, nothing is refit."
+    return None
+  stations_causes, prev_fingerprints = regenerated
+  print "Stations regenerated: ", len(stations_causes)
+
+  report = []
+  for n in n_list:
+    jobs, n_report = get_station_jobs_and_report_tuple(
+        ttu, manifest, n, stations_causes, prev_fingerprints,
+        pool.get_num_cores())
+    results = pool.run(jobs, lambda job: train_station_job(ttu, job))
+    for job in jobs:
+      ok, result = results[job["station"]]
+      if ok:
+        manifest.set_station_fingerprint(n, job["station"], job["fingerprint"])
+        n_report.append(result)
+      else:
+        n_report.append({"n": n, "station": job["station"], "action": "failed",
+                         "reason": result.strip().split("\n")[-1],
+                         "rows": job["fingerprint"]["nrows"]})
+    manifest.save()
+    update_stations_having_model_list(
+        ttu, n, [row["station"] for row in n_report
+                 if row["action"] in ["fit", "grow"]],
+        [row["station"] for row in n_report if row["action"] == "dropped"])
+    report.extend(sorted(n_report, key=lambda row: row["station"]))
+
+  return pd.DataFrame(report, columns=["n", "station", "action", "reason",
+                                       "rows", "trees", "rmse"])
+
+def record_fingerprints(ttu, manifest, n_list):
+  """
+  Records the fingerprints of the current trains' csv files and station data
+  frames, assuming the existing station models are fit on them.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    manifest <TrainingManifest()>: The training manifest.
+    n_list <[int]>: Values of n in n previous stations eg. [1, 2, 3, 4, 5]
+  """
+  for n in n_list:
+    for train_num, (fingerprint, stations, _) in (
+        get_trains_tuples_dict(ttu, manifest, n).items()):
+      manifest.set_train_tuple(n, train_num, fingerprint, stations)
+    num_stations = 0
+    for s in ttu._pdr.get_all_52trains_stations():
+      if os.path.isfile(get_station_model_path(ttu, s, n)):
+        manifest.set_station_fingerprint(
+            n, s, get_file_fingerprint_dict(get_station_df_path(ttu, s, n)))
+        num_stations += 1
+    print "Recorded n: ", n, " Stations with models: ", num_stations
+  manifest.save()
+
+if __name__ == "__main__":
+  mode = sys.argv[1] # <"train"|"record">
+  # Get the n in "n previous station", or "all" for all the values of n.
+  n_list = [1, 2, 3, 4, 5] if sys.argv[2] == "all" else [int(sys.argv[2])]
+  num_cores = int(sys.argv[3]) if len(sys.argv) > 3 else None
+  max_memory_bytes = (int(float(sys.argv[4]) * 1024**3)
+                      if len(sys.argv) > 4 else None)
+  ttu = TTU()
+  manifest = TrainingManifest(
+      ttu._model_path + "rfr_models/incremental_training_manifest.p")
+
+  if mode == "record":
+    record_fingerprints(ttu, manifest, n_list)
+  else:
+    report_df = train_incrementally(
+        ttu, manifest, n_list, StationTrainingPool(num_cores, max_memory_bytes))
+    if report_df is not None:
+      report_df.to_csv(ttu._model_path + "rfr_models/" +
+                       "incremental_training_report.csv", index=False)
+      print report_df.to_string(index=False)
+      print report_df.groupby(["n", "action"]).size()
@@ -21,6 +21,15 @@
 #       "jrny_wise_known_trains_lms_1ps_labenc" directory and corresponding RMSEs
 #       in "rmse_of_jrny_wise_lms_pred_known_trains_1ps" directory.
 #
+#       To predict the late minutes of all journeys of all Known Trains in
+#       lockstep (batched) mode, execute:
+#
+#       `python known_trains_lms_pred.py rfr 1 lockstep`
+#
+#       In lockstep mode all the journeys advance station by station together,
+#       and at each step a station model is loaded and called only once for all
+#       the journeys which need it. The output csv and RMSEs are same as above.
+#
 #       IMPORTANT NOTE: Make sure to remove the unwanted columns in data frame
 #                       depending on experiments. This can be done in function:
 #                       "remove_unwanted_columns_df()" defined in
@@ -29,10 +38,13 @@
 #
 #
 
+import numpy as np
 import pickle
 import pandas as pd
 import sys
 
+from collections import OrderedDict
+
 from sklearn.metrics import mean_squared_error
 
 from utilities.tt_utils import TrainingTestUtils as TTU
@@ -62,9 +74,7 @@ def get_journey_wise_late_mins_of_known_trains(
                                  `exp_lms_output_dir`.
 
   """
-  pred_lms_df = [] # To caputre predicted late mins for each journey
-  pred_lms_rmse = [] # Late Minutes RMSE for each journey
-  columns = ["Stations", "ActualLateMins", "PredictedLateMins"]
+  journeys_lms = [] # To capture actual and predicted late mins of journeys
   train_df = ttu._cdr.get_train_journey_df(train_num, setting)
 
   # Get all the source station rows of each journey in train_df
@@ -79,6 +89,7 @@ def get_journey_wise_late_mins_of_known_trains(
     stn_list_sj = sj_df["station_code"].tolist()
     actual_late_mins_sj = sj_df["latemin"]
     pred_late_mins_sj = [0] # Assuming 0 late mins for source station
+    row_builder = ttu.get_journey_row_builder(train_num, sj_df)
 
     # Uncomment the following lines in `if else` case accordingly as per value
     # of N in N-OMLMPF. If N is chosen to be 3, it implies we will consider only
@@ -93,27 +104,32 @@ def get_journey_wise_late_mins_of_known_trains(
       try: # Try to predict the late minutes for this station in single journey.
         if (j == 1 or n == 1): # valid for only 1 previous station.
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 1, stn_list_sj[j], pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 1, stn_list_sj[j], pred_late_mins_sj, j, mdl,
+              row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 2 or n == 2): # valid for only 2 previous stations.
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 2, stn_list_sj[j], pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 2, stn_list_sj[j], pred_late_mins_sj, j, mdl,
+              row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 3 or n == 3): # valid for only 3 previous stations.
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 3, stn_list_sj[j], pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 3, stn_list_sj[j], pred_late_mins_sj, j, mdl,
+              row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 4 or n == 4): # valid for only 4 previous stations.
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 4, stn_list_sj[j], pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 4, stn_list_sj[j], pred_late_mins_sj, j, mdl,
+              row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j ==5 or n == 5): # rest stations are valid for 5 previous stations.
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 5, stn_list_sj[j], pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 5, stn_list_sj[j], pred_late_mins_sj, j, mdl,
+              row_builder)
           pred_late_mins_sj.append(plm)
           continue
 
@@ -129,6 +145,33 @@ def get_journey_wise_late_mins_of_known_trains(
         print e
         pred_late_mins_sj.append(pred_late_mins_sj[j-1])
 
+    journeys_lms.append(
+        (stn_list_sj, actual_late_mins_sj, pred_late_mins_sj))
+
+  dump_journey_wise_late_mins(ttu, train_num, mdl, journeys_lms,
+                              exp_lms_output_dir, exp_rmse_output_dir)
+
+def dump_journey_wise_late_mins(ttu, train_num, mdl, journeys_lms,
+                                exp_lms_output_dir, exp_rmse_output_dir):
+  """
+  Saves the actual and predicted late minutes of all the journeys of a train
+  as a csv file, and their RMSEs as a pickle file.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    train_num <string>: A five digit train numebr string eg. "12307"
+    mdl <string>: <"rfr"|"lmr">
+    journeys_lms <[(list, pandas.Series, list)]>: A list of tuples of station
+        list, actual late minutes and predicted late minutes of each journey.
+    exp_lms_output_dir <string>: Desired output directory of predicted latemins.
+    exp_rmse_output_dir <string>: Desired output directory of predicted latemins
+                                  RMSEs.
+  """
+  pred_lms_df = [] # To caputre predicted late mins for each journey
+  pred_lms_rmse = [] # Late Minutes RMSE for each journey
+  columns = ["Stations", "ActualLateMins", "PredictedLateMins"]
+
+  for stn_list_sj, actual_late_mins_sj, pred_late_mins_sj in journeys_lms:
     # Construct the data frame of Station Code, Actual Late Mins and
     # Predicted Late Mins for each journey
     for ele in zip(zip(stn_list_sj, actual_late_mins_sj), pred_late_mins_sj):
@@ -148,6 +191,163 @@ def get_journey_wise_late_mins_of_known_trains(
   pickle.dump(pred_lms_rmse, open(ttu._pdr._pdpath+mdl+"_model_pickle_data/" +
       exp_rmse_output_dir + "/Train_" + train_num + "_jw_rmse.p", "wb"))
 
+def get_journey_wise_late_mins_of_known_trains_in_lockstep(
+    ttu, trains, setting, mdl, n, exp_lms_output_dir, exp_rmse_output_dir):
+  """
+  Finds the journey wise late minutes of the passed Known Trains, same as
+  `get_journey_wise_late_mins_of_known_trains()` does for each train, but by
+  advancing all the journeys of all the trains in lockstep. Refer
+  `get_lockstep_predicted_journeys_list()`.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    trains <[string]>: A list of five digit train numbers eg. ["12307", ..]
+    setting <string>: <"traininig"|"cross_validation"|"known_test">
+    mdl <string>: <"rfr"|"lmr">
+    n <int>: Value of n <1|2|3|4|5> in n-prev-station or n-OMLMPF.
+    exp_lms_output_dir <string>: Desired output directory of predicted latemins.
+    exp_rmse_output_dir <string>: Desired output directory of predicted latemins
+                                  RMSEs.
+  """
+  journeys = get_lockstep_predicted_journeys_list(ttu, trains, setting, mdl, n)
+  for train_num in trains:
+    journeys_lms = [(jrny["stn_list_sj"], jrny["sj_df"]["latemin"],
+                     jrny["pred_late_mins_sj"]) for jrny in journeys
+                    if jrny["train_num"] == train_num]
+    dump_journey_wise_late_mins(ttu, train_num, mdl, journeys_lms,
+                                exp_lms_output_dir, exp_rmse_output_dir)
+
+def get_lockstep_predicted_journeys_list(ttu, trains, setting, mdl, n,
+                                         max_trees=None):
+  """
+  Returns a list of all the journeys of the passed trains, each a dict of
+  "train_num", "sj_df", "stn_list_sj" and "pred_late_mins_sj" (predicted late
+  minutes at its stations).
+
+  All the journeys are advanced in lockstep. At each step j, the jth station
+  of every journey is predicted with the same min(j, n) previous station
+  models, hence rows of all the journeys needing the same station model are
+  predicted by a single `predict` call. With the compact models (refer
+  `station_model_format` in "utilities/env.py"), rows of all the stations at a
+  step are predicted by a single batch evaluator call (the evaluator of each k
+  is created once, for all the steps of that k). The late minutes predicted at
+  previous steps are used as previous stations' late minutes.
+
+  The evaluator holds a copy of its stations' compact models in memory, i.e.
+  the evaluator of n (used from step n onwards) holds the models of all the
+  stations at those steps, about the size of their "*.cf" files. Pass fewer
+  trains to limit it.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    trains <[string]>: A list of five digit train numbers eg. ["12307", ..]
+    setting <string>: <"traininig"|"cross_validation"|"known_test">
+    mdl <string>: <"rfr"|"lmr">
+    n <int>: Value of n <1|2|3|4|5> in n-prev-station or n-OMLMPF.
+    max_trees <int>: Number of trees of the RFR models to predict with, refer
+                     `TTU.get_predicted_late_mins_list()`. Default all.
+  """
+  journeys = [] # To store the state of each journey of all the trains.
+  for train_num in trains:
+    train_df = ttu._cdr.get_train_journey_df(train_num, setting)
+    # Get all the source station rows of each journey in train_df
+    source_rows = train_df[train_df.scharr=="Source"].index.tolist()
+    for i in range(len(source_rows)):
+      sj_df = ttu._tdfu._generate_single_journey_df(train_df, i, source_rows)
+      sj_df = sj_df[["station_code", "distance", "month", "weekday",
+                     "latemin"]]
+      journeys.append({"train_num": train_num, "sj_df": sj_df,
+                       "row_builder": ttu.get_journey_row_builder(train_num,
+                                                                  sj_df),
+                       "stn_list_sj": sj_df["station_code"].tolist(),
+                       "pred_late_mins_sj": [0]}) # 0 late mins at source.
+
+  max_num_stns = max([len(jrny["stn_list_sj"]) for jrny in journeys] or [0])
+  # k vs all the stations predicted with k previous station models, in order.
+  stns_of_k = OrderedDict()
+  for jrny in journeys:
+    for j, stn in enumerate(jrny["stn_list_sj"][1:], 1):
+      stns_of_k.setdefault(min(j, n), OrderedDict())[stn] = None
+  # k vs the batch evaluator of the stations of k, created on reaching the
+  # first step of k and used at all its steps. The evaluator of k-1 is dropped
+  # then, as it copies its forests' arrays in memory.
+  evaluators = {}
+
+  for j in range(1, max_num_stns):
+    k = min(j, n) # Number of previous stations of models at this step.
+    if ttu._model_format == "compact" and k not in evaluators:
+      evaluators.pop(k-1, None)
+      evaluators[k] = ttu.get_station_models_batch_evaluator(
+          stns_of_k.get(k, {}).keys(), k, mdl)
+    # Station vs a list of (journey, row data frame) to predict with its model.
+    stn_rows_dict = OrderedDict()
+    for jrny in journeys:
+      if j >= len(jrny["stn_list_sj"]):
+        continue # This journey has ended.
+      pred_late_mins_sj = jrny["pred_late_mins_sj"]
+      try:
+        # Copy the row, as the row builder reuses it for the next row.
+        row = jrny["row_builder"].get_row_array(j, k, pred_late_mins_sj).copy()
+        stn_rows_dict.setdefault(jrny["stn_list_sj"][j], []).append(
+            (jrny, row))
+      except KeyError as e:
+        # Previous station is not present in station to index dict, hence set
+        # the late minutes at current station as that of previous one.
+        pred_late_mins_sj.append(pred_late_mins_sj[j-1])
+      except Exception as e:
+        print e
+        pred_late_mins_sj.append(pred_late_mins_sj[j-1])
+
+    if ttu._model_format == "compact" and stn_rows_dict:
+      # Predict the rows of all the stations at this step at once.
+      evaluator = evaluators.get(k)
+      evaluator_stns = set(evaluator.get_keys_list() if evaluator else [])
+      stns = [stn for stn in stn_rows_dict.keys() if stn in evaluator_stns]
+      if stns:
+        jrnys_rows = [jrny_row for stn in stns
+                      for jrny_row in stn_rows_dict[stn]]
+        keys = [stn for stn in stns for _ in stn_rows_dict[stn]]
+        try:
+          plms = evaluator.predict(np.vstack([row for _, row in jrnys_rows]),
+                                   keys, max_trees)
+        except Exception as e:
+          print e
+          # Predict row by row, so that only the failing rows fall back.
+          plms = []
+          for (jrny, row), stn in zip(jrnys_rows, keys):
+            try:
+              plms.append(evaluator.predict(row.reshape(1, -1), [stn],
+                                            max_trees)[0])
+            except Exception as e:
+              plms.append(jrny["pred_late_mins_sj"][j-1])
+        for (jrny, _), plm in zip(jrnys_rows, plms):
+          jrny["pred_late_mins_sj"].append(plm)
+      # The stations having no (or a stale) compact model are predicted below
+      # by their models loaded by `TTU`, e.g. their newer "sav" models.
+      stn_rows_dict = OrderedDict((stn, jrnys_rows) for stn, jrnys_rows in
+                                  stn_rows_dict.items() if stn not in stns)
+
+    for stn, jrnys_rows in stn_rows_dict.items():
+      try:
+        plms = ttu.get_predicted_late_mins_list(
+            stn, k, np.vstack([row for _, row in jrnys_rows]), mdl, max_trees)
+      except Exception as e:
+        print e
+        # Predict row by row, so that only the failing rows fall back.
+        plms = []
+        for jrny, row in jrnys_rows:
+          try:
+            plms.append(ttu.get_predicted_late_mins_list(
+                stn, k, row.reshape(1, -1), mdl, max_trees)[0])
+          except Exception as e:
+            # Set the late minutes at that station for which no trained model
+            # exist as the late minutes at the immediate previous station.
+            plms.append(jrny["pred_late_mins_sj"][j-1])
+      for (jrny, _), plm in zip(jrnys_rows, plms):
+        jrny["pred_late_mins_sj"].append(plm)
+
+  return journeys
+
 
 if __name__ == "__main__":
   mdl = sys.argv[1] # Accept <"rfr"|"lmr">.
@@ -164,7 +364,12 @@ if __name__ == "__main__":
   ttu = TTU()
   trains52 = ttu._pdr.get_all_trains()[:52] # Choose the first 52 trains, which
                                             # are Known Trains.
-  for train in trains52:
-    get_journey_wise_late_mins_of_known_trains(
-        ttu, train, "known_test", mdl, int(n), exp_lms_output_dir,
+  if len(sys.argv) > 3 and sys.argv[3] == "lockstep":
+    get_journey_wise_late_mins_of_known_trains_in_lockstep(
+        ttu, trains52, "known_test", mdl, int(n), exp_lms_output_dir,
         exp_rmse_output_dir)
+  else:
+    for train in trains52:
+      get_journey_wise_late_mins_of_known_trains(
+          ttu, train, "known_test", mdl, int(n), exp_lms_output_dir,
+          exp_rmse_output_dir)
@@ -9,12 +9,57 @@
 import numpy as np
 import pandas as pd
 
+from journey_index import JourneyIndex
+from journey_store_reader import JourneyStoreReader
+
 class CSVDataReader(object):
 
-  def __init__(self, data_path=""):
+  def __init__(self, data_path="", backend="csv"):
+    """
+    Args:
+      data_path <string>: Path to the data directory.
+      backend <string>: <"csv"|"store">
+                        "csv": Read the csv files.
+                        "store": Read the columnar journey store created by
+                                 "create_journey_store.py", the csv files not
+                                 in store (or changed since) are read as csv.
+    """
     self._cdpath = data_path
+    self._jsr = JourneyStoreReader(data_path) if backend == "store" else None
+    self._jidx = JourneyIndex(data_path)
+
+  def _read_csv_df(self, csv_rel_path, columns=None):
+    """
+    Returns the data frame of the csv file, from the journey store if enabled.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      columns <[string]>: Columns to be read, default is all the columns.
+    """
+    if self._jsr is not None:
+      try:
+        return self._jsr.get_df(csv_rel_path, columns)
+      except IOError:
+        pass # Not in journey store, read the csv file.
+    return pd.read_csv(self._cdpath+csv_rel_path, usecols=columns)
+
+  def _get_csv_num_rows(self, csv_rel_path):
+    """
+    Returns the number of rows (excluding header) of the csv file, from the
+    journey store if enabled, else by counting the lines of csv file.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    if self._jsr is not None:
+      try:
+        return self._jsr.get_num_rows(csv_rel_path)
+      except IOError:
+        pass # Not in journey store, count the lines of csv file.
+    with open(self._cdpath+csv_rel_path, "rb") as f:
+      return max(sum(1 for line in f) - 1, 0)
 
-  def get_train_journey_df(self, train_num, setting="training"):
+  def get_train_journey_df(self, train_num, setting="training", columns=None):
     """
     Returns the data frame of the given train. The data frame corresponds to
     either training or test setting.
@@ -23,14 +68,67 @@ class CSVDataReader(object):
       train_num <string>: Train number eg. "12307" whose data frame is required
       setting <string>: <"training"|"cross_validation"|"known_test"|
                         "unknown_test">
+      columns <[string]>: Columns to be read, default is all the columns.
+    """
+    train_df = self._read_csv_df(
+        self._get_train_csv_rel_path(train_num, setting), columns)
+    return train_df
+
+  def _get_train_csv_rel_path(self, train_num, setting=None):
+    """
+    Returns the path (relative to data directory) of the train's csv file.
+
+    Args:
+      train_num <string>: Train number eg. "12307".
+      setting <string>: <None|"training"|"cross_validation"|"known_test"|
+                        "unknown_test">, None for the complete journey data.
     """
+    if setting is None:
+      return ("csv_Mar16_Feb18_all_trains_135_months_weekdays/Train"+
+              train_num+".csv")
     tr_grp = ("52_known_" if (setting == "training" or setting == "known_test"
               or setting == "cross_validation") else "83_unknown_")
-    train_df = pd.read_csv(
-        (self._cdpath+tr_grp+"trains_"+setting+"_folder/Train"+train_num+".csv"))
-    return train_df
+    return tr_grp+"trains_"+setting+"_folder/Train"+train_num+".csv"
 
-  def get_n_prev_station_csv_df(self, station, setting, n):
+  def get_train_nth_journey_df(self, train_num, i, setting=None):
+    """
+    Returns the ith single journey data frame of the train, read directly
+    using the train's journey index without parsing its other journeys.
+
+    Args:
+      train_num <string>: Train number eg. "12307".
+      i <int>: Index of the journey, -1 for the latest journey.
+      setting <string>: <None|"training"|"cross_validation"|"known_test"|
+                        "unknown_test">, None for the complete journey data.
+    """
+    return self._jidx.get_journey_df(
+        self._get_train_csv_rel_path(train_num, setting), i)
+
+  def get_train_latest_journey_df(self, train_num, setting=None):
+    """
+    Returns the latest single journey data frame of the train. Refer
+    `get_train_nth_journey_df()`.
+
+    Args:
+      train_num <string>: Train number eg. "12307".
+      setting <string>: <None|"training"|"cross_validation"|"known_test"|
+                        "unknown_test">, None for the complete journey data.
+    """
+    return self.get_train_nth_journey_df(train_num, -1, setting)
+
+  def get_train_num_journeys(self, train_num, setting=None):
+    """
+    Returns the number of journeys of the train.
+
+    Args:
+      train_num <string>: Train number eg. "12307".
+      setting <string>: <None|"training"|"cross_validation"|"known_test"|
+                        "unknown_test">, None for the complete journey data.
+    """
+    return self._jidx.get_num_journeys(
+        self._get_train_csv_rel_path(train_num, setting))
+
+  def get_n_prev_station_csv_df(self, station, setting, n, wide=False):
     """
     Returns the n previous station training data frame of given station
 
@@ -38,12 +136,37 @@ class CSVDataReader(object):
       station <string>: should be one among 52trains unique stations
       setting <string>: <"training"|"cross_validation">
       n <int>: <1|2|3|4|5>
+      wide <bool>: If True, returns the station's wide data frame with n
+                   previous stations. Refer "create_training_data.py".
     """
-    stn_csv = pd.read_csv(
-        (self._cdpath+"52tr_stations_"+setting+"_data/"+str(n)+
-        "ps_"+setting+"_data/Station_"+station+".csv"))
+    stn_csv = self._read_csv_df(
+        self._get_n_prev_station_csv_rel_path(station, setting, n, wide))
     return stn_csv
 
+  def _get_n_prev_station_csv_rel_path(self, station, setting, n, wide):
+    """
+    Returns the path of n previous station data frame csv file relative to the
+    data directory. Refer `get_n_prev_station_csv_df()` for args.
+    """
+    return ("52tr_stations_"+setting+"_data/"+str(n)+
+            ("ps_wide_" if wide else "ps_")+setting+
+            "_data/Station_"+station+".csv")
+
+  def get_n_prev_station_num_rows(self, station, setting, n, wide=False):
+    """
+    Returns the number of rows in the n previous station training data frame of
+    given station, without reading the data frame.
+
+    Args:
+      station <string>: should be one among 52trains unique stations
+      setting <string>: <"training"|"cross_validation">
+      n <int>: <1|2|3|4|5>
+      wide <bool>: If True, of the station's wide data frame with n previous
+                   stations. Refer "create_training_data.py".
+    """
+    return self._get_csv_num_rows(
+        self._get_n_prev_station_csv_rel_path(station, setting, n, wide))
+
   def get_jw_pred_late_mins_of_train_df(self, train_num, nps=4, rfr_mdl="",
       group="known"):
     """
@@ -57,19 +180,19 @@ class CSVDataReader(object):
       nps <int>: number of previous stations considered for prediction.
       rfr_mdl <string>: <""|"_wonps_wdts"|"_without_nps_codes">
     """
-    df = pd.read_csv(self._cdpath+"rfr_model_data/"+"jrny_wise_"+group+"_trains"
+    df = self._read_csv_df("rfr_model_data/"+"jrny_wise_"+group+"_trains"
         +"_lms_"+str(nps)+"ps"+"_labenc"+rfr_mdl+"/"+"Train_"+
         train_num+"_jw_lms.csv")
     return df
 
-  def get_train_complete_journey_df(self, train_num):
+  def get_train_complete_journey_df(self, train_num, columns=None):
     """
     Returns a complete data frame of collected data for a train.
 
     Args:
       train_num <string>: Train number eg. "12307" whose complete journey df is
                           required.
+      columns <[string]>: Columns to be read, default is all the columns.
     """
-    df = pd.read_csv(self._cdpath+
-        "csv_Mar16_Feb18_all_trains_135_months_weekdays/Train"+train_num+".csv")
+    df = self._read_csv_df(self._get_train_csv_rel_path(train_num), columns)
     return df
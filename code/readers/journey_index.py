@@ -0,0 +1,203 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file maintains the journey index of trains' csv files. A journey
+#       index of a csv file holds the byte offsets and row numbers of all the
+#       "Source" rows (i.e. start of journeys) in it, so that a single journey
+#       can be read directly without parsing the rest of the csv file.
+#
+#       The index of "<dir>/<name>.csv" under data directory is persisted as
+#       "journey_index/<dir>/<name>.p". It is created on first use and updated
+#       incrementally (only the appended bytes are scanned) when new journeys
+#       are appended to the csv file.
+#
+
+import csv
+import os
+import pandas as pd
+import pickle
+import threading
+
+from io import BytesIO
+
+class JourneyIndex(object):
+
+  def __init__(self, data_path=""):
+    self._cdpath = data_path
+    self._jipath = data_path+"journey_index/"
+    # Path of csv file vs its index dict loaded in this process.
+    self._index_dicts = {}
+    self._lock = threading.Lock()
+
+  def _get_index_path(self, csv_rel_path):
+    """
+    Returns the path of the persisted index of the csv file.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory
+                             e.g. "52_known_trains_training_folder/Train12307.csv"
+    """
+    return self._jipath+csv_rel_path[:-len(".csv")]+".p"
+
+  def _is_source_line(self, line, scharr_col):
+    """
+    Returns True if the csv line is a "Source" row i.e. start of a journey.
+
+    Args:
+      line <string>: A line of the csv file.
+      scharr_col <int>: Index of the "scharr" column in the csv file.
+    """
+    if "Source" not in line: # Avoid parsing most of the lines.
+      return False
+    return next(csv.reader([line]))[scharr_col] == "Source"
+
+  def _scan_csv(self, csv_path, index_dict):
+    """
+    Scans the csv file from the byte offset upto which it is already scanned,
+    and appends the offsets and row numbers of "Source" rows to the index dict.
+    Only the complete lines (ending with a new line) are scanned.
+
+    Args:
+      csv_path <string>: Path of the csv file.
+      index_dict <dict>: The journey index dict of the csv file.
+    """
+    with open(csv_path, "rb") as f:
+      f.seek(index_dict["scanned_upto"])
+      offset = index_dict["scanned_upto"]
+      for line in f:
+        if not line.endswith("\n"):
+          break
+        if self._is_source_line(line, index_dict["scharr_col"]):
+          index_dict["offsets"].append(offset)
+          index_dict["rows"].append(index_dict["nrows"])
+        offset += len(line)
+        index_dict["nrows"] += 1
+      index_dict["scanned_upto"] = offset
+
+    stat = os.stat(csv_path)
+    index_dict["csv_size"], index_dict["csv_mtime"] = stat.st_size, stat.st_mtime
+
+  def _create_index_dict(self, csv_path):
+    """
+    Returns a new journey index dict of the csv file.
+
+    Args:
+      csv_path <string>: Path of the csv file.
+    """
+    with open(csv_path, "rb") as f:
+      header = f.readline()
+    index_dict = {"header": header,
+                  "scharr_col": next(csv.reader([header])).index("scharr"),
+                  "offsets": [], "rows": [], "nrows": 0,
+                  "scanned_upto": len(header)}
+    self._scan_csv(csv_path, index_dict)
+    return index_dict
+
+  def _is_prefix_unchanged(self, csv_path, index_dict):
+    """
+    Returns True if the header and the latest indexed journey's "Source" row of
+    the csv file are unchanged, i.e. the csv file has only been appended to.
+
+    Args:
+      csv_path <string>: Path of the csv file.
+      index_dict <dict>: The journey index dict of the csv file.
+    """
+    with open(csv_path, "rb") as f:
+      if f.readline() != index_dict["header"]:
+        return False
+      if index_dict["offsets"]:
+        f.seek(index_dict["offsets"][-1])
+        if not self._is_source_line(f.readline(), index_dict["scharr_col"]):
+          return False
+    return True
+
+  def _save_index_dict(self, csv_rel_path, index_dict):
+    """
+    Persists the index dict atomically, i.e. readers in other processes never
+    see a partially written index.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      index_dict <dict>: The journey index dict of the csv file.
+    """
+    index_path = self._get_index_path(csv_rel_path)
+    if not os.path.isdir(os.path.dirname(index_path)):
+      os.makedirs(os.path.dirname(index_path))
+    tmp_index_path = "%s.%s.tmp" % (index_path, os.getpid())
+    with open(tmp_index_path, "wb") as f:
+      pickle.dump(index_dict, f, protocol=2)
+    os.rename(tmp_index_path, index_path)
+
+  def get_index_dict(self, csv_rel_path):
+    """
+    Returns the up to date journey index dict of the csv file. Loads the
+    persisted index, scans only the appended bytes if the csv file has grown,
+    and recreates it if the csv file has been rewritten.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    csv_path = self._cdpath+csv_rel_path
+    stat = os.stat(csv_path)
+    with self._lock:
+      index_dict = self._index_dicts.get(csv_path)
+      if index_dict is None and os.path.isfile(
+          self._get_index_path(csv_rel_path)):
+        with open(self._get_index_path(csv_rel_path), "rb") as f:
+          index_dict = pickle.load(f)
+
+      if (index_dict is not None and stat.st_size == index_dict["csv_size"] and
+          stat.st_mtime == index_dict["csv_mtime"]):
+        self._index_dicts[csv_path] = index_dict
+        return index_dict
+
+      if (index_dict is not None and stat.st_size > index_dict["csv_size"] and
+          self._is_prefix_unchanged(csv_path, index_dict)):
+        index_dict = dict(index_dict, offsets=list(index_dict["offsets"]),
+                          rows=list(index_dict["rows"]))
+        self._scan_csv(csv_path, index_dict) # New journeys are appended.
+      else:
+        index_dict = self._create_index_dict(csv_path)
+
+      self._save_index_dict(csv_rel_path, index_dict)
+      self._index_dicts[csv_path] = index_dict
+      return index_dict
+
+  def get_num_journeys(self, csv_rel_path):
+    """
+    Returns the number of journeys in the csv file.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    return len(self.get_index_dict(csv_rel_path)["offsets"])
+
+  def get_journey_df(self, csv_rel_path, i):
+    """
+    Returns the single journey data frame of the ith journey in the csv file,
+    reading only its bytes. The index labels of the data frame are the same as
+    in the data frame of the complete csv file, i.e. same as obtained from
+    `TrainDataFrameUtils._generate_single_journey_df()`.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      i <int>: Index of the journey, negative indices count from the last
+               journey e.g. -1 for the latest journey.
+    """
+    index_dict = self.get_index_dict(csv_rel_path)
+    offsets = index_dict["offsets"]
+    i = range(len(offsets))[i] # Raises IndexError for an invalid journey.
+
+    with open(self._cdpath+csv_rel_path, "rb") as f:
+      f.seek(offsets[i])
+      if i+1 < len(offsets):
+        journey_bytes = f.read(offsets[i+1]-offsets[i])
+      else:
+        journey_bytes = f.read() # Latest journey, read till the end.
+
+    sj_df = pd.read_csv(BytesIO(index_dict["header"]+journey_bytes))
+    sj_df.index = pd.RangeIndex(index_dict["rows"][i],
+                                index_dict["rows"][i]+sj_df.shape[0])
+    return sj_df
@@ -0,0 +1,208 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file reads (and writes) the columnar journey store. Each csv data
+#       file "<dir>/<name>.csv" under data directory is stored as a directory
+#       "journey_store/<dir>/<name>/" having one typed binary numpy file
+#       "<column index>.npy" per column and a "meta.p" pickle. String columns e.g.
+#       station_code, month and weekday are dictionary encoded as integer codes.
+#       The column files are memory mapped while reading, so that only the
+#       required columns are read from disk.
+#
+#       The store is created by "create_journey_store.py".
+#
+
+import numpy as np
+import os
+import pandas as pd
+import pickle
+
+def _get_smallest_int_dtype(min_value, max_value):
+  """
+  Returns the smallest numpy integer dtype which can hold the passed range.
+
+  Args:
+    min_value <int>: Minimum value to be stored.
+    max_value <int>: Maximum value to be stored.
+  """
+  for dtype in [np.int8, np.int16, np.int32]:
+    if min_value >= np.iinfo(dtype).min and max_value <= np.iinfo(dtype).max:
+      return dtype
+  return np.int64
+
+def write_journey_store(df, store_dir, csv_path=None):
+  """
+  Writes the data frame in columnar journey store format in store_dir.
+
+  Args:
+    df <pandas.DataFrame>: The data frame to be stored e.g. a train's journeys.
+    store_dir <string>: The directory where the columns are to be stored.
+    csv_path <string>: The csv file from which df was read, its mtime and size
+                       are recorded to detect a stale store.
+  """
+  if not os.path.isdir(store_dir):
+    os.makedirs(store_dir)
+
+  meta = {"columns": list(df.columns), "nrows": df.shape[0], "dtypes": {},
+          "vocabs": {}, "csv_mtime": None, "csv_size": None}
+  for i, col in enumerate(df.columns):
+    values = df[col].values
+    if values.dtype == object:
+      # Dictionary encode the string columns, missing values are coded as -1.
+      codes, vocab = pd.factorize(values)
+      values = codes.astype(_get_smallest_int_dtype(-1, len(vocab)))
+      meta["vocabs"][col] = list(vocab)
+    elif values.dtype.kind in "iu" and values.size:
+      values = values.astype(
+          _get_smallest_int_dtype(values.min(), values.max()))
+    meta["dtypes"][col] = df[col].dtype.str
+    np.save(os.path.join(store_dir, "%d.npy" % i), values)
+
+  if csv_path is not None:
+    stat = os.stat(csv_path)
+    meta["csv_mtime"], meta["csv_size"] = stat.st_mtime, stat.st_size
+  with open(os.path.join(store_dir, "meta.p"), "wb") as f:
+    pickle.dump(meta, f, protocol=2)
+
+class JourneyStoreReader(object):
+
+  def __init__(self, data_path=""):
+    self._cdpath = data_path
+    self._jspath = data_path+"journey_store/"
+
+  def _get_store_dir(self, csv_rel_path):
+    """
+    Returns the store directory of the csv data file.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory
+                             e.g. "52_known_trains_training_folder/Train12307.csv"
+    """
+    return self._jspath+csv_rel_path[:-len(".csv")]
+
+  def _get_meta_dict(self, csv_rel_path):
+    """
+    Returns the meta data dict of the stored csv file, None if the csv file is
+    not stored or the stored copy is stale (the csv file has changed since).
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    meta_path = os.path.join(self._get_store_dir(csv_rel_path), "meta.p")
+    if not os.path.isfile(meta_path):
+      return None
+    with open(meta_path, "rb") as f:
+      meta = pickle.load(f)
+
+    csv_path = self._cdpath+csv_rel_path
+    if meta["csv_mtime"] is not None and os.path.isfile(csv_path):
+      stat = os.stat(csv_path)
+      if (stat.st_mtime != meta["csv_mtime"] or
+          stat.st_size != meta["csv_size"]):
+        return None
+    return meta
+
+  def has_csv(self, csv_rel_path):
+    """
+    Returns True if the csv file is stored and the stored copy is up to date.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    return self._get_meta_dict(csv_rel_path) is not None
+
+  def _get_columns_dict(self, csv_rel_path, meta, columns, decode):
+    """
+    Returns a dict of column name vs numpy array of the stored csv file.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      meta <dict>: Meta data dict of the stored csv file.
+      columns <[string]>: Columns to be read.
+      decode <bool>: Refer `get_columns_dict()`.
+    """
+    store_dir = self._get_store_dir(csv_rel_path)
+    columns_dict = {}
+    for col in columns:
+      values = np.load(
+          os.path.join(store_dir, "%d.npy" % meta["columns"].index(col)),
+          mmap_mode="r")
+      if decode and col in meta["vocabs"]:
+        # Append a NaN in vocabulary for the code -1 of missing values.
+        vocab = np.array(meta["vocabs"][col]+[np.nan], dtype=object)
+        values = vocab[values]
+      elif decode:
+        values = values.astype(np.dtype(meta["dtypes"][col]))
+      columns_dict[col] = values
+    return columns_dict
+
+  def _get_valid_meta_dict(self, csv_rel_path):
+    """
+    Returns the meta data dict of the stored csv file, raises IOError if it is
+    not stored or is stale.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    meta = self._get_meta_dict(csv_rel_path)
+    if meta is None:
+      raise IOError("Journey store of %s not found or stale" % csv_rel_path)
+    return meta
+
+  def get_columns_dict(self, csv_rel_path, columns=None, decode=True):
+    """
+    Returns a dict of column name vs numpy array of the stored csv file. The
+    arrays are memory mapped (read only) if decode is False.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      columns <[string]>: Columns to be read, default is all the columns.
+      decode <bool>: If True, dictionary encoded columns are decoded to the
+                     original values and columns are cast to original dtypes,
+                     else the codes are returned as they are stored.
+    """
+    meta = self._get_valid_meta_dict(csv_rel_path)
+    return self._get_columns_dict(
+        csv_rel_path, meta,
+        columns if columns is not None else meta["columns"], decode)
+
+  def get_num_rows(self, csv_rel_path):
+    """
+    Returns the number of rows of the stored csv file.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+    """
+    return self._get_valid_meta_dict(csv_rel_path)["nrows"]
+
+  def get_vocab_list(self, csv_rel_path, col):
+    """
+    Returns the vocabulary of a dictionary encoded column, where the code of a
+    value is its index in the vocabulary.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      col <string>: A dictionary encoded column e.g. "station_code".
+    """
+    return self._get_valid_meta_dict(csv_rel_path)["vocabs"][col]
+
+  def get_df(self, csv_rel_path, columns=None):
+    """
+    Returns the data frame of the stored csv file, same as `pd.read_csv()` of
+    the csv file with `usecols=columns`.
+
+    Args:
+      csv_rel_path <string>: Path of csv file relative to the data directory.
+      columns <[string]>: Columns to be read, default is all the columns.
+    """
+    meta = self._get_valid_meta_dict(csv_rel_path)
+    if columns is None:
+      columns = meta["columns"]
+    else:
+      # Keep the order of columns as in csv file, same as `usecols`.
+      columns = [col for col in meta["columns"] if col in columns]
+    return pd.DataFrame(
+        self._get_columns_dict(csv_rel_path, meta, columns, True),
+        columns=columns)
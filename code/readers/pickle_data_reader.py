@@ -6,29 +6,92 @@
 # Desc: This file reads the pickle data.
 #
 
+import os
 import pickle
 import numpy as np
+import threading
+
+# Process wide cache of loaded pickle data shared by all the cached readers. It
+# maps the path of a pickle file to a tuple of (mtime, size, loaded data).
+_PICKLE_DATA_CACHE = {}
+_PICKLE_DATA_CACHE_STATS = {"hits": 0, "misses": 0}
+_PICKLE_DATA_CACHE_LOCK = threading.Lock()
 
 
 class PickleDataReader(object):
 
-  def __init__(self, data_path=""):
+  def __init__(self, data_path="", cached=False):
+    """
+    Args:
+      data_path <string>: Path to the data directory.
+      cached <bool>: If True, each pickle file is loaded only once per process
+                     and shared by all the cached readers, it is reloaded only
+                     when the file's mtime or size changes. The returned data
+                     is shared hence must NOT be modified in place by callers.
+    """
     self._pdpath = data_path+"pickle_data/"
+    self._cached = cached
+
+  def _load_pickle_data(self, file_name):
+    """
+    Returns the data loaded from the pickle file `file_name`, from the process
+    wide cache if this reader is cached and the file is unchanged.
+
+    Args:
+      file_name <string>: Path of the pickle file relative to pickle_data dir.
+    """
+    file_path = self._pdpath+file_name
+    if not self._cached:
+      with open(file_path, "rb") as f:
+        return pickle.load(f)
+
+    stat = os.stat(file_path)
+    with _PICKLE_DATA_CACHE_LOCK:
+      cached_entry = _PICKLE_DATA_CACHE.get(file_path)
+      if (cached_entry is not None and cached_entry[0] == stat.st_mtime and
+          cached_entry[1] == stat.st_size):
+        _PICKLE_DATA_CACHE_STATS["hits"] += 1
+        return cached_entry[2]
+      _PICKLE_DATA_CACHE_STATS["misses"] += 1
+
+    with open(file_path, "rb") as f:
+      data = pickle.load(f)
+    with _PICKLE_DATA_CACHE_LOCK:
+      _PICKLE_DATA_CACHE[file_path] = (stat.st_mtime, stat.st_size, data)
+    return data
+
+  def get_cache_stats_dict(self):
+    """
+    Returns a dict of the process wide pickle data cache's "hits", "misses" and
+    number of "cached_files".
+    """
+    with _PICKLE_DATA_CACHE_LOCK:
+      stats = dict(_PICKLE_DATA_CACHE_STATS)
+      stats["cached_files"] = len(_PICKLE_DATA_CACHE)
+    return stats
+
+  def clear_cache(self):
+    """
+    Clears the process wide pickle data cache and its stats.
+    """
+    with _PICKLE_DATA_CACHE_LOCK:
+      _PICKLE_DATA_CACHE.clear()
+      _PICKLE_DATA_CACHE_STATS["hits"] = 0
+      _PICKLE_DATA_CACHE_STATS["misses"] = 0
 
   def get_all_trains(self):
     """
     Returns a list of all 135 trains' train numbers.
     First 52 trains in list are Known Trains. Next 83 trains are Unknown Trains.
     """
-    all_trains = pickle.load(open(self._pdpath+"all_trains135.p", "rb"))
+    all_trains = self._load_pickle_data("all_trains135.p")
     return all_trains
 
   def get_all_52trains_stations(self):
     """
     Returns a list of all 596 Known Stations of Known Trains.
     """
-    stations_52trains = pickle.load(
-        open(self._pdpath+"52trains_unique_stations.p", "rb"))
+    stations_52trains = self._load_pickle_data("52trains_unique_stations.p")
     return stations_52trains
 
   def get_all_135trains_stations(self):
@@ -36,44 +99,39 @@ class PickleDataReader(object):
     Returns a list of all 799 Known Stations + Uknown Stations of all Known
     Trains and Unknown Trains.
     """
-    stations_135trains = pickle.load(
-        open(self._pdpath+"135trains_unique_stations.p", "rb"))
+    stations_135trains = self._load_pickle_data("135trains_unique_stations.p")
     return stations_135trains
 
   def get_labenc_train_type_dict(self):
     """
     Returns a dictionary of train type (key) vs numeric label (value).
     """
-    train_type_dict = pickle.load(
-        open(self._pdpath+
-        "label_encodings/all_train_types_label_encoding_dict.p", "rb"))
+    train_type_dict = self._load_pickle_data(
+        "label_encodings/all_train_types_label_encoding_dict.p")
     return train_type_dict
 
   def get_labenc_zone_dict(self):
     """
     Returns a dictionary of zone (key) vs numeric label (value).
     """
-    zone_dict = pickle.load(
-        open(self._pdpath+
-        "label_encodings/all_zones_label_encoding_dict.p", "rb"))
+    zone_dict = self._load_pickle_data(
+        "label_encodings/all_zones_label_encoding_dict.p")
     return zone_dict
 
   def get_labenc_month_dict(self):
     """
     Returns a dictionary of month (key) vs numeric label (value).
     """
-    month_dict = pickle.load(
-        open(self._pdpath+
-        "label_encodings/all_months_label_encoding_dict.p", "rb"))
+    month_dict = self._load_pickle_data(
+        "label_encodings/all_months_label_encoding_dict.p")
     return month_dict
 
   def get_labenc_weekday_dict(self):
     """
     Returns a dictionary of weekday (key) vs numeric label (value).
     """
-    weekday_dict = pickle.load(
-        open(self._pdpath+
-        "label_encodings/all_weekdays_label_encoding_dict.p", "rb"))
+    weekday_dict = self._load_pickle_data(
+        "label_encodings/all_weekdays_label_encoding_dict.p")
     return weekday_dict
 
   def get_labenc_station_dict(self):
@@ -82,9 +140,8 @@ class PickleDataReader(object):
     It is supposed to be universal set of all 4359 stations in India, for which
     numeric labels are assigned randomly.
     """
-    station_dict = pickle.load(
-        open(self._pdpath+
-        "label_encodings/all_stations_label_encoding_dict.p", "rb"))
+    station_dict = self._load_pickle_data(
+        "label_encodings/all_stations_label_encoding_dict.p")
     return station_dict
 
   def get_station_degree_strength_dict(self):
@@ -92,8 +149,7 @@ class PickleDataReader(object):
     Returns a dictionary of station (key) vs degree strength (value).
     This dictionary contains info about only 799 Known and Unknown Stations.
     """
-    stn_deg_strength = pickle.load(
-        open(self._pdpath+"station_degree_strength_dict.p", "rb"))
+    stn_deg_strength = self._load_pickle_data("station_degree_strength_dict.p")
     return stn_deg_strength
 
   def get_station_traffic_strength_dict(self):
@@ -101,8 +157,7 @@ class PickleDataReader(object):
     Returns a dictionary of station (key) vs traffic strength (value).
     This dictionary contains info about only 799 Known and Unknown Stations.
     """
-    stn_tfc_strength = pickle.load(
-        open(self._pdpath+"station_traffic_strength_dict.p", "rb"))
+    stn_tfc_strength = self._load_pickle_data("station_traffic_strength_dict.p")
     return stn_tfc_strength
 
   def get_station_coordinates_dict(self):
@@ -111,8 +166,7 @@ class PickleDataReader(object):
     of station (value).
     This dictionary contains info about only 799 Known and Unknown Stations.
     """
-    stn_coordinate = pickle.load(
-        open(self._pdpath+"station_to_lat_lng_dict.p", "rb"))
+    stn_coordinate = self._load_pickle_data("station_to_lat_lng_dict.p")
     return stn_coordinate
 
   def get_known_596_stations_features_df(self):
@@ -122,8 +176,7 @@ class PickleDataReader(object):
     models.p` would be chosen from here to perform kNN on them to find a nearest
     Known Station for an Unkown Station.
     """
-    stn_ftrs_df = pickle.load(
-        open(self._pdpath+"known_596_stations_features_df.p", "rb"))
+    stn_ftrs_df = self._load_pickle_data("known_596_stations_features_df.p")
     return stn_ftrs_df
 
   def get_stations_having_nps_model_list(self, nps):
@@ -132,10 +185,22 @@ class PickleDataReader(object):
     Args:
       nps <int>: n in n_previous_stations models
     """
-    stns_hvng_nps_mdls = pickle.load(
-        open(self._pdpath+"stations_having_"+str(nps)+"ps_models.p", "rb"))
+    stns_hvng_nps_mdls = self._load_pickle_data(
+        "stations_having_"+str(nps)+"ps_models.p")
     return stns_hvng_nps_mdls
 
+  def get_stations_nearest_neighbors_dict(self, nn):
+    """
+    Returns a dict of nps vs a dict of station vs its nn nearest neighbors
+    stations (in order of nearness) among the stations having nps models.
+
+    Args:
+      nn <int>: Number of nearest neighbors.
+    """
+    stns_nearest_neighbors = self._load_pickle_data(
+        "stations_"+str(nn)+"_nearest_neighbors_dict.p")
+    return stns_nearest_neighbors
+
   def get_rmse_of_journey_wise_lms_pred_list(self, n, group, train, rfr_mdl=""):
     """
     Returns a list of RMSEs of different journeys undertaken by a train in
@@ -147,10 +212,9 @@ class PickleDataReader(object):
       rfr_mdl <string>: <""|"_wonps_wdts">
       train <string>: A five digit train number eg. "12307"
     """
-    rmse_list = pickle.load(
-        open(self._pdpath+"rfr_model_pickle_data/rmse_of_jrny_wise_lms_pred"+
-        "_"+group+"_trains_"+str(n)+"ps"+rfr_mdl+"/Train_"+train+"_jw_rmse.p",
-        "rb"))
+    rmse_list = self._load_pickle_data(
+        "rfr_model_pickle_data/rmse_of_jrny_wise_lms_pred"+
+        "_"+group+"_trains_"+str(n)+"ps"+rfr_mdl+"/Train_"+train+"_jw_rmse.p")
     return rmse_list
 
   def get_all_trains_inline_stations_dict(self):
@@ -158,6 +222,18 @@ class PickleDataReader(object):
     Returns a dict of key as train number and values as a list of stations
     inline in its journey.
     """
-    train_stns_dict = pickle.load(
-        open(self._pdpath+"trains_inline_stations_dict.p", "rb"))
+    train_stns_dict = self._load_pickle_data("trains_inline_stations_dict.p")
     return train_stns_dict
+
+  def get_tde_prediction_table_dict(self, mdl, n):
+    """
+    Returns a dict of precomputed predicted late minutes of all trains for all
+    months and weekdays, created by "tde_service/build_prediction_table.py".
+
+    Args:
+      mdl <string>: <"rfr">
+      n <int>: N in N-OMLMPF with which late minutes were predicted.
+    """
+    tde_prediction_table = self._load_pickle_data(
+        "tde_prediction_table_"+mdl+"_"+str(n)+"ps.p")
+    return tde_prediction_table
@@ -0,0 +1,225 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file reads (and writes) the station registry. The registry assigns
+#       a dense integer ID to each station code in the station pickle dicts
+#       (coordinates, degree strength, traffic strength and label encoding), and
+#       keeps their values as numpy arrays indexed by the station IDs. So the
+#       station attributes of many stations are resolved by integer indexing
+#       instead of per station dict lookups.
+#
+#       The registry is saved as typed numpy files in "pickle_data/
+#       station_registry/" (memory mapped while reading) by executing
+#       `python create_pickle_data.py station_registry`. If it is not saved or
+#       the station pickle dicts have changed since, it is built from them.
+#
+
+import numpy as np
+import os
+import pandas as pd
+import pickle
+import threading
+
+# Station pickle dicts (relative to pickle_data directory) of the registry.
+STATION_DICT_FILES = ["station_to_lat_lng_dict.p",
+                      "station_degree_strength_dict.p",
+                      "station_traffic_strength_dict.p",
+                      "label_encodings/all_stations_label_encoding_dict.p"]
+
+# Attribute arrays of the registry, and the "has_*" arrays of stations having
+# the attribute (the missing values are 0 in attribute arrays).
+ATTRIBUTES = ["lat", "lon", "deg", "tfc", "label"]
+HAS_ATTRIBUTES = ["has_coordinates", "has_deg", "has_tfc", "has_label"]
+
+def _get_attribute_arrays_tuple(codes, attr_dict, dtype=None):
+  """
+  Returns a tuple of (values array, has value array) of the attribute dict in
+  order of the station codes.
+
+  Args:
+    codes <[string]>: Station codes in order of their IDs.
+    attr_dict <dict>: Station (key) vs attribute value.
+    dtype <numpy.dtype>: dtype of the values array, default is the dtype of all
+                         the values in attr_dict.
+  """
+  if dtype is None:
+    dtype = np.array(list(attr_dict.values())).dtype
+  values = np.zeros(len(codes), dtype=dtype)
+  has_value = np.zeros(len(codes), dtype=bool)
+  for stn_id, stn in enumerate(codes):
+    if stn in attr_dict:
+      values[stn_id] = attr_dict[stn]
+      has_value[stn_id] = True
+  return values, has_value
+
+def get_station_registry_arrays_dict(pdr):
+  """
+  Returns a dict of array name vs numpy array of the station registry built
+  from the station pickle dicts. "codes" are the station codes in order of IDs.
+
+  Args:
+    pdr <PickleDataReader()>: Reader of the station pickle dicts.
+  """
+  coordinates = pdr.get_station_coordinates_dict()
+  deg_strength = pdr.get_station_degree_strength_dict()
+  tfc_strength = pdr.get_station_traffic_strength_dict()
+  station_labels = pdr.get_labenc_station_dict()
+  codes = sorted(set(coordinates) | set(deg_strength) | set(tfc_strength) |
+                 set(station_labels))
+
+  arrays = {"codes": np.array(codes, dtype=str)}
+  arrays["lat"], arrays["has_coordinates"] = _get_attribute_arrays_tuple(
+      codes, dict((stn, ll[0]) for stn, ll in coordinates.items()), np.float64)
+  arrays["lon"], _ = _get_attribute_arrays_tuple(
+      codes, dict((stn, ll[1]) for stn, ll in coordinates.items()), np.float64)
+  arrays["deg"], arrays["has_deg"] = _get_attribute_arrays_tuple(
+      codes, deg_strength)
+  arrays["tfc"], arrays["has_tfc"] = _get_attribute_arrays_tuple(
+      codes, tfc_strength)
+  arrays["label"], arrays["has_label"] = _get_attribute_arrays_tuple(
+      codes, station_labels)
+  return arrays
+
+def _get_station_dict_files_stat_list(pdpath):
+  """
+  Returns a list of (mtime, size) of the station pickle dicts.
+
+  Args:
+    pdpath <string>: Path to the pickle_data directory.
+  """
+  stat_list = []
+  for file_name in STATION_DICT_FILES:
+    stat = os.stat(pdpath+file_name)
+    stat_list.append((stat.st_mtime, stat.st_size))
+  return stat_list
+
+def write_station_registry(pdr, registry_dir):
+  """
+  Builds the station registry from the station pickle dicts, saves it in
+  registry_dir and returns the number of stations in it.
+
+  Args:
+    pdr <PickleDataReader()>: Reader of the station pickle dicts.
+    registry_dir <string>: The directory where the registry is to be saved.
+  """
+  if not os.path.isdir(registry_dir):
+    os.makedirs(registry_dir)
+  arrays = get_station_registry_arrays_dict(pdr)
+  for name, values in arrays.items():
+    np.save(os.path.join(registry_dir, name+".npy"), values)
+  meta = {"num_stations": arrays["codes"].size,
+          "source_stat": _get_station_dict_files_stat_list(pdr._pdpath)}
+  with open(os.path.join(registry_dir, "meta.p"), "wb") as f:
+    pickle.dump(meta, f, protocol=2)
+  return arrays["codes"].size
+
+class StationRegistry(object):
+
+  def __init__(self, arrays):
+    """
+    Args:
+      arrays <dict>: Array name vs numpy array, refer
+                     `get_station_registry_arrays_dict()`.
+    """
+    self._arrays = arrays
+    self._codes = arrays["codes"]
+    self._codes_index = pd.Index(self._codes)
+
+  def get_num_stations(self):
+    """
+    Returns the number of stations in registry.
+    """
+    return self._codes.size
+
+  def get_station_id(self, station):
+    """
+    Returns the ID of the station code, raises KeyError if it is not in the
+    registry.
+
+    Args:
+      station <string>: A station code eg. "CNB".
+    """
+    return self._codes_index.get_loc(station)
+
+  def get_station_ids_array(self, stations):
+    """
+    Returns a numpy array of the IDs of the station codes, -1 for the stations
+    not in the registry.
+
+    Args:
+      stations <numpy.ndarray|[string]>: Station codes.
+    """
+    return self._codes_index.get_indexer(stations)
+
+  def get_station_code(self, stn_id):
+    """
+    Returns the station code of the ID.
+
+    Args:
+      stn_id <int>: A station ID.
+    """
+    return self._codes[stn_id]
+
+  def get_array(self, name):
+    """
+    Returns the numpy array (indexed by station IDs) of the registry.
+
+    Args:
+      name <string>: One of ATTRIBUTES, HAS_ATTRIBUTES or "codes".
+    """
+    return self._arrays[name]
+
+  def get_attribute_array(self, attr, has_attr, stations):
+    """
+    Returns a numpy array of the attribute values of the station codes, raises
+    KeyError for the first station not having the attribute.
+
+    Args:
+      attr <string>: One of ATTRIBUTES e.g. "deg".
+      has_attr <string>: The HAS_ATTRIBUTES array of attr e.g. "has_deg".
+      stations <numpy.ndarray|[string]>: Station codes.
+    """
+    stn_ids = self.get_station_ids_array(stations)
+    valid = stn_ids >= 0
+    valid[valid] = self._arrays[has_attr][stn_ids[valid]]
+    if not valid.all():
+      raise KeyError(np.asarray(stations)[np.argmin(valid)])
+    return self._arrays[attr][stn_ids]
+
+# Path of pickle_data directory vs its StationRegistry loaded in this process.
+_STATION_REGISTRIES = {}
+_STATION_REGISTRIES_LOCK = threading.Lock()
+
+def get_station_registry(pdr):
+  """
+  Returns the station registry of the reader's pickle_data directory, shared in
+  the process. The saved registry is memory mapped, it is built from the
+  station pickle dicts if it is not saved or is stale.
+
+  Args:
+    pdr <PickleDataReader()>: Reader of the station pickle dicts.
+  """
+  with _STATION_REGISTRIES_LOCK:
+    source_stat = _get_station_dict_files_stat_list(pdr._pdpath)
+    entry = _STATION_REGISTRIES.get(pdr._pdpath)
+    if entry is not None and entry[0] == source_stat:
+      return entry[1]
+
+    registry_dir = pdr._pdpath+"station_registry/"
+    meta_path = os.path.join(registry_dir, "meta.p")
+    arrays = None
+    if os.path.isfile(meta_path):
+      with open(meta_path, "rb") as f:
+        meta = pickle.load(f)
+      if meta["source_stat"] == source_stat:
+        arrays = dict((name, np.load(os.path.join(registry_dir, name+".npy"),
+                                     mmap_mode="r"))
+                      for name in ["codes"]+ATTRIBUTES+HAS_ATTRIBUTES)
+    if arrays is None:
+      arrays = get_station_registry_arrays_dict(pdr)
+
+    registry = StationRegistry(arrays)
+    _STATION_REGISTRIES[pdr._pdpath] = (source_stat, registry)
+    return registry
@@ -23,39 +23,155 @@
 #                       models. This can be done in function:
 #                       "remove_unwanted_columns_df()" in "utilities/tt_utils.py".
 #
+#       The stations are trained concurrently in a pool of processes, where the
+#       cores are split between stations and the jobs of each station's model
+#       depending on its number of training rows. Optionally the number of cores
+#       and the memory cap (in GB) of the stations trained concurrently can be
+#       passed, e.g.:
+#       python rfr_stn_models_training_file.py 1 16 48
+#
+#       The models and "stations_having_<n>ps_models.p" are written atomically,
+#       the latter after all the stations are trained. A station's compact model
+#       (refer "export_compact_models.py") is re-exported if it exists, rebuild
+#       the model archives (refer "create_model_archive.py") after training.
+#
+#       To train all the 1..5 previous station models of each station in one
+#       run, execute:
+#       python rfr_stn_models_training_file.py all [cores] [mem_gb]
+#
+#       where each station's wide data frame (refer "create_training_data.py")
+#       is read and label encoded once, and the data frame of each n is derived
+#       from it by selecting its rows and columns.
+#
 
 import joblib
-import pickle
+import os
 import sys
 
 from sklearn.ensemble import RandomForestRegressor as RFR
 from sklearn.metrics import mean_squared_error
 
+from utilities.compact_forest import write_compact_forest
 from utilities.tt_utils import TrainingTestUtils as TTU
+from utilities.training_pool import (StationTrainingPool, atomic_dump,
+    get_station_memory_bytes, get_station_n_jobs, pickle_dump)
 
-if __name__ == "__main__":
-  n = int(sys.argv[1]) # Get the n in "n previous station"
-  ttu = TTU()
-  stns = ttu._pdr.get_all_52trains_stations()
-  stns_having_model = [] # Stations having n prev stations RFR models
+N_ESTIMATORS = 1000 # Number of trees in each station's random forest.
+
+N_LIST_ALL = [1, 2, 3, 4, 5] # Values of n trained by "all".
+
+def get_station_training_jobs_list(ttu, stns, n, num_cores, wide=False):
+  """
+  Returns a list of training jobs (refer `StationTrainingPool.run()`) of the
+  stations having training data.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    stns <[string]>: Station codes whose models are to be trained.
+    n <int>: n in n-previous-station models.
+    num_cores <int>: Number of cores available for training.
+    wide <bool>: If True, the jobs train all the 1..n previous station models
+                 of stations from their wide data frames.
+  """
+  num_cols = len(ttu._tdfu._get_column_names_list(n))
+  jobs = []
   for s in stns:
+    num_rows = ttu._cdr.get_n_prev_station_num_rows(s, "training", n, wide)
+    if num_rows:
+      # With wide, the models are fit one after the other, hence the memory of
+      # the largest one (1 previous station model has all the rows).
+      jobs.append({"station": s, "n": n, "wide": wide,
+                   "n_jobs": get_station_n_jobs(num_rows, num_cores),
+                   "memory_bytes": get_station_memory_bytes(
+                       num_rows, num_cols, N_ESTIMATORS)})
+  return jobs
+
+def fit_station_model(ttu, s, n, df, n_jobs, print_n=False, model=None):
+  """
+  Trains the RFR model of a station on its label encoded n previous station
+  data frame, saves it and returns its RMSE on training data.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    s <string>: The station code.
+    n <int>: n in n-previous-station models.
+    df <pandas.DataFrame>: The label encoded n previous station data frame.
+    n_jobs <int>: Number of jobs (cores) to fit the model.
+    print_n <bool>: If True, n is printed along with the station and RMSE.
+    model <RFR()>: If passed, this (warm started) model is fit instead of a new
+                   one, i.e. only its trees beyond the already fit ones are fit.
+  """
+  target_late_mins = df.pop("crnt_stn_late_mins")
+
+  # Remove unwanted columns from the data frame
+  df = ttu.remove_unwanted_columns_df(df, n)
+
+  if model is None:
+    model = RFR(n_estimators=N_ESTIMATORS, n_jobs=n_jobs, warm_start=True)
+  else:
+    model.set_params(n_jobs=n_jobs)
+  model.fit(df, target_late_mins)
+  pred_lms = model.predict(df)
+  RMSE = mean_squared_error(target_late_mins, pred_lms)**0.5
+  # Print a station's line at once, as stations are trained concurrently.
+  sys.stdout.write("%s %s\n" % (s+" "+str(n) if print_n else s, RMSE))
+  sys.stdout.flush()
+
+  atomic_dump(joblib.dump, model, ttu._model_path + "rfr_models/" + str(n) +
+              "ps_rfr_labenc_models/" + s + "_label_encoding_model.sav")
+  # Re-export the compact model if it is in use, so that it is not stale.
+  cf_path = ttu._get_station_model_file_path(s, n, "rfr", "compact")
+  if os.path.isfile(cf_path):
+    atomic_dump(write_compact_forest, model, cf_path)
+  return RMSE
+
+def train_station_model(ttu, job):
+  """
+  Trains the RFR model(s) of a job's station, saves them and returns a dict of
+  n vs RMSE on training data.
+
+  Args:
+    ttu <TTU()>: An object of TrainingTestUtils
+    job <dict>: A training job, refer `get_station_training_jobs_list()`.
+  """
+  s, n = job["station"], job["n"]
+  if not job["wide"]:
     df = ttu._cdr.get_n_prev_station_csv_df(s, "training", n)
     df = ttu._get_labenc_station_df(df, n)
+    return {n: fit_station_model(ttu, s, n, df, job["n_jobs"])}
 
+  wide_df = ttu._cdr.get_n_prev_station_csv_df(s, "training", n, wide=True)
+  wide_df = ttu._get_labenc_station_df(wide_df, n, allow_missing=True)
+  rmses = {}
+  for k in range(1, n+1):
+    df = ttu.get_labenc_station_df_from_wide_df(wide_df, k)
     if not df.empty:
-      stns_having_model.append(s)
-      target_late_mins = df.pop("crnt_stn_late_mins")
-
-      # Remove unwanted columns from the data frame
-      df = ttu.remove_unwanted_columns_df(df, n)
-
-      model = RFR(n_estimators=1000, n_jobs=-1, warm_start=True)
-      model.fit(df, target_late_mins)
-      pred_lms = model.predict(df)
-      RMSE = mean_squared_error(target_late_mins, pred_lms)**0.5
-      print s, RMSE
-
-      joblib.dump(model, ttu._model_path + "rfr_models/" + str(n) +
-                  "ps_rfr_labenc_models/" + s + "_label_encoding_model.sav")
-  pickle.dump(stns_having_model, open(ttu._pdr._pdpath+
-      "stations_having_"+str(n)+"ps_models.p", "wb"))
+      rmses[k] = fit_station_model(ttu, s, k, df, job["n_jobs"], True)
+  return rmses
+
+if __name__ == "__main__":
+  # Get the n in "n previous station", or "all" for all the values of n.
+  wide = sys.argv[1] == "all"
+  n = max(N_LIST_ALL) if wide else int(sys.argv[1])
+  num_cores = int(sys.argv[2]) if len(sys.argv) > 2 else None
+  max_memory_bytes = (int(float(sys.argv[3]) * 1024**3)
+                      if len(sys.argv) > 3 else None)
+  ttu = TTU()
+  pool = StationTrainingPool(num_cores, max_memory_bytes)
+  stns = ttu._pdr.get_all_52trains_stations()
+  jobs = get_station_training_jobs_list(ttu, stns, n, pool.get_num_cores(),
+                                        wide)
+  results = pool.run(jobs, lambda job: train_station_model(ttu, job))
+
+  # n vs stations having n prev stations RFR models.
+  n_list = N_LIST_ALL if wide else [n]
+  stns_having_model = dict((k, []) for k in n_list)
+  for s in stns:
+    if s in results and results[s][0]:
+      for k in results[s][1]:
+        stns_having_model[k].append(s)
+    elif s in results:
+      print "Training failed for station:", s, results[s][1]
+  for k in n_list:
+    atomic_dump(pickle_dump, stns_having_model[k], ttu._pdr._pdpath +
+                "stations_having_"+str(k)+"ps_models.p")
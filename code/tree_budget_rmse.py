@@ -0,0 +1,67 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: This file measures the RMSE of the predicted late minutes of the Known
+#       Trains' "known_test" journeys versus the number of trees of the RFR
+#       station models used to predict them (mean of the first k trees), to
+#       choose a tree budget for the TDE Service (refer "tde_service/env.py").
+#
+#       To run this file execute:
+#       python tree_budget_rmse.py rfr 1
+#
+#       where "1" can be <1|2|3|4|5> as per the value of n in n-OMLMPF. The
+#       journeys are predicted in lockstep (refer "known_trains_lms_pred.py")
+#       once for each number of trees in TREE_COUNTS (up to the number of trees
+#       in the models), or for the passed comma separated numbers of trees e.g.
+#       python tree_budget_rmse.py rfr 1 10,50,100
+#
+#       Prints the number of trees, RMSE over all the stations of all journeys,
+#       mean of journey wise RMSEs, and the prediction time in seconds (which
+#       includes loading the models not in the model cache).
+#
+
+import numpy as np
+import sys
+import time
+
+from known_trains_lms_pred import get_lockstep_predicted_journeys_list
+from utilities.tt_utils import TrainingTestUtils as TTU
+
+TREE_COUNTS = [1, 5, 10, 25, 50, 100, 200, 500, 1000]
+
+def get_rmse_tuple(journeys):
+  """
+  Returns a tuple of (RMSE over all the stations of all journeys, mean of
+  journey wise RMSEs) of the predicted late minutes.
+
+  Args:
+    journeys <[dict]>: Journeys returned by
+                       `get_lockstep_predicted_journeys_list()`.
+  """
+  sq_errors, jrny_rmses = [], []
+  for jrny in journeys:
+    jrny_sq_errors = (np.asarray(jrny["sj_df"]["latemin"], dtype=np.float64) -
+                      np.asarray(jrny["pred_late_mins_sj"]))**2
+    sq_errors.append(jrny_sq_errors)
+    jrny_rmses.append(jrny_sq_errors.mean()**0.5)
+  return np.concatenate(sq_errors).mean()**0.5, np.mean(jrny_rmses)
+
+if __name__ == "__main__":
+  mdl = sys.argv[1]
+  n = int(sys.argv[2])
+  tree_counts = ([int(k) for k in sys.argv[3].split(",")]
+                 if len(sys.argv) > 3 else TREE_COUNTS)
+  ttu = TTU()
+  trains52 = ttu._pdr.get_all_trains()[:52] # Known Trains.
+  stns = ttu._pdr.get_stations_having_nps_model_list(1)
+  num_trees = ttu.get_station_model_num_trees(stns[0], 1, mdl)
+
+  print "trees rmse mean_journey_rmse secs"
+  for k in sorted(set(min(k, num_trees) for k in tree_counts)):
+    start_time = time.time()
+    journeys = get_lockstep_predicted_journeys_list(
+        ttu, trains52, "known_test", mdl, n, k)
+    secs = time.time() - start_time
+    print k, "%.3f %.3f %.2f" % (get_rmse_tuple(journeys) + (secs, ))
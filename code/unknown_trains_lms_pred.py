@@ -77,6 +77,7 @@ def get_journey_wise_late_mins_of_unknown_trains(
     actual_late_mins_sj = sj_df["latemin"]
     pred_late_mins_sj = [0] # Assuming 0 late mins for source station
     num_of_unknown_stns = 0
+    row_builder = ttu.get_journey_row_builder(train_num, sj_df)
     # Uncomment the following lines in `if else` case accordingly as per value
     # of N in N-OMLMPF. If N is chosen to be 3, it implies we will consider only
     # 3-previous-station models of suitable stations to predict the late minutes.\
@@ -94,7 +95,7 @@ def get_journey_wise_late_mins_of_unknown_trains(
             nn_stns = ttu.get_station_nearest_neighbors_list(stn, 1, nn)
             stn = nn_stns[0] # Choose the 1st nearest neighbor station
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 1, stn, pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 1, stn, pred_late_mins_sj, j, mdl, row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 2 or n == 2): # valid for only 2 previous station
@@ -105,7 +106,7 @@ def get_journey_wise_late_mins_of_unknown_trains(
             nn_stns = ttu.get_station_nearest_neighbors_list(stn, 2, nn)
             stn = nn_stns[0] # Choose the 1st nearest neighbor station
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 2, stn, pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 2, stn, pred_late_mins_sj, j, mdl, row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 3 or n == 3): # valid for only 3 previous station
@@ -116,7 +117,7 @@ def get_journey_wise_late_mins_of_unknown_trains(
             nn_stns = ttu.get_station_nearest_neighbors_list(stn, 3, nn)
             stn = nn_stns[0] # Choose the 1st nearest neighbor station
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 3, stn, pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 3, stn, pred_late_mins_sj, j, mdl, row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 4 or n == 4): # valid for only 4 previous station
@@ -127,7 +128,7 @@ def get_journey_wise_late_mins_of_unknown_trains(
             nn_stns = ttu.get_station_nearest_neighbors_list(stn, 4, nn)
             stn = nn_stns[0] # Choose the 1st nearest neighbor station
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 4, stn, pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 4, stn, pred_late_mins_sj, j, mdl, row_builder)
           pred_late_mins_sj.append(plm)
           continue
         if (j == 5 or n == 5): # rest stations valid for only 5 previous station
@@ -138,7 +139,7 @@ def get_journey_wise_late_mins_of_unknown_trains(
             nn_stns = ttu.get_station_nearest_neighbors_list(stn, 5, nn)
             stn = nn_stns[0] # Choose the 1st nearest neighbor station
           plm = ttu.get_predicted_late_mins_at_station_float(train_num, sj_df,
-              j+source_rows[i], 5, stn, pred_late_mins_sj, j, mdl)
+              j+source_rows[i], 5, stn, pred_late_mins_sj, j, mdl, row_builder)
           pred_late_mins_sj.append(plm)
           continue
 
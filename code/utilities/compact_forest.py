@@ -0,0 +1,316 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides a compact on-disk format of the trained Random Forest Regressor
+#       models and a pure numpy predictor of it. A pickled sklearn forest keeps
+#       a lot of objects per tree which are not needed for prediction, while the
+#       compact format keeps only contiguous arrays of all the trees' nodes:
+#
+#       header: magic, version, number of features, trees, max depth and nodes.
+#       roots <int32>: Node index of each tree's root.
+#       feature <int32>, threshold <float32>: Split of each node, a row goes to
+#                                             left child if its feature value
+#                                             <= threshold.
+#       left, right <int32>: Children node indices of each node. The leaves
+#                            point to themselves, so all the rows can be moved
+#                            max depth levels down without checking for leaves.
+#       value <float32>: Predicted value at each node (used only at leaves).
+#
+#       sklearn compares float32 feature values with float64 thresholds, so the
+#       thresholds are rounded down to the float32 just below them which keeps
+#       the same splits. Only the float32 leaf values differ from sklearn's
+#       predictions, within 1e-6 relative.
+#
+#       The compact models are created by "export_compact_models.py" and are
+#       loaded via mmap, i.e. only their pages in use are read from disk and
+#       they are shared between processes.
+#
+
+import mmap
+import numpy as np
+import struct
+
+MAGIC = "TDECF\x00\x00\x00"
+VERSION = 1
+HEADER_FORMAT = "<8sIIIIQ" # magic, version, features, trees, max depth, nodes.
+HEADER_BYTES = struct.calcsize(HEADER_FORMAT)
+# Name and dtype of the node arrays in order of their placement after roots.
+NODE_ARRAYS = [("feature", np.int32), ("threshold", np.float32),
+               ("left", np.int32), ("right", np.int32), ("value", np.float32)]
+# Maximum number of (row, tree) nodes traversed at once while predicting.
+MAX_BLOCK_NODES = 2**20
+
+def _get_aligned_offset(offset):
+  """
+  Returns the offset rounded up to a multiple of 8 bytes.
+
+  Args:
+    offset <int>: A byte offset.
+  """
+  return (offset + 7) // 8 * 8
+
+def _get_float32_thresholds_array(thresholds):
+  """
+  Returns the float32 thresholds which split the float32 values same as the
+  float64 thresholds, i.e. the largest float32 <= each threshold.
+
+  Args:
+    thresholds <numpy.ndarray>: float64 thresholds of sklearn tree nodes.
+  """
+  thresholds_32 = thresholds.astype(np.float32)
+  rounded_up = thresholds_32.astype(np.float64) > thresholds
+  thresholds_32[rounded_up] = np.nextafter(thresholds_32[rounded_up],
+                                           np.float32(-np.inf))
+  return thresholds_32
+
+def get_compact_forest_arrays_dict(model):
+  """
+  Returns a dict of array name vs numpy array (refer the file description) of
+  all the trees in the trained forest, along with "n_features" and "max_depth".
+  Raises ValueError if model is not a trained forest of regression trees.
+
+  Args:
+    model <RandomForestRegressor()>: A trained sklearn forest.
+  """
+  if not hasattr(model, "estimators_"):
+    raise ValueError("Not a trained forest: %s" % type(model).__name__)
+
+  roots, node_arrays, num_nodes, max_depth = [], dict(
+      (name, []) for name, _ in NODE_ARRAYS), 0, 0
+  for estimator in model.estimators_:
+    tree = estimator.tree_
+    if tree.n_outputs != 1:
+      raise ValueError("Only single output trees are supported.")
+    node_ids = np.arange(tree.node_count)
+    is_leaf = tree.children_left < 0
+    roots.append(num_nodes)
+    node_arrays["feature"].append(np.where(is_leaf, 0, tree.feature))
+    node_arrays["threshold"].append(np.where(
+        is_leaf, 0, _get_float32_thresholds_array(tree.threshold)))
+    node_arrays["left"].append(
+        num_nodes + np.where(is_leaf, node_ids, tree.children_left))
+    node_arrays["right"].append(
+        num_nodes + np.where(is_leaf, node_ids, tree.children_right))
+    node_arrays["value"].append(tree.value[:, 0, 0])
+    num_nodes += tree.node_count
+    max_depth = max(max_depth, tree.max_depth)
+
+  arrays = {"roots": np.array(roots, dtype=np.int32),
+            "n_features": model.n_features_, "max_depth": max_depth}
+  for name, dtype in NODE_ARRAYS:
+    arrays[name] = np.concatenate(node_arrays[name]).astype(dtype)
+  return arrays
+
+def get_compact_forest_bytes(model):
+  """
+  Returns the trained forest in compact format as a byte string.
+
+  Args:
+    model <RandomForestRegressor()>: A trained sklearn forest.
+  """
+  arrays = get_compact_forest_arrays_dict(model)
+  chunks = [struct.pack(HEADER_FORMAT, MAGIC, VERSION, arrays["n_features"],
+                        arrays["roots"].size, arrays["max_depth"],
+                        arrays["value"].size)]
+  nbytes = HEADER_BYTES
+  for name in ["roots"] + [name for name, _ in NODE_ARRAYS]:
+    chunks.append("\x00" * (_get_aligned_offset(nbytes) - nbytes))
+    chunks.append(arrays[name].tobytes())
+    nbytes = _get_aligned_offset(nbytes) + arrays[name].nbytes
+  return "".join(chunks)
+
+def write_compact_forest(model, file_path):
+  """
+  Writes the trained forest in compact format to the file and returns the
+  number of bytes written.
+
+  Args:
+    model <RandomForestRegressor()>: A trained sklearn forest.
+    file_path <string>: Path of the compact model file.
+  """
+  compact_bytes = get_compact_forest_bytes(model)
+  with open(file_path, "wb") as f:
+    f.write(compact_bytes)
+  return len(compact_bytes)
+
+class CompactForest(object):
+
+  def __init__(self, buf, offset=0):
+    """
+    Args:
+      buf <buffer>: A buffer (e.g. mmap or bytes) having a compact model, its
+                    arrays are read from it without copying.
+      offset <int>: Byte offset of the compact model in buf.
+    """
+    magic, version, self._n_features, n_trees, self._max_depth, n_nodes = (
+        struct.unpack_from(HEADER_FORMAT, buf, offset))
+    if magic != MAGIC or version != VERSION:
+      raise ValueError("Not a compact forest of version %s." % VERSION)
+
+    self._buf = buf # Keep the buffer (mmap) alive along with its arrays.
+    array_offset = _get_aligned_offset(offset + HEADER_BYTES)
+    self._roots = np.frombuffer(buf, np.int32, n_trees, array_offset)
+    array_offset += self._roots.nbytes
+    for name, dtype in NODE_ARRAYS:
+      array_offset = _get_aligned_offset(array_offset)
+      node_array = np.frombuffer(buf, dtype, n_nodes, array_offset)
+      setattr(self, "_"+name, node_array)
+      array_offset += node_array.nbytes
+    self._nbytes = array_offset - offset
+
+  def get_num_trees(self):
+    """
+    Returns the number of trees in the forest.
+    """
+    return self._roots.size
+
+  def get_nbytes(self):
+    """
+    Returns the number of bytes of the compact model.
+    """
+    return self._nbytes
+
+  def predict(self, X, max_trees=None):
+    """
+    Returns the numpy array of predictions (mean of all trees) of the rows,
+    same as `RandomForestRegressor.predict()`.
+
+    Args:
+      X <pandas.DataFrame|numpy.ndarray>: The rows (2D) to be predicted, with
+                                          columns in order of training.
+      max_trees <int>: If passed, predictions are the mean of only the first
+                       max_trees trees (a cheaper estimate), default all.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim != 2 or X.shape[1] != self._n_features:
+      raise ValueError("Expected rows of %s features, got shape %s." % (
+                       self._n_features, X.shape))
+
+    roots = self._roots[:max_trees]
+    predictions = np.empty(X.shape[0], dtype=np.float64)
+    block_rows = max(1, MAX_BLOCK_NODES // roots.size)
+    for start in range(0, X.shape[0], block_rows):
+      X_block = X[start:start+block_rows]
+      rows = np.arange(X_block.shape[0])[:, np.newaxis]
+      # (row, tree) vs current node, all the rows move down all the trees at
+      # once one level at a time.
+      nodes = np.repeat(roots[np.newaxis, :], X_block.shape[0], axis=0)
+      for _ in range(self._max_depth):
+        go_left = X_block[rows, self._feature.take(nodes)] <= (
+            self._threshold.take(nodes))
+        nodes = np.where(go_left, self._left.take(nodes),
+                         self._right.take(nodes))
+      predictions[start:start+block_rows] = self._value.take(nodes).mean(
+          axis=1, dtype=np.float64)
+    return predictions
+
+class ForestBatchEvaluator(object):
+
+  def __init__(self, forests):
+    """
+    Compiles the compact forests (e.g. the models of all the stations at a
+    step of lockstep prediction) into a single node space, so that a block of
+    rows each needing a different forest is predicted at once.
+
+    Args:
+      forests <dict>: Key (e.g. station code) vs its CompactForest.
+    """
+    self._keys = list(forests.keys())
+    self._key_ids = dict((key, i) for i, key in enumerate(self._keys))
+    forests = [forests[key] for key in self._keys]
+    max_trees = max(forest._roots.size for forest in forests)
+    num_nodes = 1 + sum(forest._value.size for forest in forests)
+    # Node indices are looked up as 2*node+1 in the children array.
+    self._index_dtype = np.int32 if 2*num_nodes < 2**31 else np.int64
+
+    # Node 0 is a leaf of value 0, the forests having less than max_trees trees
+    # are padded with it so that the roots of all forests form a table.
+    self._roots = np.zeros((len(forests), max_trees), dtype=self._index_dtype)
+    self._feature = np.zeros(num_nodes, dtype=self._index_dtype)
+    self._threshold = np.zeros(num_nodes, dtype=np.float32)
+    self._value = np.zeros(num_nodes, dtype=np.float32)
+    # Right and left child of each node interleaved, so that the next node is
+    # a single lookup of 2*node + (1 if row goes left else 0).
+    self._children = np.zeros(2*num_nodes, dtype=self._index_dtype)
+    offset = 1
+    for i, forest in enumerate(forests):
+      end = offset + forest._value.size
+      self._roots[i, :forest._roots.size] = forest._roots + offset
+      self._feature[offset:end] = forest._feature
+      self._threshold[offset:end] = forest._threshold
+      self._value[offset:end] = forest._value
+      self._children[2*offset:2*end:2] = forest._right + offset
+      self._children[2*offset+1:2*end:2] = forest._left + offset
+      offset = end
+
+    self._n_trees = np.array([forest._roots.size for forest in forests],
+                             dtype=np.float64)
+    self._n_features = np.array([forest._n_features for forest in forests])
+    self._max_depth = max(forest._max_depth for forest in forests)
+
+  def get_keys_list(self):
+    """
+    Returns the keys of the compiled forests.
+    """
+    return list(self._keys)
+
+  def predict(self, X, keys, max_trees=None):
+    """
+    Returns the numpy array of predictions of the rows, each by the forest of
+    its key. All the rows move down all the trees of their forests at once one
+    level at a time, and a block stops early if all its rows reach the leaves.
+
+    Args:
+      X <numpy.ndarray>: The rows (2D) to be predicted. The rows of a forest
+                         having fewer features than the columns in X are
+                         padded at the end (with any value).
+      keys <list>: Key of the forest of each row.
+      max_trees <int>: If passed, predictions are the mean of only the first
+                       max_trees trees of each forest, default all.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    forest_ids = np.array([self._key_ids[key] for key in keys], dtype=np.int64)
+    if X.ndim != 2 or X.shape[0] != forest_ids.size:
+      raise ValueError("Expected %s rows, got shape %s." % (
+                       forest_ids.size, X.shape))
+    if forest_ids.size and self._n_features[forest_ids].max() > X.shape[1]:
+      raise ValueError("Expected rows of at least %s features, got %s." % (
+                       self._n_features[forest_ids].max(), X.shape[1]))
+
+    roots = self._roots[:, :max_trees]
+    n_trees = (self._n_trees if max_trees is None
+               else np.minimum(self._n_trees, max_trees))
+    predictions = np.empty(X.shape[0], dtype=np.float64)
+    block_rows = max(1, MAX_BLOCK_NODES // roots.shape[1])
+    for start in range(0, X.shape[0], block_rows):
+      X_block = np.ascontiguousarray(X[start:start+block_rows]).ravel()
+      block_forest_ids = forest_ids[start:start+block_rows]
+      # Offset of each row in the flattened block, added to features' indices.
+      row_offsets = (np.arange(block_forest_ids.size, dtype=self._index_dtype)
+                     * X.shape[1])[:, np.newaxis]
+      nodes = roots.take(block_forest_ids, axis=0)
+      for level in range(self._max_depth):
+        go_left = (X_block.take(row_offsets + self._feature.take(nodes)) <=
+                   self._threshold.take(nodes))
+        next_nodes = self._children.take((nodes << 1) + go_left)
+        # Check for leaves only every few levels, it costs as much as a level.
+        if level % 4 == 3 and (next_nodes == nodes).all():
+          break
+        nodes = next_nodes
+      predictions[start:start+block_rows] = (
+          self._value.take(nodes).sum(axis=1, dtype=np.float64) /
+          n_trees[block_forest_ids])
+    return predictions
+
+def load_compact_forest(file_path):
+  """
+  Returns the CompactForest of the compact model file, memory mapped.
+
+  Args:
+    file_path <string>: Path of the compact model file.
+  """
+  with open(file_path, "rb") as f:
+    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  return CompactForest(buf)
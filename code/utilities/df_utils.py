@@ -10,11 +10,15 @@
 # modules namely pickle_data_reader and csv_data_reader.
 from env import *
 
+import numpy as np
 import pickle
 import pandas as pd
 
+from collections import OrderedDict
+
 from pickle_data_reader import PickleDataReader as PDR
 from csv_data_reader import CSVDataReader as CDR
+from station_registry import get_station_registry
 
 class TrainDataFrameUtils(object):
 
@@ -26,8 +30,9 @@ class TrainDataFrameUtils(object):
     Args:
       train_num <string>: A five digit train number e.g. "12307"
     """
-    self._pdr = PDR(data_path)
-    self._cdr = CDR(data_path)
+    self._pdr = PDR(data_path, cached=True)
+    self._cdr = CDR(data_path, csv_data_backend)
+    self._stn_registry = get_station_registry(self._pdr)
 
   def _generate_train_type_str(self, train_num):
     """
@@ -377,3 +382,203 @@ class TrainDataFrameUtils(object):
     column_names_list.extend(self._get_crnt_stn_late_mins_col_names_list())
 
     return column_names_list
+
+  def _get_n_prev_stn_positions_array(self, rows, n):
+    """
+    Returns a sorted numpy array of unique positions (in a single journey data
+    frame) of the current stations in `rows` and their n previous stations.
+
+    Args:
+      rows <numpy.ndarray>: Positions of the current stations.
+      n <int>: Number of previous stations.
+    """
+    return np.unique(np.concatenate([rows-i for i in range(n+1)]))
+
+  def _get_stn_strength_array(self, strength, stn_codes, positions):
+    """
+    Returns a numpy array of the station strengths of the stations at the
+    passed `positions` in `stn_codes` (in order of positions). Raises KeyError
+    if a station at those positions does not have the strength.
+
+    Args:
+      strength <string>: <"deg"|"tfc"> for degree or traffic strength.
+      stn_codes <numpy.ndarray>: Station codes of a single journey.
+      positions <numpy.ndarray>: Sorted positions at which strengths are
+                                 required.
+    """
+    return self._stn_registry.get_attribute_array(
+        strength, "has_"+strength, stn_codes[positions])
+
+  def generate_n_prev_stn_features_dict(self, train_num, sj_df, n, rows=None):
+    """
+    Returns an ordered dict of column names (in order of columns returned by
+    `_get_column_names_list(n)`) vs numpy arrays of the features of the current
+    stations at `rows` of a single journey data frame. The features are
+    obtained by shifting the journey's columns, hence the cost is a few numpy
+    operations per journey instead of per row and per previous station lookups.
+
+    Args:
+      train_num <string>: A five digit train number e.g. "12307"
+      sj_df <pandas.DataFrame>: A single journey data frame.
+      n <int>: Number of previous stations.
+      rows <[int]>: Positions (0 based, not index labels) of the current
+                    stations in sj_df. Default is all the positions having n
+                    previous stations i.e. n, n+1, ... till end of journey.
+    """
+    if rows is None:
+      rows = np.arange(n, sj_df.shape[0])
+    rows = np.asarray(rows, dtype=np.int64)
+    if rows.size and rows.min() < n:
+      # Previous stations do not exist, same as the missing row index labels.
+      raise KeyError(
+          "Less than %s previous stations to row %s" % (n, rows.min()))
+
+    stn_codes = sj_df["station_code"].values
+    distance = sj_df["distance"].values
+    late_mins = sj_df["latemin"].values
+    # Strengths are looked up only at the positions of required stations, and
+    # `pos` maps a journey position to its index in these strength arrays.
+    positions = self._get_n_prev_stn_positions_array(rows, n)
+    def pos(p):
+      return np.searchsorted(positions, p)
+    deg = self._get_stn_strength_array("deg", stn_codes, positions)
+    tfc = self._get_stn_strength_array("tfc", stn_codes, positions)
+    num_rows = rows.size
+
+    features_dict = OrderedDict()
+    # train_type. zone. is_superfast, month, weekday
+    features_dict["train_type"] = np.repeat(
+        self._generate_train_type_str(train_num), num_rows).astype(object)
+    features_dict["zone"] = np.repeat(
+        self._generate_zone_str(train_num), num_rows).astype(object)
+    features_dict["is_superfast"] = np.repeat(
+        self._is_superfast_str(train_num), num_rows)
+    features_dict["month"] = sj_df["month"].values[rows]
+    features_dict["weekday"] = sj_df["weekday"].values[rows]
+    # n_prev_station
+    for i in range(n):
+      features_dict[str(i+1)+"_prev_station"] = stn_codes[rows-(i+1)]
+    # n_ps_late_mins
+    for i in range(n):
+      features_dict[str(i+1)+"_ps_late_mins"] = late_mins[rows-(i+1)]
+    # dist_bwn_stn_n-1_n
+    for i in range(n):
+      features_dict["dist_bwn_stn_"+str(i)+"_"+str(i+1)] = (
+          distance[rows-i] - distance[rows-(i+1)])
+    # stn_n_dist_frm_src
+    for i in range(n):
+      features_dict["stn_"+str(i+1)+"_dist_frm_src"] = distance[rows-(i+1)]
+    # tfc_of_stn_n
+    for i in range(n):
+      features_dict["tfc_of_stn_"+str(i+1)] = tfc[pos(rows-(i+1))]
+    # deg_of_stn_n
+    for i in range(n):
+      features_dict["deg_of_stn_"+str(i+1)] = deg[pos(rows-(i+1))]
+    # crnt_stn_tfc, crnt_stn_deg, crnt_stn_dist_frm_src, crnt_stn_late_mins
+    features_dict["crnt_stn_tfc"] = tfc[pos(rows)]
+    features_dict["crnt_stn_deg"] = deg[pos(rows)]
+    features_dict["crnt_stn_dist_frm_src"] = distance[rows]
+    features_dict["crnt_stn_late_mins"] = late_mins[rows]
+
+    return features_dict
+
+  def generate_n_prev_stn_features_df(self, train_num, sj_df, n, rows=None):
+    """
+    Returns a data frame with columns as returned by `_get_column_names_list(n)`
+    of the current stations at `rows` of the single journey data frame. Refer
+    `generate_n_prev_stn_features_dict()` for more info.
+
+    Args:
+      train_num <string>: A five digit train number e.g. "12307"
+      sj_df <pandas.DataFrame>: A single journey data frame.
+      n <int>: Number of previous stations.
+      rows <[int]>: Positions (0 based) of the current stations in sj_df.
+    """
+    return pd.DataFrame(
+        self.generate_n_prev_stn_features_dict(train_num, sj_df, n, rows),
+        columns=self._get_column_names_list(n))
+
+  def generate_n_prev_stn_wide_features_df(self, train_num, sj_df, n):
+    """
+    Returns a wide data frame with columns as returned by
+    `_get_column_names_list(n)` of all the stations having at least one
+    previous station in the single journey. The features of ith previous
+    station are NaN for the stations having less than i previous stations. The
+    rows of the stations having k (<= n) previous stations, projected to the
+    columns of `_get_column_names_list(k)`, are same as the data frame returned
+    by `generate_n_prev_stn_features_df()` for k.
+
+    Args:
+      train_num <string>: A five digit train number e.g. "12307"
+      sj_df <pandas.DataFrame>: A single journey data frame.
+      n <int>: Maximum number of previous stations.
+    """
+    rows = np.arange(1, sj_df.shape[0])
+    features_dict = self.generate_n_prev_stn_features_dict(
+        train_num, sj_df, 1, rows)
+    for i in range(2, n+1):
+      i_rows = rows[rows >= i] # A suffix of rows.
+      i_features_dict = self.generate_n_prev_stn_features_dict(
+          train_num, sj_df, i, i_rows)
+      for col in self._get_column_names_list(i):
+        if col in features_dict:
+          continue # Not a feature of ith previous station.
+        values = i_features_dict[col]
+        wide_values = np.full(
+            rows.size, np.nan,
+            dtype=object if values.dtype == object else np.float64)
+        wide_values[rows.size-i_rows.size:] = values
+        features_dict[col] = wide_values
+    return pd.DataFrame(features_dict, columns=self._get_column_names_list(n))
+
+  def generate_train_n_prev_stn_wide_features_tuple(self, train_num, train_df,
+                                                    n):
+    """
+    Returns a tuple of (wide features data frame, current station codes array)
+    of all the stations having at least one previous station in all the
+    journeys of the train. Refer `generate_n_prev_stn_wide_features_df()`.
+
+    Args:
+      train_num <string>: A five digit train number e.g. "12307"
+      train_df <pandas.DataFrame>: A train's data frame of all its journeys.
+      n <int>: Maximum number of previous stations.
+    """
+    features_dfs, crnt_stns = [], []
+    source_rows = train_df[train_df.scharr=="Source"].index.tolist()
+    for i in range(len(source_rows)):
+      sj_df = self._generate_single_journey_df(train_df, i, source_rows)
+      features_dfs.append(
+          self.generate_n_prev_stn_wide_features_df(train_num, sj_df, n))
+      crnt_stns.append(sj_df["station_code"].values[1:])
+
+    if not features_dfs:
+      return (pd.DataFrame([], columns=self._get_column_names_list(n)),
+              np.array([], dtype=object))
+    return (pd.concat(features_dfs, ignore_index=True),
+            np.concatenate(crnt_stns))
+
+  def generate_train_n_prev_stn_features_tuple(self, train_num, train_df, n):
+    """
+    Returns a tuple of (features data frame, current station codes array) of
+    all the stations having n previous stations in all the journeys of the
+    train. The train data frame is split by journeys so that the previous
+    stations never cross the journey boundaries.
+
+    Args:
+      train_num <string>: A five digit train number e.g. "12307"
+      train_df <pandas.DataFrame>: A train's data frame of all its journeys.
+      n <int>: Number of previous stations.
+    """
+    features_dfs, crnt_stns = [], []
+    source_rows = train_df[train_df.scharr=="Source"].index.tolist()
+    for i in range(len(source_rows)):
+      sj_df = self._generate_single_journey_df(train_df, i, source_rows)
+      features_dfs.append(
+          self.generate_n_prev_stn_features_df(train_num, sj_df, n))
+      crnt_stns.append(sj_df["station_code"].values[n:])
+
+    if not features_dfs:
+      return (pd.DataFrame([], columns=self._get_column_names_list(n)),
+              np.array([], dtype=object))
+    return (pd.concat(features_dfs, ignore_index=True),
+            np.concatenate(crnt_stns))
@@ -31,3 +31,13 @@ data_path = project_dir_path+"data/"
 
 # Insert the path to the trained models of stations (output) directory.
 models_path =  project_dir_path+"models/"
+
+# Backend of CSV data reader <"csv"|"store">. With "store", the csv files
+# converted by "create_journey_store.py" are read from the columnar journey
+# store, rest are read as csv files.
+csv_data_backend = "store"
+
+# Format of the saved station models loaded for prediction <"sav"|"compact">.
+# With "compact", the models exported by "export_compact_models.py" are memory
+# mapped and predicted by numpy, instead of unpickling the sklearn models.
+station_model_format = "sav"
@@ -0,0 +1,114 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides a builder of the rows (feature vectors) passed to the station
+#       models while predicting the late minutes of a single journey station by
+#       station. All the features of a station except the late minutes at its
+#       previous stations (which are the predicted ones) are known before the
+#       prediction starts. So they are computed and label encoded once for the
+#       complete journey, and each prediction step only writes the n previous
+#       stations' late minutes in a preallocated numpy row.
+#
+
+import numpy as np
+
+class JourneyRowBuilder(object):
+
+  def __init__(self, ttu, train_num, sj_df):
+    """
+    Args:
+      ttu <TrainingTestUtils()>: An object of TrainingTestUtils, whose feature
+                                 generation, label encoding and removal of
+                                 unwanted columns is used to build the rows.
+      train_num <string>: A five digit train number eg. "12307".
+      sj_df <pandas.DataFrame>: A single journey data frame.
+    """
+    self._ttu = ttu
+    self._train_num = train_num
+    self._sj_df = sj_df
+    # n vs tuple of (static features array, array of journey position vs row in
+    # static features array (-1 for invalid rows), indices of n previous
+    # stations' late minutes columns, preallocated row).
+    self._n_blocks = {}
+
+  def _get_valid_rows_list(self, rows, n):
+    """
+    Returns the journey positions out of `rows` whose features can be generated
+    i.e. all of whose n previous stations have degree and traffic strengths.
+
+    Args:
+      rows <[int]>: Positions (0 based) of the current stations in sj_df.
+      n <int>: Number of previous stations.
+    """
+    valid_rows = []
+    for row in rows:
+      try:
+        self._ttu._tdfu.generate_n_prev_stn_features_dict(
+            self._train_num, self._sj_df, n, [row])
+        valid_rows.append(row)
+      except KeyError:
+        pass
+    return valid_rows
+
+  def _get_n_block_tuple(self, n):
+    """
+    Returns the tuple of static features of all the stations having n previous
+    stations in the journey, computing it on first use. Refer `__init__()`.
+
+    Args:
+      n <int>: Number of previous stations.
+    """
+    if n in self._n_blocks:
+      return self._n_blocks[n]
+
+    tdfu = self._ttu._tdfu
+    rows = range(n, self._sj_df.shape[0])
+    try:
+      df = tdfu.generate_n_prev_stn_features_df(
+          self._train_num, self._sj_df, n, rows)
+    except KeyError:
+      # Some station does not have strengths, find the rows not affected by it.
+      rows = self._get_valid_rows_list(rows, n)
+      df = tdfu.generate_n_prev_stn_features_df(
+          self._train_num, self._sj_df, n, rows)
+
+    mask = self._ttu._labenc.get_encodable_rows_mask(df, n)
+    rows = np.asarray(rows, dtype=np.int64)[mask]
+    df = df[mask].reset_index(drop=True)
+    df = self._ttu._get_labenc_station_df(df, n)
+    temp = df.pop("crnt_stn_late_mins")
+    df = self._ttu.remove_unwanted_columns_df(df, n)
+
+    row_of_position = np.full(self._sj_df.shape[0], -1, dtype=np.int64)
+    row_of_position[rows] = np.arange(rows.size)
+    lag_cols = np.array([df.columns.get_loc(str(i+1)+"_ps_late_mins")
+                         for i in range(n)])
+    self._n_blocks[n] = (df.values.astype(np.float64), row_of_position,
+                         lag_cols, np.empty((1, df.shape[1])))
+    return self._n_blocks[n]
+
+  def get_row_array(self, j, n, pred_lms_sj):
+    """
+    Returns a single row 2D numpy array of the station at position j in the
+    journey, to be passed to its n previous station model. The late minutes at
+    its n previous stations are set as the predicted ones. The returned array is
+    overwritten by the next call with same n, copy it if required.
+
+    Raises KeyError if the station's features can not be generated or encoded,
+    same as `TrainingTestUtils.generate_row_df()`.
+
+    Args:
+      j <int>: The current station's position (0 based) in the journey.
+      n <int>: Number of previous stations.
+      pred_lms_sj <list>: Predicted Late Minutes list of the journey.
+    """
+    static_arr, row_of_position, lag_cols, row = self._get_n_block_tuple(n)
+    if j < n or j >= row_of_position.size or row_of_position[j] < 0:
+      raise KeyError("No valid row of %s previous stations at %s" % (n, j))
+
+    row[0] = static_arr[row_of_position[j]]
+    for i in range(n):
+      row[0, lag_cols[i]] = pred_lms_sj[j-(i+1)]
+    return row
@@ -0,0 +1,145 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides the label encoding of the categorical variables of station
+#       data frames (train_type, zone, month, weekday and n previous stations),
+#       shared by training, cross validation and prediction. The label encoding
+#       dicts are compiled once into code tables, and a complete column is
+#       encoded by a single array lookup.
+#
+
+import numpy as np
+import pandas as pd
+
+class LabelEncodingUtils(object):
+
+  def __init__(self, pdr):
+    """
+    Args:
+      pdr <PickleDataReader()>: Reader of the label encoding dicts.
+    """
+    self._pdr = pdr
+    # Categorical variable vs tuple of (label encoding dict, index of its keys,
+    # array of its labels in order of the index).
+    self._code_tables = {}
+
+  def _get_labenc_dict(self, cat_var):
+    """
+    Returns the label encoding dict of the categorical variable.
+
+    Args:
+      cat_var <string>: "train_type", "zone", "month", "weekday" or
+                        "<i>_prev_station".
+    """
+    if cat_var == "train_type":
+      return self._pdr.get_labenc_train_type_dict()
+    if cat_var == "zone":
+      return self._pdr.get_labenc_zone_dict()
+    if cat_var == "month":
+      return self._pdr.get_labenc_month_dict()
+    if cat_var == "weekday":
+      return self._pdr.get_labenc_weekday_dict()
+    return self._pdr.get_labenc_station_dict()
+
+  def _get_code_table_tuple(self, cat_var):
+    """
+    Returns the tuple of (index of categories, array of their labels) of the
+    categorical variable, compiled again only if its label encoding dict has
+    changed.
+
+    Args:
+      cat_var <string>: Refer `_get_labenc_dict()`.
+    """
+    cat_var_key = "station" if cat_var.endswith("_prev_station") else cat_var
+    cat_var_dict = self._get_labenc_dict(cat_var)
+    code_table = self._code_tables.get(cat_var_key)
+    if code_table is None or code_table[0] is not cat_var_dict:
+      categories = list(cat_var_dict.keys())
+      code_table = (cat_var_dict, pd.Index(categories),
+                    np.array([cat_var_dict[ctg] for ctg in categories]))
+      self._code_tables[cat_var_key] = code_table
+    return code_table[1], code_table[2]
+
+  def get_labenc_cat_vars_list(self, n):
+    """
+    Returns the categorical variables (columns) of an n previous station data
+    frame in order of their encoding. Each encoded column is moved to the front
+    of data frame, hence the encoded data frame's columns start with n..1
+    previous stations, weekday, month, zone and train_type. The trained models
+    expect this column layout.
+
+    Args:
+      n <int>: The n in "n previous stations" data frame.
+    """
+    return (["train_type", "zone", "month", "weekday"] +
+            [str(i+1)+"_prev_station" for i in range(n)])
+
+  def get_labenc_column_names_list(self, column_names_list, n):
+    """
+    Returns the column names of the label encoded data frame of n previous
+    stations. Refer `get_labenc_cat_vars_list()`.
+
+    Args:
+      column_names_list <[string]>: Columns of the data frame before encoding.
+      n <int>: The n in "n previous stations" data frame.
+    """
+    cat_vars = self.get_labenc_cat_vars_list(n)
+    return cat_vars[::-1] + [col for col in column_names_list
+                             if col not in cat_vars]
+
+  def get_labenc_array(self, cat_var, values, allow_missing=False):
+    """
+    Returns the numpy array of label encodings of the values of a categorical
+    variable. Raises KeyError for a value not having a label encoding.
+
+    Args:
+      cat_var <string>: Refer `_get_labenc_dict()`.
+      values <numpy.ndarray|pandas.Series>: Values of the categorical variable.
+      allow_missing <bool>: If True, the missing (NaN) values are encoded as
+                            NaN (in a float array) instead of raising KeyError.
+    """
+    categories, labels = self._get_code_table_tuple(cat_var)
+    positions = categories.get_indexer(values)
+    missing = (pd.isnull(values) if allow_missing
+               else np.zeros(positions.size, dtype=bool))
+    if ((positions < 0) & ~missing).any():
+      raise KeyError(np.asarray(values)[np.argmax((positions < 0) & ~missing)])
+    if missing.any():
+      labenc_array = labels[positions].astype(np.float64)
+      labenc_array[missing] = np.nan
+      return labenc_array
+    return labels[positions]
+
+  def get_encodable_rows_mask(self, df, n):
+    """
+    Returns a boolean array of the rows of data frame whose categorical
+    variables all have a label encoding.
+
+    Args:
+      df <pandas.DataFrame>: The n previous station data frame.
+      n <int>: The n in "n previous stations" data frame.
+    """
+    mask = np.ones(df.shape[0], dtype=bool)
+    for cat_var in self.get_labenc_cat_vars_list(n):
+      categories, labels = self._get_code_table_tuple(cat_var)
+      mask &= categories.get_indexer(df[cat_var]) >= 0
+    return mask
+
+  def encode_station_df(self, df, n, allow_missing=False):
+    """
+    Label encodes the categorical variables of the data frame in place, and
+    returns it. Refer `get_labenc_cat_vars_list()` for its column layout.
+
+    Args:
+      df <pandas.DataFrame>: The n previous station data frame.
+      n <int>: The n in "n previous stations" data frame.
+      allow_missing <bool>: Refer `get_labenc_array()`.
+    """
+    for cat_var in self.get_labenc_cat_vars_list(n):
+      labenc_array = self.get_labenc_array(cat_var, df[cat_var].values,
+                                           allow_missing)
+      del df[cat_var]
+      df.insert(0, cat_var, labenc_array)
+    return df
@@ -0,0 +1,235 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides a packed archive of the station models of a (mdl, n, variant)
+#       e.g. all the 1ps RFR "sav" models, instead of one file per station. The
+#       archive starts with a header index of station vs (offset, length,
+#       crc32) of its model's bytes, followed by the models' bytes (each at an
+#       offset aligned to 8 bytes). The archive is memory mapped, so a station's
+#       model is read directly at its offset and the archive's pages are shared
+#       between processes.
+#
+#       The "sav" models are unpickled from their bytes (checked against their
+#       crc32), while the "compact" models (refer "compact_forest.py") are read
+#       in place without copying (checked only on verifying the archive).
+#
+#       A station's model file modified after the archive was built (e.g. on
+#       retraining) is newer than the archive, hence its archived model is
+#       stale, refer `ModelArchive.is_station_stale()`.
+#
+#       Archives are created and verified by "create_model_archive.py".
+#
+
+import joblib
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from io import BytesIO
+
+from compact_forest import CompactForest
+
+MAGIC = "TDEMA\x00\x00\x00"
+VERSION = 1
+HEADER_FORMAT = "<8sI8sI" # magic, version, variant, number of stations.
+HEADER_BYTES = struct.calcsize(HEADER_FORMAT)
+ENTRY_FORMAT = "<16sQQI" # station, offset, length, crc32.
+ENTRY_BYTES = struct.calcsize(ENTRY_FORMAT)
+COPY_BLOCK_BYTES = 1024**2 # Bytes copied at once while writing an archive.
+VARIANTS = ["sav", "compact"]
+
+def _get_aligned_offset(offset):
+  """
+  Returns the offset rounded up to a multiple of 8 bytes.
+
+  Args:
+    offset <int>: A byte offset.
+  """
+  return (offset + 7) // 8 * 8
+
+def write_model_archive(station_files_list, variant, archive_path):
+  """
+  Writes the archive of the model files atomically and returns the number of
+  bytes written. The model files are streamed into it, never loaded at once.
+
+  Args:
+    station_files_list <[(string, string)]>: List of (station, model file path).
+    variant <string>: <"sav"|"compact"> Format of the model files.
+    archive_path <string>: Path of the archive.
+  """
+  if variant not in VARIANTS:
+    raise ValueError("Unknown model variant: %s" % variant)
+  entries = [] # List of (station, offset, length, crc32).
+  offset = _get_aligned_offset(HEADER_BYTES +
+                               ENTRY_BYTES * len(station_files_list))
+  tmp_archive_path = "%s.%s.tmp" % (archive_path, os.getpid())
+  try:
+    with open(tmp_archive_path, "wb") as archive:
+      archive.write("\x00" * offset) # Header is written after the models.
+      for station, file_path in station_files_list:
+        if len(station) > 16:
+          raise ValueError("Station code longer than 16 bytes: %s" % station)
+        crc, length = 0, 0
+        with open(file_path, "rb") as f:
+          while True:
+            block = f.read(COPY_BLOCK_BYTES)
+            if not block:
+              break
+            archive.write(block)
+            crc, length = zlib.crc32(block, crc), length + len(block)
+        entries.append((station, offset, length, crc & 0xffffffff))
+        archive.write("\x00" * (_get_aligned_offset(offset + length) -
+                                offset - length))
+        offset = _get_aligned_offset(offset + length)
+
+      archive.seek(0)
+      archive.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, variant,
+                                len(entries)))
+      for entry in entries:
+        archive.write(struct.pack(ENTRY_FORMAT, *entry))
+    os.rename(tmp_archive_path, archive_path)
+  finally:
+    if os.path.exists(tmp_archive_path):
+      os.remove(tmp_archive_path)
+  return offset
+
+class ModelArchive(object):
+
+  def __init__(self, archive_path):
+    """
+    Args:
+      archive_path <string>: Path of the archive, it is memory mapped.
+    """
+    self._archive_path = archive_path
+    with open(archive_path, "rb") as f:
+      self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      self._mtime = os.fstat(f.fileno()).st_mtime
+    magic, version, variant, num_stations = struct.unpack_from(
+        HEADER_FORMAT, self._mm, 0)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError("Not a model archive of version %s: %s" % (
+                       VERSION, archive_path))
+    self._variant = variant.rstrip("\x00")
+    # Station vs tuple of (offset, length, crc32) of its model.
+    self._index = {}
+    for i in range(num_stations):
+      station, offset, length, crc = struct.unpack_from(
+          ENTRY_FORMAT, self._mm, HEADER_BYTES + i * ENTRY_BYTES)
+      self._index[station.rstrip("\x00")] = (offset, length, crc)
+
+  def get_variant(self):
+    """
+    Returns the variant <"sav"|"compact"> of the archived models.
+    """
+    return self._variant
+
+  def get_mtime(self):
+    """
+    Returns the modification time of the archive, i.e. when it was built.
+    """
+    return self._mtime
+
+  def is_station_stale(self, station, file_path):
+    """
+    Returns True if the station's model file is newer than the archive, i.e.
+    the archived model is not of the latest (e.g. retrained) model.
+
+    Args:
+      station <string>: Station Code eg. "CNB".
+      file_path <string>: Path of the station's model file.
+    """
+    try:
+      return (self.has_station(station) and
+              os.path.getmtime(file_path) > self._mtime)
+    except OSError:
+      return False
+
+  def get_stations_list(self):
+    """
+    Returns the stations having models in the archive, in order of offsets.
+    """
+    return sorted(self._index, key=lambda station: self._index[station][0])
+
+  def has_station(self, station):
+    """
+    Returns True if the station's model is in the archive.
+
+    Args:
+      station <string>: Station Code eg. "CNB".
+    """
+    return station in self._index
+
+  def get_model_length(self, station):
+    """
+    Returns the number of bytes of the station's model.
+
+    Args:
+      station <string>: Station Code eg. "CNB".
+    """
+    return self._index[station][1]
+
+  def _get_model_bytes(self, station):
+    """
+    Returns a copy of the station's model bytes, raises ValueError if their
+    crc32 does not match the index.
+
+    Args:
+      station <string>: Station Code eg. "CNB".
+    """
+    offset, length, crc = self._index[station]
+    model_bytes = self._mm[offset:offset+length]
+    if zlib.crc32(model_bytes) & 0xffffffff != crc:
+      raise ValueError("Checksum mismatch of station %s in %s" % (
+                       station, self._archive_path))
+    return model_bytes
+
+  def load_model(self, station):
+    """
+    Returns the model of the station, raises KeyError if it is not archived.
+
+    Args:
+      station <string>: Station Code eg. "CNB".
+    """
+    if self._variant == "compact":
+      return CompactForest(self._mm, self._index[station][0])
+    return joblib.load(BytesIO(self._get_model_bytes(station)))
+
+  def get_corrupt_stations_list(self):
+    """
+    Returns the stations whose model bytes do not match their crc32.
+    """
+    corrupt_stations = []
+    for station in self.get_stations_list():
+      try:
+        self._get_model_bytes(station)
+      except ValueError:
+        corrupt_stations.append(station)
+    return corrupt_stations
+
+# Path of archive vs tuple of ((mtime, size) of archive, its ModelArchive)
+# opened in this process.
+_MODEL_ARCHIVES = {}
+_MODEL_ARCHIVES_LOCK = threading.Lock()
+
+def get_model_archive(archive_path):
+  """
+  Returns the ModelArchive of the path shared in the process, reopened if the
+  archive has been rebuilt since. Returns None if there is no archive.
+
+  Args:
+    archive_path <string>: Path of the archive.
+  """
+  try:
+    stat = os.stat(archive_path)
+  except OSError:
+    return None
+  with _MODEL_ARCHIVES_LOCK:
+    entry = _MODEL_ARCHIVES.get(archive_path)
+    if entry is None or entry[0] != (stat.st_mtime, stat.st_size):
+      entry = ((stat.st_mtime, stat.st_size), ModelArchive(archive_path))
+      _MODEL_ARCHIVES[archive_path] = entry
+    return entry[1]
@@ -0,0 +1,160 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides a bounded LRU cache of loaded station models, so that repeated
+#       and concurrent predictions reuse the models already in memory instead
+#       of deserializing them from disk every time.
+#
+
+import joblib
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+# Default maximum number of models kept in memory by the shared model cache.
+DEFAULT_MAX_MODELS = 32
+
+class ModelCache(object):
+
+  def __init__(self, max_models=DEFAULT_MAX_MODELS, max_memory_bytes=None):
+    """
+    Initializes an empty LRU cache of models.
+
+    Args:
+      max_models <int>: Maximum number of models to keep in memory, None for no
+                        limit on number of models.
+      max_memory_bytes <int>: Maximum resident memory (in bytes) of all the
+                              models in cache, None for no limit. Resident
+                              memory of a model is estimated as the size of its
+                              saved file on disk.
+    """
+    self._max_models = max_models
+    self._max_memory_bytes = max_memory_bytes
+    # Key vs tuple of (model, estimated resident bytes), in LRU order.
+    self._models = OrderedDict()
+    # Key vs threading.Event of the models being loaded currently.
+    self._loading = {}
+    self._lock = threading.Lock()
+    self._resident_bytes = 0
+    self._stats = {"hits": 0, "misses": 0, "evictions": 0, "loads": 0,
+                   "load_secs": 0.0}
+
+  def set_bounds(self, max_models=DEFAULT_MAX_MODELS, max_memory_bytes=None):
+    """
+    Sets the bounds of the cache, evicting the models if required.
+
+    Args:
+      max_models <int>: Maximum number of models to keep in memory.
+      max_memory_bytes <int>: Maximum resident memory (in bytes) of models.
+    """
+    with self._lock:
+      self._max_models = max_models
+      self._max_memory_bytes = max_memory_bytes
+      self._evict_models()
+
+  def _evict_models(self):
+    """
+    Evicts the least recently used models until the cache is within its
+    bounds. The most recently used model is never evicted. Must be called with
+    the lock held.
+    """
+    while len(self._models) > 1 and (
+        (self._max_models is not None and
+         len(self._models) > self._max_models) or
+        (self._max_memory_bytes is not None and
+         self._resident_bytes > self._max_memory_bytes)):
+      key, (model, model_bytes) = self._models.popitem(last=False)
+      self._resident_bytes -= model_bytes
+      self._stats["evictions"] += 1
+
+  def get_model(self, key, model_file_path, loader=joblib.load,
+                model_bytes=None):
+    """
+    Returns the model of `key` from the cache, else loads it from the
+    `model_file_path` and caches it. If the same model is being loaded by
+    another thread, waits for it instead of loading it again.
+
+    Args:
+      key <tuple>: A key of the model e.g. ("rfr", 1, "CNB").
+      model_file_path <string>: Path of the saved model file.
+      loader <function>: Function which loads the model from the file path.
+      model_bytes <int>: Size of the saved model, default is the size of file
+                         at model_file_path (e.g. passed for archived models).
+    """
+    while True:
+      with self._lock:
+        if key in self._models:
+          # Move the model to the end, i.e. mark it most recently used.
+          entry = self._models.pop(key)
+          self._models[key] = entry
+          self._stats["hits"] += 1
+          return entry[0]
+        loading_event = self._loading.get(key)
+        if loading_event is None:
+          loading_event = threading.Event()
+          self._loading[key] = loading_event
+          self._stats["misses"] += 1
+          break
+      # Another thread is loading this model, wait and look it up again.
+      loading_event.wait()
+
+    try:
+      start_time = time.time()
+      model = loader(model_file_path)
+      load_secs = time.time() - start_time
+      if model_bytes is None:
+        model_bytes = os.path.getsize(model_file_path)
+      with self._lock:
+        self._models[key] = (model, model_bytes)
+        self._resident_bytes += model_bytes
+        self._stats["loads"] += 1
+        self._stats["load_secs"] += load_secs
+        self._evict_models()
+    finally:
+      with self._lock:
+        del self._loading[key]
+      loading_event.set()
+    return model
+
+  def preload(self, keys_paths_list, loader=joblib.load):
+    """
+    Loads the models in cache, e.g. the models of most queried stations.
+
+    Args:
+      keys_paths_list <[(tuple, string)]>: A list of (key, model_file_path).
+      loader <function>: Function which loads the model from the file path.
+    """
+    for key, model_file_path in keys_paths_list:
+      self.get_model(key, model_file_path, loader)
+
+  def get_stats_dict(self):
+    """
+    Returns a dict of the cache's hits, misses, evictions, loads, total load
+    time (secs), number of cached models and their estimated resident bytes.
+    """
+    with self._lock:
+      stats = dict(self._stats)
+      stats["cached_models"] = len(self._models)
+      stats["resident_bytes"] = self._resident_bytes
+    return stats
+
+  def clear(self):
+    """
+    Removes all the models from the cache.
+    """
+    with self._lock:
+      self._models.clear()
+      self._resident_bytes = 0
+
+# Model cache shared by all the TrainingTestUtils objects in a process.
+_SHARED_MODEL_CACHE = ModelCache()
+
+def get_shared_model_cache():
+  """
+  Returns the process wide model cache.
+  """
+  return _SHARED_MODEL_CACHE
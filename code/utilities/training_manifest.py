@@ -0,0 +1,133 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides the content fingerprints of the trains' csv files and the
+#       stations' training data frames, and the manifest which records them as
+#       of the latest (incremental) training. It is used by
+#       "incremental_training.py" to find the station data frames to be
+#       regenerated and the station models to be refit on a new data drop.
+#
+#       A fingerprint is a dict of "sha1" (of the file's bytes), "nrows" (data
+#       rows i.e. lines excluding header) and "nbytes".
+#
+
+import hashlib
+import os
+import pickle
+
+from training_pool import atomic_dump, pickle_dump
+
+READ_BLOCK_BYTES = 1024**2 # Bytes read at once while hashing a file.
+
+def get_file_fingerprint_dict(file_path, nbytes=None):
+  """
+  Returns the fingerprint dict of the file, None if the file does not exist.
+
+  Args:
+    file_path <string>: Path of the csv file.
+    nbytes <int>: If passed, the fingerprint of only the first nbytes of file.
+  """
+  if not os.path.isfile(file_path):
+    return None
+  sha1, nlines, read_bytes = hashlib.sha1(), 0, 0
+  with open(file_path, "rb") as f:
+    while nbytes is None or read_bytes < nbytes:
+      block = f.read(READ_BLOCK_BYTES if nbytes is None else
+                     min(READ_BLOCK_BYTES, nbytes-read_bytes))
+      if not block:
+        break
+      sha1.update(block)
+      nlines += block.count("\n")
+      read_bytes += len(block)
+  return {"sha1": sha1.hexdigest(), "nrows": max(nlines-1, 0),
+          "nbytes": read_bytes}
+
+def is_appended_fingerprint(old_fingerprint, new_fingerprint, file_path):
+  """
+  Returns True if the file (with new_fingerprint) is the file with
+  old_fingerprint having new bytes appended to it.
+
+  Args:
+    old_fingerprint <dict>: An earlier fingerprint of the file.
+    new_fingerprint <dict>: The current fingerprint of the file.
+    file_path <string>: Path of the file.
+  """
+  if (old_fingerprint is None or new_fingerprint is None or
+      new_fingerprint["nbytes"] <= old_fingerprint["nbytes"]):
+    return False
+  return (get_file_fingerprint_dict(file_path, old_fingerprint["nbytes"]) ==
+          old_fingerprint)
+
+class TrainingManifest(object):
+
+  def __init__(self, manifest_path):
+    """
+    Args:
+      manifest_path <string>: Path of the manifest pickle file.
+    """
+    self._manifest_path = manifest_path
+    # "trains": (n, train number) vs tuple of (fingerprint of its csv file,
+    #           list of stations in it) as of the latest regeneration of n
+    #           previous station data frames.
+    # "stations": (n, station) vs fingerprint of the station's n previous
+    #             station data frame on which its model was latest fit.
+    self._manifest = {"trains": {}, "stations": {}}
+    if os.path.isfile(manifest_path):
+      with open(manifest_path, "rb") as f:
+        self._manifest = pickle.load(f)
+
+  def get_train_tuple(self, n, train_num):
+    """
+    Returns the recorded tuple of (fingerprint, stations list) of the train's
+    csv file as of the latest regeneration of n previous station data frames,
+    None if not recorded.
+
+    Args:
+      n <int>: n in n-previous-station models.
+      train_num <string>: A five digit train number eg. "12307".
+    """
+    return self._manifest["trains"].get((n, train_num))
+
+  def set_train_tuple(self, n, train_num, fingerprint, stations):
+    """
+    Records the fingerprint and stations of the train's csv file from which
+    the n previous station data frames are regenerated.
+
+    Args:
+      n <int>: n in n-previous-station models.
+      train_num <string>: A five digit train number eg. "12307".
+      fingerprint <dict>: Fingerprint of the train's csv file.
+      stations <[string]>: Stations in the train's csv file.
+    """
+    self._manifest["trains"][(n, train_num)] = (fingerprint, stations)
+
+  def get_station_fingerprint(self, n, station):
+    """
+    Returns the fingerprint of the station's n previous station data frame on
+    which its model was latest fit, None if not recorded.
+
+    Args:
+      n <int>: n in n-previous-station models.
+      station <string>: The station code.
+    """
+    return self._manifest["stations"].get((n, station))
+
+  def set_station_fingerprint(self, n, station, fingerprint):
+    """
+    Records the fingerprint of the station's n previous station data frame on
+    which its model is fit.
+
+    Args:
+      n <int>: n in n-previous-station models.
+      station <string>: The station code.
+      fingerprint <dict>: Fingerprint of the station's data frame.
+    """
+    self._manifest["stations"][(n, station)] = fingerprint
+
+  def save(self):
+    """
+    Saves the manifest atomically.
+    """
+    atomic_dump(pickle_dump, self._manifest, self._manifest_path)
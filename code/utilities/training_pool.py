@@ -0,0 +1,182 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Provides a pool of processes to train many station models at once. The
+#       cores are split between the stations trained concurrently and the jobs
+#       (n_jobs) of each station's model depending on its number of training
+#       rows, i.e. small stations are trained with one core each and many at a
+#       time, large stations with many cores. A station is started only if its
+#       estimated memory fits in the memory cap along with the running ones.
+#
+#       Each station is trained in a forked child process, so the data already
+#       loaded in parent (pickle data, station registry etc.) is shared.
+#
+
+import multiprocessing
+import os
+import pickle
+import Queue
+import traceback
+
+# Number of training rows per core (job) of a station model's fit.
+ROWS_PER_JOB = 5000
+
+# Estimated resident bytes of a trained tree per training row. A fully grown
+# tree on a bootstrap sample has nearly as many leaves as the distinct rows in
+# it, and each node takes nearly 64 bytes.
+TREE_BYTES_PER_ROW = 80
+
+def get_station_n_jobs(num_rows, num_cores):
+  """
+  Returns the number of jobs (cores) to fit a station model.
+
+  Args:
+    num_rows <int>: Number of training rows of the station.
+    num_cores <int>: Number of cores available for training.
+  """
+  return max(1, min(num_cores, num_rows // ROWS_PER_JOB))
+
+def get_station_memory_bytes(num_rows, num_cols, n_estimators):
+  """
+  Returns the estimated peak resident bytes to fit a station's random forest.
+
+  Args:
+    num_rows <int>: Number of training rows of the station.
+    num_cols <int>: Number of columns in the training data frame.
+    n_estimators <int>: Number of trees in the forest.
+  """
+  return (n_estimators * num_rows * TREE_BYTES_PER_ROW +
+          3 * num_rows * num_cols * 8) # Data frame and its copies in fit.
+
+def atomic_dump(dump_func, obj, file_path):
+  """
+  Dumps the object in a temporary file and renames it to file_path, so that
+  file_path is either the old file or the complete new file, never a partially
+  written one.
+
+  Args:
+    dump_func <function>: A function which dumps (obj, path) e.g. joblib.dump.
+    obj <object>: The object to be dumped.
+    file_path <string>: Path of the file.
+  """
+  tmp_file_path = "%s.%s.tmp" % (file_path, os.getpid())
+  try:
+    dump_func(obj, tmp_file_path)
+    os.rename(tmp_file_path, file_path)
+  finally:
+    if os.path.exists(tmp_file_path):
+      os.remove(tmp_file_path)
+
+def pickle_dump(obj, file_path):
+  """
+  Pickles the object in file_path, to be used with `atomic_dump()`.
+
+  Args:
+    obj <object>: The object to be pickled.
+    file_path <string>: Path of the file.
+  """
+  with open(file_path, "wb") as f:
+    pickle.dump(obj, f)
+
+class StationTrainingPool(object):
+
+  def __init__(self, num_cores=None, max_memory_bytes=None):
+    """
+    Args:
+      num_cores <int>: Number of cores to be used, default is all the cores.
+      max_memory_bytes <int>: Maximum estimated resident bytes of stations
+                              trained concurrently, None for no limit. A station
+                              estimated to need more is trained alone.
+    """
+    self._num_cores = num_cores or multiprocessing.cpu_count()
+    self._max_memory_bytes = max_memory_bytes
+
+  def get_num_cores(self):
+    """
+    Returns the number of cores used by the pool.
+    """
+    return self._num_cores
+
+  def _run_job(self, train_func, job, result_queue):
+    """
+    Runs the training function of a job in the child process and puts its
+    result (or error) in the result queue.
+    """
+    try:
+      result_queue.put((job["station"], True, train_func(job)))
+    except Exception:
+      result_queue.put((job["station"], False, traceback.format_exc()))
+
+  def _can_start(self, job, used_cores, used_memory, num_running):
+    """
+    Returns True if the job fits in the free cores and memory.
+    """
+    if num_running == 0:
+      return True
+    if used_cores + job["n_jobs"] > self._num_cores:
+      return False
+    return (self._max_memory_bytes is None or
+            used_memory + job["memory_bytes"] <= self._max_memory_bytes)
+
+  def run(self, jobs, train_func):
+    """
+    Trains the stations of the jobs and returns a dict of station vs tuple of
+    (True, result of train_func) or (False, error traceback string). The jobs
+    are started in decreasing order of their memory, so that the large stations
+    do not wait till the end.
+
+    Args:
+      jobs <[dict]>: A list of jobs, each job is a dict having "station",
+                     "n_jobs" (cores) and "memory_bytes" (estimated), along
+                     with any other info needed by train_func.
+      train_func <function>: A function which trains a job's station model (in
+                             a child process), its return value must be
+                             picklable.
+    """
+    pending = sorted(jobs, key=lambda job: job["memory_bytes"], reverse=True)
+    running = {} # Station vs tuple of (process, job).
+    results = {}
+    result_queue = multiprocessing.Queue()
+    used_cores, used_memory = 0, 0
+
+    while pending or running:
+      # Start all the pending jobs which fit in the free cores and memory.
+      for job in list(pending):
+        if self._can_start(job, used_cores, used_memory, len(running)):
+          process = multiprocessing.Process(
+              target=self._run_job, args=(train_func, job, result_queue))
+          process.start()
+          running[job["station"]] = (process, job)
+          used_cores += job["n_jobs"]
+          used_memory += job["memory_bytes"]
+          pending.remove(job)
+
+      try:
+        finished_results = [result_queue.get(timeout=1)]
+      except Queue.Empty:
+        # A child killed (e.g. out of memory) does not put its result. Check the
+        # exited children first, as their results (if any) are in queue then.
+        exited = [station for station, (process, job) in running.items()
+                  if not process.is_alive()]
+        finished_results = []
+        while True:
+          try:
+            finished_results.append(result_queue.get_nowait())
+          except Queue.Empty:
+            break
+        finished_stations = [station for station, _, _ in finished_results]
+        for station in exited:
+          if station not in finished_stations:
+            process = running[station][0]
+            finished_results.append((station, False, "Process exited with "
+                                     "code %s" % process.exitcode))
+
+      for station, ok, result in finished_results:
+        results[station] = (ok, result)
+        process, job = running.pop(station)
+        process.join()
+        used_cores -= job["n_jobs"]
+        used_memory -= job["memory_bytes"]
+    return results
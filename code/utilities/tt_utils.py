@@ -10,82 +10,84 @@
 from env import * # Import it first as it imports data_path and models_path.
 import joblib
 import numpy as np
+import os
 import pandas as pd
 import pickle
 
 from sklearn.metrics import mean_squared_error
 from sklearn.neighbors import NearestNeighbors as NN
 
+from compact_forest import (CompactForest, ForestBatchEvaluator,
+    load_compact_forest)
 from df_utils import TrainDataFrameUtils as TDFU
-from readers.pickle_data_reader import PickleDataReader as PDR
-from readers.csv_data_reader import CSVDataReader as CDR
+from journey_row_builder import JourneyRowBuilder
+from labenc_utils import LabelEncodingUtils
+from model_archive import get_model_archive
+from model_cache import get_shared_model_cache
+from pickle_data_reader import PickleDataReader as PDR
+from csv_data_reader import CSVDataReader as CDR
 
 
 class TrainingTestUtils(object):
 
-  def __init__(self):
-    self._tdfu = TDFU()
-    self._pdr = PDR(data_path)
-    self._cdr = CDR(data_path)
-    self._model_path = models_path
-    self._stn_geo_crdnates = self._pdr.get_station_coordinates_dict()
-    self._stn_deg_strength = self._pdr.get_station_degree_strength_dict()
-    self._stn_tfc_strength = self._pdr.get_station_traffic_strength_dict()
-
-  def _get_labenc_of_cat_var_df(self, df, cat_var, cat_var_dict):
+  def __init__(self, model_cache=None, model_format=None):
     """
-    Returns the station data frame where the "cat_var" column is the label
-    encoding of the categorial variables in passed station data frame "df"
-
     Args:
-      df <pandas.DataFrame>: The data frame whose categorical variables are to
-                             be encoded.
-      cat_var <string>: The column name of the categorical variables to be
-                        encoded eg. "train_type".
-      cat_var_dict <dict{}>: A python dictionary to provide label encodings for
-                             categorical variables.
-    """
-    l = []
-    cat_var_clmn = df[cat_var]
-    for ele in cat_var_clmn:
-      l.append(cat_var_dict[ele])
-    l = pd.DataFrame(l, columns=[cat_var])
-    temp = df.pop(cat_var)
-    df = pd.concat([l, df], axis=1)
-    return df
-
-  def _get_labenc_station_df(self, df, n):
+      model_cache <ModelCache()>: Cache of loaded station models, default is
+                                  the process wide shared model cache.
+      model_format <string>: <"sav"|"compact"> Format of the station models
+                             loaded for prediction, default is
+                             `station_model_format` in env.py. Refer
+                             "compact_forest.py".
+    """
+    self._tdfu = TDFU()
+    self._pdr = PDR(data_path, cached=True)
+    self._cdr = CDR(data_path, csv_data_backend)
+    self._labenc = LabelEncodingUtils(self._pdr)
+    self._model_path = models_path
+    self._stn_registry = self._tdfu._stn_registry
+    # Number of nearest neighbors vs its precomputed nearest neighbors table.
+    self._stn_nn_tables = {}
+    self._model_cache = (model_cache if model_cache is not None
+                         else get_shared_model_cache())
+    self._model_format = model_format or station_model_format
+    # Stale model sources already reported, refer `_get_station_model_source`.
+    self._reported_stale_sources = set()
+
+  def _get_labenc_station_df(self, df, n, allow_missing=False):
     """
     Returns the complete training data frame of a station where all its
-    categorical variables are encoded.
+    categorical variables are encoded (in place). Refer "labenc_utils.py".
 
     Args:
       df <pandas.DataFrame>: The data frame whose categorical variables are to
                              be label encoded.
       n <int>: The n in "n previous stations" data frame.
+      allow_missing <bool>: If True, missing values (e.g. previous stations in
+                            a wide data frame) are encoded as NaN.
     """
-    # Encode Train Type
-    train_type_dict = self._pdr.get_labenc_train_type_dict()
-    df = self._get_labenc_of_cat_var_df(df, "train_type", train_type_dict)
-
-    # Encode zone
-    zone_dict = self._pdr.get_labenc_zone_dict()
-    df = self._get_labenc_of_cat_var_df(df, "zone", zone_dict)
-
-    # Encode month
-    month_dict = self._pdr.get_labenc_month_dict()
-    df = self._get_labenc_of_cat_var_df(df, "month", month_dict)
+    return self._labenc.encode_station_df(df, n, allow_missing)
 
-    # Encode weekday
-    weekday_dict = self._pdr.get_labenc_weekday_dict()
-    df = self._get_labenc_of_cat_var_df(df, "weekday", weekday_dict)
+  def get_labenc_station_df_from_wide_df(self, labenc_wide_df, n):
+    """
+    Returns the label encoded n previous station data frame of a station,
+    derived from its label encoded wide data frame (refer
+    "create_training_data.py") by selecting the rows having n previous stations
+    and projecting the columns of n previous stations.
 
-    # Encode n previous stations
-    station_dict = self._pdr.get_labenc_station_dict()
+    Args:
+      labenc_wide_df <pandas.DataFrame>: The label encoded wide data frame of a
+                                         station, encoded with allow_missing.
+      n <int>: The n in "n previous stations" data frame.
+    """
+    columns = self._labenc.get_labenc_column_names_list(
+        self._tdfu._get_column_names_list(n), n)
+    rows = labenc_wide_df[str(n)+"_prev_station"].notnull().values
+    df = labenc_wide_df.loc[rows, columns].reset_index(drop=True)
+    # Previous stations are not missing in these rows, restore integer labels.
     for i in range(n):
-      df = self._get_labenc_of_cat_var_df(
-          df, str(i+1)+"_prev_station", station_dict)
-
+      df[str(i+1)+"_prev_station"] = (
+          df[str(i+1)+"_prev_station"].astype(np.int64))
     return df
 
   def generate_row_df(self, train_num, sj_df, j, n):
@@ -101,46 +103,9 @@ class TrainingTestUtils(object):
                stations' info is required.
       n <int>: Number of previous stations.
     """
-    column_names_list = self._tdfu._get_column_names_list(n)
-
-    # train_type. zone. is_superfast, month, weekday
-    feature_list = [self._tdfu._generate_train_type_str(train_num),
-         self._tdfu._generate_zone_str(train_num),
-         self._tdfu._is_superfast_str(train_num),
-         self._tdfu._generate_month_str(sj_df, j),
-         self._tdfu._generate_weekday_str(sj_df, j)]
-    # n_prev_station
-    feature_list.extend(
-        self._tdfu._generate_n_prev_station_codes_list(sj_df, j, n))
-    # n_ps_late_mins
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_late_mins_list(sj_df, j, n))
-    # dist_bwn_stn_n-1_n
-    feature_list.extend(
-        self._tdfu._generate_n_prev_dist_bwn_stn_list(sj_df, j, n))
-    # stn_n_dist_frm_src
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_dist_from_source_list(sj_df, j, n))
-    # tfc_of_stn_n
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_tfc_strength_list(sj_df, j, n))
-    # deg_of_stn_n
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_deg_strength_list(sj_df, j, n))
-    # crnt_stn_tfc
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_tfc_strength_list(sj_df, j, 0))
-    # crnt_stn_deg
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_deg_strength_list(sj_df, j, 0))
-    # crnt_stn_dist_frm_src
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_dist_from_source_list(sj_df, j, 0))
-    # crnt_stn_late_mins
-    feature_list.extend(
-        self._tdfu._generate_n_prev_stn_late_mins_list(sj_df, j, 0))
-
-    feature_list_df = pd.DataFrame([feature_list], columns=column_names_list)
+    # Obtain the features of the single current station at position of j.
+    feature_list_df = self._tdfu.generate_n_prev_stn_features_df(
+        train_num, sj_df, n, [sj_df.index.get_loc(j)])
     # Obtain the label encoded feature_list_df
     feature_list_df = self._get_labenc_station_df(feature_list_df, n)
     return feature_list_df
@@ -164,7 +129,8 @@ class TrainingTestUtils(object):
       temp = df.pop(str(k+1)+"_prev_station") # Remove station code names.
     return df
 
-  def get_predicted_late_mins_list(self, current_station, n, df, mdl):
+  def get_predicted_late_mins_list(self, current_station, n, df, mdl,
+                                   max_trees=None):
     """
     Returns the predicted late mins at the current_station.
 
@@ -173,18 +139,185 @@ class TrainingTestUtils(object):
                                 eg. "CNB", used to choose the RFR model.
       n <int>: Number of previous station to the current_station to choose the
                RFR model.
-      df <pandas.DataFrame>: The data frame of current_station to predict late
-                             minutes at it.
+      df <pandas.DataFrame|numpy.ndarray>: The data frame (or rows) of
+                             current_station to predict late minutes at it.
       mdl <string>: <"rfr"|"lmr"|"nnr">
                     "rfr": Random Forest Regressor Models.
                     "lmr": Linear Model Regressor Models (not reliable).
                     "nnr": Neural Network Regressor Models (not converged).
+      max_trees <int>: If passed, the late mins are the mean of predictions of
+                       only the first max_trees trees of the RFR model, which
+                       is cheaper but less accurate. Refer "tree_budget_rmse.py"
+                       for RMSE vs number of trees. Default all the trees.
+    """
+    model = self._load_station_model(current_station, n, mdl)
+    if isinstance(model, CompactForest):
+      return model.predict(df, max_trees)
+    if (max_trees is None or
+        max_trees >= len(getattr(model, "estimators_", []))):
+      return model.predict(df)
+    # The trees of a prefix are predicted one by one, which is slower per tree
+    # than `predict()` of all the trees.
+    X = np.asarray(df, dtype=np.float32)
+    return np.mean([tree.predict(X) for tree in model.estimators_[:max_trees]],
+                   axis=0)
+
+  def get_station_model_num_trees(self, current_station, n, mdl):
+    """
+    Returns the number of trees of the RFR model of the current_station.
+
+    Args:
+      current_station <string>: Station Code eg. "CNB".
+      n <int>: Number of previous stations of the model.
+      mdl <string>: <"rfr">
+    """
+    model = self._load_station_model(current_station, n, mdl)
+    if isinstance(model, CompactForest):
+      return model.get_num_trees()
+    return len(model.estimators_)
+
+  def _get_station_model_file_path(self, current_station, n, mdl,
+                                   model_format="sav"):
+    """
+    Returns the path of the saved model of the current_station.
+
+    Args:
+      current_station <string>: Station Code eg. "CNB".
+      n <int>: Number of previous stations of the model.
+      mdl <string>: <"rfr"|"lmr"|"nnr">
+      model_format <string>: <"sav"|"compact">
+    """
+    return (self._model_path + mdl + "_models/" + str(n) + "ps_" + mdl +
+            "_labenc_models/" + current_station + "_label_encoding_model." +
+            ("cf" if model_format == "compact" else "sav"))
+
+  def _get_station_models_archive_path(self, n, mdl, model_format="sav"):
+    """
+    Returns the path of the archive of all the stations' models of the n and
+    mdl. Refer "model_archive.py".
+
+    Args:
+      n <int>: Number of previous stations of the models.
+      mdl <string>: <"rfr"|"lmr"|"nnr">
+      model_format <string>: <"sav"|"compact">
+    """
+    return (self._model_path + mdl + "_models/" + str(n) + "ps_" + mdl +
+            "_labenc_models." + model_format + ".pack")
+
+  def _get_station_model_source(self, current_station, n, mdl, model_format):
+    """
+    Returns a tuple of (ModelArchive or None, path) to load the model of the
+    current_station from. Of its archived model (if the archive has it), its
+    model file of model_format and (for "compact") its "sav" model file, the
+    newest is chosen (the former on ties), so that a model retrained or
+    exported after the archive was built is not shadowed by the stale one. The
+    stale sources are reported once. If none exists, the model file path is
+    returned (and fails to load).
+
+    Args:
+      current_station <string>: Station Code eg. "CNB".
+      n <int>: Number of previous stations of the model.
+      mdl <string>: <"rfr"|"lmr"|"nnr">
+      model_format <string>: <"sav"|"compact">
+    """
+    model_file_path = self._get_station_model_file_path(
+        current_station, n, mdl, model_format)
+    archive = get_model_archive(
+        self._get_station_models_archive_path(n, mdl, model_format))
+    # List of (modification time, preference, archive, path) of the sources.
+    sources = []
+    if archive is not None and archive.has_station(current_station):
+      sources.append((archive.get_mtime(), 2, archive, archive._archive_path))
+    file_paths = [model_file_path]
+    if model_format == "compact":
+      file_paths.append(
+          self._get_station_model_file_path(current_station, n, mdl))
+    for preference, file_path in zip([1, 0], file_paths):
+      if os.path.isfile(file_path):
+        sources.append((os.path.getmtime(file_path), preference, None,
+                        file_path))
+    if not sources:
+      return None, model_file_path
+
+    _, _, archive, path = max(sources, key=lambda source: source[:2])
+    preferred_path = max(sources, key=lambda source: source[1])[3]
+    if (path != preferred_path and
+        (preferred_path, path) not in self._reported_stale_sources):
+      self._reported_stale_sources.add((preferred_path, path))
+      print ("Model of station %s in %s is older than %s, loading the latter"
+             % (current_station, preferred_path, path))
+    return archive, path
+
+  def _load_station_model(self, current_station, n, mdl):
+    """
+    Returns the model of the current_station from the model cache, loads it
+    from disk only if it is not in cache. The model is loaded from the archive
+    of models (if present and has the station), else from its own file, unless
+    the latter is newer (refer `_get_station_model_source()`).
+
+    Args:
+      current_station <string>: Station Code eg. "CNB".
+      n <int>: Number of previous stations of the model.
+      mdl <string>: <"rfr"|"lmr"|"nnr">
+    """
+    archive, path = self._get_station_model_source(current_station, n, mdl,
+                                                   self._model_format)
+    # The source is a part of the key, so that a newer source is loaded.
+    key = (mdl, n, current_station, path)
+    if archive is not None:
+      return self._model_cache.get_model(
+          key, path, lambda archive_path: archive.load_model(current_station),
+          archive.get_model_length(current_station))
+    if path.endswith(".cf"):
+      return self._model_cache.get_model(key, path, load_compact_forest)
+    return self._model_cache.get_model(key, path)
+
+  def preload_station_models(self, stations, n, mdl):
+    """
+    Loads the models of the passed stations in the model cache.
+
+    Args:
+      stations <[string]>: A list of Station Codes eg. ["CNB", "ALD"].
+      n <int>: Number of previous stations of the models.
+      mdl <string>: <"rfr"|"lmr"|"nnr">
+    """
+    for station in stations:
+      self._load_station_model(station, n, mdl)
+
+  def get_station_models_batch_evaluator(self, stations, n, mdl):
+    """
+    Returns a ForestBatchEvaluator (refer "compact_forest.py") of the compact
+    models of the stations having them, to predict the rows of many stations
+    at once. Returns None if none of the stations has a compact model. The
+    stations whose "sav" model is newer than their compact one (refer
+    `_get_station_model_source()`) are left out. The forests are loaded and
+    copied each time, hence create it once for all the stations to be
+    predicted with it and reuse it.
+
+    Args:
+      stations <[string]>: A list of Station Codes eg. ["CNB", "ALD"].
+      n <int>: Number of previous stations of the models.
+      mdl <string>: <"rfr">
+    """
+    forests = {}
+    for station in stations:
+      # Loaded directly (not cached), as the evaluator copies their arrays.
+      archive, path = self._get_station_model_source(station, n, mdl,
+                                                     "compact")
+      try:
+        if archive is not None:
+          forests[station] = archive.load_model(station)
+        elif path.endswith(".cf"):
+          forests[station] = load_compact_forest(path)
+      except (IOError, OSError):
+        pass
+    return ForestBatchEvaluator(forests) if forests else None
+
+  def get_model_cache_stats_dict(self):
     """
-    model = joblib.load(self._model_path + mdl + "_models/" + str(n) +
-        "ps_" + mdl + "_labenc_models/" + current_station +
-        "_label_encoding_model.sav")
-    pred_late_mins = model.predict(df)
-    return pred_late_mins
+    Returns a dict of hits, misses, evictions and load time of model cache.
+    """
+    return self._model_cache.get_stats_dict()
 
   def _get_selected_stations_df(self, stn_index_list, df):
     """
@@ -198,13 +331,16 @@ class TrainingTestUtils(object):
     selected_station_df = df.iloc[stn_index_list]
     return selected_station_df
 
-  def get_station_nearest_neighbors_list(self, station, nps, n):
+  def get_stations_nearest_neighbors_dict(self, stations, nps, n):
     """
-    Returns the n nearest neighbors stations to given station among the stations
-    in passed data frame "df".
+    Returns a dict of station vs its n nearest neighbors stations (in order of
+    nearness) among the known stations having nps models, for all the passed
+    stations. The models to find geographically closer stations are fitted
+    only once for all the stations.
 
     Args:
-      station <string>: The station code for which nearest neighbors are needed.
+      stations <[string]>: The station codes for which nearest neighbors are
+                           needed.
       nps <int>: Number of previous stations to choose stations having nps model.
       n <int>: Number of nearest neighbors needed.
     """
@@ -217,44 +353,81 @@ class TrainingTestUtils(object):
     df = self._pdr.get_known_596_stations_features_df()
     df = df[df.Station.isin(stns_hvng_nps_mdls)]
 
-    query_stn_feature = [[self._stn_geo_crdnates[station][0],
-                         self._stn_geo_crdnates[station][1],
-                         self._stn_deg_strength[station],
-                         self._stn_tfc_strength[station]]]
     # First choose neighbors which are geographically closer
     lat_lon_df = df[["Latitude", "Longitude"]]
 
-    lat_lon_query_stn_ftr = [[self._stn_geo_crdnates[station][0],
-                              self._stn_geo_crdnates[station][1]]]
+    reg = self._stn_registry
+    lat_lon_query_stns_ftrs = np.column_stack([
+        reg.get_attribute_array("lat", "has_coordinates", stations),
+        reg.get_attribute_array("lon", "has_coordinates", stations)])
+    deg_tfc_query_stns_ftrs = np.column_stack([
+        reg.get_attribute_array("deg", "has_deg", stations),
+        reg.get_attribute_array("tfc", "has_tfc", stations)])
     ll_nbrs = NN(n_neighbors=n, algorithm="auto").fit(lat_lon_df)
     # ll_indices are directly indexed corresponding to stns_hvng_nps_mdls
-    ll_distances, ll_indices = ll_nbrs.kneighbors(lat_lon_query_stn_ftr)
-
-    # Subselect the chosen stations features from the complete station
-    # features df.
-    selected_station_fts_df = self._get_selected_stations_df(ll_indices[0], df)
-
-    # Then choose neighbors based on degree and traffic strength among the
-    # above chosen geographically closer stations.
-    deg_tfc_df = selected_station_fts_df[["Degree_Strength", "Traffic_Strength"]]
-    deg_tfc_query_stn_ftr = [[self._stn_deg_strength[station],
-                              self._stn_tfc_strength[station]]]
-    dt_nbrs = NN(n_neighbors=n, algorithm="auto").fit(deg_tfc_df)
-    # dt_indices are indexed with 0, so not directly related to
-    # stns_hvng_nps_mdls
-    dt_distances, dt_indices = dt_nbrs.kneighbors(deg_tfc_query_stn_ftr)
-
-    # Once the dt_indices are obtained where the stations are arranged as per
-    # increasing distance of degree and traffic strength features, get the
-    # station codes from the df at those indices (since the dt_indices are
-    # indexed from 0 onwards with respect to the ll_indices, hence the following
-    # code). Also the ll_indices are with respect to the df.
-    final_nearest_neighbors_stns_list = [df.iloc[ll_indices[0][idx]].Station
-        for idx in dt_indices[0]]
-    return final_nearest_neighbors_stns_list
+    ll_distances, ll_indices = ll_nbrs.kneighbors(lat_lon_query_stns_ftrs)
+
+    stns_nearest_neighbors = {}
+    for station, stn_ll_indices, deg_tfc_query_stn_ftr in zip(
+        stations, ll_indices, deg_tfc_query_stns_ftrs):
+      # Subselect the chosen stations features from the complete station
+      # features df.
+      selected_station_fts_df = self._get_selected_stations_df(stn_ll_indices,
+                                                               df)
+
+      # Then choose neighbors based on degree and traffic strength among the
+      # above chosen geographically closer stations.
+      deg_tfc_df = selected_station_fts_df[["Degree_Strength",
+                                            "Traffic_Strength"]]
+      dt_nbrs = NN(n_neighbors=n, algorithm="auto").fit(deg_tfc_df)
+      # dt_indices are indexed with 0, so not directly related to
+      # stns_hvng_nps_mdls
+      dt_distances, dt_indices = dt_nbrs.kneighbors([deg_tfc_query_stn_ftr])
+
+      # Once the dt_indices are obtained where the stations are arranged as per
+      # increasing distance of degree and traffic strength features, get the
+      # station codes from the df at those indices (since the dt_indices are
+      # indexed from 0 onwards with respect to the ll_indices, hence the
+      # following code). Also the ll_indices are with respect to the df.
+      stns_nearest_neighbors[station] = [df.iloc[stn_ll_indices[idx]].Station
+                                         for idx in dt_indices[0]]
+    return stns_nearest_neighbors
+
+  def _get_nearest_neighbors_table_dict(self, n):
+    """
+    Returns the precomputed table of nps vs station vs its n nearest neighbors
+    stations, an empty dict if the table for n is not created.
+
+    Args:
+      n <int>: Number of nearest neighbors.
+    """
+    if n not in self._stn_nn_tables:
+      try:
+        self._stn_nn_tables[n] = (
+            self._pdr.get_stations_nearest_neighbors_dict(n))
+      except (IOError, OSError):
+        self._stn_nn_tables[n] = {}
+    return self._stn_nn_tables[n]
+
+  def get_station_nearest_neighbors_list(self, station, nps, n):
+    """
+    Returns the n nearest neighbors stations to given station among the known
+    stations having nps models. They are looked up in the precomputed table
+    created by "create_pickle_data.py", else computed if the table or the
+    station is not present in it.
+
+    Args:
+      station <string>: The station code for which nearest neighbors are needed.
+      nps <int>: Number of previous stations to choose stations having nps model.
+      n <int>: Number of nearest neighbors needed.
+    """
+    nps_table = self._get_nearest_neighbors_table_dict(n).get(nps, {})
+    if station in nps_table:
+      return nps_table[station]
+    return self.get_stations_nearest_neighbors_dict([station], nps, n)[station]
 
   def get_predicted_late_mins_at_station_float(self, train_num, sj_df, idxof_stn,
-      n, station, pred_lms_sj, j, mdl):
+      n, station, pred_lms_sj, j, mdl, row_builder=None, max_trees=None):
     """
     Returns the predicted late minutes at given "station".
 
@@ -267,6 +440,44 @@ class TrainingTestUtils(object):
       pred_lms_sj <list>: Predicted Late Minutes list.
       j <int>: The current station index in station list of sj_df.
       mdl <string>: <"rfr"> # For random forest regressor model.
+      row_builder <JourneyRowBuilder()>: Row builder of sj_df obtained from
+          `get_journey_row_builder()`, if passed the row is built by it instead
+          of a row data frame.
+      max_trees <int>: Number of trees of the model to predict with, refer
+                       `get_predicted_late_mins_list()`. Default all.
+    """
+    if row_builder is not None:
+      row_nps = row_builder.get_row_array(j, n, pred_lms_sj)
+    else:
+      row_nps = self.get_station_row_df(
+          train_num, sj_df, idxof_stn, n, pred_lms_sj, j)
+    plm = self.get_predicted_late_mins_list(station, n, row_nps, mdl, max_trees)
+    return plm[0]
+
+  def get_journey_row_builder(self, train_num, sj_df):
+    """
+    Returns a row builder of the single journey, which computes the static
+    features of all its stations once. Refer "journey_row_builder.py".
+
+    Args:
+      train_num <string>: A five digit train number eg. "12307".
+      sj_df <pandas.DataFrame>: A single journey data frame.
+    """
+    return JourneyRowBuilder(self, train_num, sj_df)
+
+  def get_station_row_df(self, train_num, sj_df, idxof_stn, n, pred_lms_sj, j):
+    """
+    Returns the single row data frame of the station at idxof_stn, which is
+    passed to the station model to predict late minutes at it. The late minutes
+    at its n previous stations are set as the predicted ones.
+
+    Args:
+      train_num <string>: A five digit train number eg. "12307".
+      sj_df <pandas.DataFrame>: A single journey data frame.
+      idxof_stn <int>: Index of current station in single journey data frame.
+      n <int>: N in number of previous station.
+      pred_lms_sj <list>: Predicted Late Minutes list.
+      j <int>: The current station index in station list of sj_df.
     """
     row_df_nps = self.generate_row_df(train_num, sj_df, idxof_stn, n)
     temp = row_df_nps.pop("crnt_stn_late_mins")
@@ -276,6 +487,4 @@ class TrainingTestUtils(object):
     # Set the late minutes at n previous stations as predicted ones
     for i in range(n):
       row_df_nps[str(i+1)+"_ps_late_mins"] = pred_lms_sj[j-(i+1)]
-
-    plm = self.get_predicted_late_mins_list(station, n, row_df_nps, mdl)
-    return plm[0]
+    return row_df_nps
@@ -44,6 +44,10 @@ do
   mkdir data/52tr_stations_training_data/"$n"ps_training_data
   echo "-----------------------------------------------------------------------"
 done
+echo "Creating '5ps_wide_training_data' to store wide data-frames having rows of"
+echo "all 1 to 5 previous station data-frames, to train all models in one run."
+mkdir data/52tr_stations_training_data/5ps_wide_training_data
+echo "-----------------------------------------------------------------------"
 echo "Setting up the directory structure for saving training data done!"
 echo "*************************************************************************"
 yes '' | sed 5q # Echo 5 blank lines.
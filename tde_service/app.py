@@ -6,20 +6,30 @@
 # Desc: This file implements a flask REST API app for Train Delay Estimation.
 #
 # For multithreaded: http://flask.pocoo.org/docs/deploying/
+# For multiple worker processes sharing the memory mapped models, run it by
+# "start_service.sh" instead.
 
 import env
 
 from datetime import datetime
-from flask import Flask
+from flask import Flask, request
 
 import json
 import pandas as pd
 import re
+import threading
 
+from batch_prediction import get_batch_delays_list, get_batch_pool
 from code.utilities.tt_utils import TrainingTestUtils as TTU
-from tde_prediction import TDEPrediction as TDEP
+from prediction_prefix_cache import PredictionPrefixCache
+from prediction_table import get_prediction_table
+from tde_prediction import (TDEPrediction as TDEP, DEFAULT_MDL, DEFAULT_N,
+                            DEFAULT_NN, get_stns_with_n_mdls_dict)
 
 from util import log
+from util.admission import (AdmissionController, AdmissionRejected,
+                            OVERLOADED_ERROR)
+from util.single_flight import SingleFlight
 
 app = Flask(__name__)
 pd.options.mode.chained_assignment = None  # Disable "SettingWithCopyWarning".
@@ -30,18 +40,135 @@ DATE_REGEX = re.compile(DATE_PATTERN)
 
 # Instantiate following variables and keep them in memory because they are not
 # going to change throughout the life time of this app.
-ttu = TTU()
+ttu = TTU(model_format=env.MODEL_FORMAT)
 pdr = ttu._pdr
 
 ALL_135_TRAINS = pdr.get_all_trains()
 
-STNS_WITH_N_MDLS = {
-  "1ps": pdr.get_stations_having_nps_model_list(nps=1),
-  ## One can add more deeper models one may have tried. E.g., 2-order in next line
-  # "2ps": pdr.get_stations_having_nps_model_list(nps=2)
-}
-
+## One can add more deeper models one may have tried. E.g., 2-order by passing
+## nps_list=[1, 2].
+STNS_WITH_N_MDLS = get_stns_with_n_mdls_dict(pdr, nps_list=[1])
+
+# Precomputed predicted delays of all trains, if enabled and built with the
+# same model, N and nearest neighbours as the live predictions.
+PREDICTION_TABLE = (get_prediction_table(pdr, DEFAULT_MDL, DEFAULT_N,
+                                         DEFAULT_NN)
+                    if env.USE_PREDICTION_TABLE else None)
+
+# Cache of the predicted chains of delays shared by all requests, if enabled.
+PREFIX_CACHE = (PredictionPrefixCache(env.PREFIX_CACHE_SIZE)
+                if env.PREFIX_CACHE_SIZE else None)
+
+# Coalescing of concurrent predictions of the same chain, if enabled.
+SINGLE_FLIGHT = SingleFlight() if env.COALESCE_REQUESTS else None
+
+# Admission control of the live predictions, if enabled. The requests rejected
+# by it are responded with OVERLOADED_ERROR, status 503 and a "Retry-After"
+# header of 1 second (the queries of a batch with OVERLOADED_ERROR only).
+ADMISSION = None
+if env.MAX_CONCURRENT_PREDICTIONS:
+  ADMISSION = AdmissionController(
+      env.MAX_CONCURRENT_PREDICTIONS, env.MAX_QUEUED_PREDICTIONS,
+      env.MAX_QUEUE_WAIT_MS / 1000.0 if env.MAX_QUEUE_WAIT_MS else None)
+
+def get_admitted(func):
+  """
+  Returns func() called after admitting the request (refer `ADMISSION`), raises
+  AdmissionRejected if it is rejected.
+
+  Args:
+    func <function>: Function without arguments which predicts the delays.
+  """
+  if ADMISSION is None:
+    return func()
+  with ADMISSION.admitted():
+    return func()
+
+# The prediction engine shared by all requests, it is warmed up at startup.
+TDEP_ENGINE = TDEP(PREFIX_CACHE, ttu, SINGLE_FLIGHT)
+# Set once the warm up is done successfully, refer "/ready".
+WARMED_UP = threading.Event()
+# Error message of the warm up if it failed, responded by "/ready".
+WARM_UP_ERROR = {"error": None}
+
+def warm_up():
+  """
+  Warms up the prediction engine (refer `TDEPrediction.warm_up()`) with the
+  models of env.HOT_STATIONS.
+  """
+  try:
+    hot_stations = [] # None for all the stations.
+    if env.HOT_STATIONS == "all":
+      hot_stations = None
+    elif env.HOT_STATIONS:
+      hot_stations = env.HOT_STATIONS.split(",")
+    TDEP_ENGINE.warm_up(STNS_WITH_N_MDLS, hot_stations, ALL_135_TRAINS[0])
+  except Exception as e:
+    log.ERROR("Error occurred while warming up, Error type: %s, "
+              "Error message: %s" % (type(e), str(e)))
+    WARM_UP_ERROR["error"] = "Warm up failed: %s" % str(e)
+    return
+  WARMED_UP.set()
+
+# When run by "start_service.sh", it is warmed up once in the master process
+# and the forked workers inherit the loaded data and models (mapping the same
+# pages of compact models).
+if env.WARM_UP_IN_BACKGROUND:
+  warm_up_thread = threading.Thread(target=warm_up, name="warm_up")
+  warm_up_thread.daemon = True
+  warm_up_thread.start()
+else:
+  warm_up()
+
+
+# Route to get the statistics of the caches and coalesced requests of this
+# process.
+@app.route("/stats")
+def stats():
+  return json.dumps({
+      "ModelCache": ttu.get_model_cache_stats_dict(),
+      "PrefixCache": (PREFIX_CACHE.get_stats_dict()
+                      if PREFIX_CACHE is not None else None),
+      "SingleFlight": (SINGLE_FLIGHT.get_stats_dict()
+                       if SINGLE_FLIGHT is not None else None),
+      "Admission": (ADMISSION.get_stats_dict()
+                    if ADMISSION is not None else None)})
+
+# Route to check if the service is warmed up, 503 till then (and along with
+# the error if the warm up failed).
+@app.route("/ready")
+def ready():
+  if WARMED_UP.is_set():
+    return json.dumps({"Ready": True})
+  return json.dumps({"Ready": False, "Error": WARM_UP_ERROR["error"]}), 503
+
+
+def get_query_error_str(train_num, date):
+  """
+  Returns the error message if the train number or date of a query is not
+  valid, else None.
+
+  Args:
+    train_num <str>: A five digit train number e.g. "12307".
+    date <str>: A date in "YYYY-MM-DD" format e.g. "2018-07-08".
+  """
+  # Check for the validity of train number.
+  if train_num not in ALL_135_TRAINS:
+    log.ERROR("Train %s not in ALL_135_TRAINS list" % train_num)
+    return "Train: %s not accounted by our algorithm" % train_num
 
+  # TODO Check for past dates and error out those as invalid.
+  match = DATE_REGEX.match(date)
+  if not match:
+    log.ERROR("Date: %s is not valid as per regex" % date)
+    return "Date %s not correct" % date
+  # Check for the validity of month and day e.g. "2018-02-30".
+  try:
+    datetime.strptime(date, "%Y-%m-%d")
+  except ValueError:
+    log.ERROR("Date: %s is not a valid calendar date" % date)
+    return "Date %s not correct" % date
+  return None
 
 # Route when only train number is passed.
 @app.route("/<train_num>", defaults={"station": None, "date": None})
@@ -55,24 +182,73 @@ def accept_url(train_num, station, date):
   log.INFO("Train Number: %s, Station Code: %s, Date: %s"
            % (train_num, station, date))
 
-  # Check for the validity of train number.
-  if train_num not in ALL_135_TRAINS:
-    log.ERROR("Train %s not in ALL_135_TRAINS list")
-    return json.dumps({"Error": "Train: %s not accounted by our algorithm"
-                      % train_num, "Result": None})
-
   if not date:
     date = str(datetime.now().date())
 
-  # TODO Check for the validity of date (Also check for 12 months 31 days)
-  # TODO Check for past dates and error out those as invalid.
-  match = DATE_REGEX.match(date)
-  if not match:
-    log.ERROR("Date: %s is not valid as per regex")
-    return json.dumps({"Error": "Date %s not correct" % date, "Result": None})
-
-  lms_stns = TDEP().get_delay(STNS_WITH_N_MDLS, train_num, date, station)
+  error = get_query_error_str(train_num, date)
+  if error is not None:
+    return json.dumps({"Error": error, "Result": None})
+
+  # Tree budget and deadline of the live prediction, refer `TreeBudget`.
+  max_trees = request.args.get("max_trees", env.MAX_TREES, type=int)
+  deadline_ms = request.args.get("deadline_ms", env.DEADLINE_MS, type=int)
+  for name, value in [("max_trees", max_trees), ("deadline_ms", deadline_ms)]:
+    if value is not None and value < 1:
+      log.ERROR("%s: %s is not valid" % (name, value))
+      return json.dumps({"Error": "%s %s not correct, expected at least 1"
+                         % (name, value), "Result": None}), 400
+  deadline_secs = deadline_ms / 1000.0 if deadline_ms else None
+
+  lms_stns = None
+  if PREDICTION_TABLE is not None:
+    lms_stns = PREDICTION_TABLE.get_delay(train_num, date, station)
+  if lms_stns is None:
+    try:
+      lms_stns = TDEP_ENGINE.get_delay(
+          STNS_WITH_N_MDLS, train_num, date, station, max_trees=max_trees,
+          deadline_secs=deadline_secs, get_admitted=get_admitted)
+    except AdmissionRejected as e:
+      log.INFO("Train: %s rejected, %s" % (train_num, str(e)))
+      return (json.dumps({"Error": OVERLOADED_ERROR, "Result": None}), 503,
+              {"Retry-After": "1"})
   return json.dumps(lms_stns)
 
+# Route to predict a batch of queries, the body is a json like:
+# {"queries": [{"train_num": "12307", "date": "2018-07-23", "station": "ALD"},
+#              {"train_num": "12307", "date": "2018-07-23"}, ...]}
+# where the date (default today) and station are optional. The response has
+# the result of each query in order, same as the routes above.
+@app.route("/batch", methods=["POST"])
+def accept_batch():
+  body = request.get_json(force=True, silent=True)
+  queries = body.get("queries") if isinstance(body, dict) else None
+  if (not isinstance(queries, list) or
+      not all(isinstance(query, dict) for query in queries)):
+    return json.dumps({"Error": "Expected a json object having a list of "
+                       "queries", "Results": None}), 400
+  if len(queries) > env.BATCH_MAX_QUERIES:
+    return json.dumps({"Error": "At most %s queries are allowed in a batch"
+                       % env.BATCH_MAX_QUERIES, "Results": None}), 400
+
+  results = [None] * len(queries)
+  valid_queries = [] # List of (index, (train_num, date, station)).
+  for i, query in enumerate(queries):
+    train_num = query.get("train_num")
+    date = query.get("date") or str(datetime.now().date())
+    error = (get_query_error_str(train_num, date)
+             if isinstance(date, basestring) else "Date %s not correct" % date)
+    if error is not None:
+      results[i] = {"Error": error, "Result": None}
+    else:
+      valid_queries.append((i, (train_num, date, query.get("station"))))
+
+  # Each group of queries predicted live is admitted as a single request.
+  batch_results = get_batch_delays_list(
+      TDEP_ENGINE, STNS_WITH_N_MDLS, [query for _, query in valid_queries],
+      get_batch_pool(), PREDICTION_TABLE, get_admitted)
+  for (i, _), result in zip(valid_queries, batch_results):
+    results[i] = result
+  return json.dumps({"Error": None, "Results": results})
+
 if __name__ == "__main__":
   app.run(threaded=True)
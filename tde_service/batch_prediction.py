@@ -0,0 +1,101 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# This file implements the prediction of delays for a batch of queries, each of
+# a train, date and an optional station. Predicted delays depend only on the
+# train, month and weekday of the queried date, so the queries are grouped by
+# them and the delays at all the inline stations (the N-OMLMPF chain) of each
+# group are predicted once, by a pool of threads.
+#
+
+import env
+import os
+import threading
+
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from tde_prediction import (get_modified_date_month_week_tuple,
+                            get_station_result_dict)
+
+from util import log
+from util.admission import AdmissionRejected, OVERLOADED_ERROR
+
+# Pool of threads of this process (created on first use, since the threads of
+# the gunicorn master do not exist in its forked workers).
+_BATCH_POOL = {"pid": None, "pool": None}
+_BATCH_POOL_LOCK = threading.Lock()
+
+def get_batch_pool():
+  """
+  Returns the pool of env.BATCH_WORKERS threads of this process.
+  """
+  with _BATCH_POOL_LOCK:
+    if _BATCH_POOL["pid"] != os.getpid():
+      _BATCH_POOL["pool"] = ThreadPool(env.BATCH_WORKERS)
+      _BATCH_POOL["pid"] = os.getpid()
+    return _BATCH_POOL["pool"]
+
+def get_batch_delays_list(tdep, STNS_WITH_N_MDLS, queries, pool,
+                          prediction_table=None, get_admitted=None):
+  """
+  Returns a list of the result dicts (same as returned by
+  `TDEPrediction.get_delay()`) of the queries, in order of queries.
+
+  Args:
+    tdep <TDEPrediction>: The prediction engine.
+    STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
+                             n-prev-stns models.
+    queries <[(str, str, str)]>: A list of (train_num, date, station) queries
+                                 e.g. ("12307", "2018-07-08", "CNB"), station
+                                 is None for all the inline stations. The
+                                 train numbers and dates are valid ones.
+    pool <ThreadPool>: Pool of threads to predict the groups by.
+    prediction_table <PredictionTable>: If passed, the queries are looked up in
+                                        it first.
+    get_admitted <function>: If passed, each group is admitted as a single
+                             request (refer `TDEPrediction.get_delay()`). The
+                             queries of a group rejected by it get
+                             OVERLOADED_ERROR.
+  """
+  results = [None] * len(queries)
+  # (train_num, month, weekday) vs list of (index, date, station) of queries.
+  groups = OrderedDict()
+  for i, (train_num, date, station) in enumerate(queries):
+    try:
+      _, month, weekday = get_modified_date_month_week_tuple(date)
+    except Exception as e:
+      results[i] = {"Error": "Date %s not correct" % date, "Result": None}
+      continue
+    if prediction_table is not None:
+      results[i] = prediction_table.get_delay(train_num, date, station)
+      if results[i] is not None:
+        continue
+    groups.setdefault((train_num, month, weekday), []).append(
+        (i, date, station))
+
+  def get_group_delay(group):
+    (train_num, _, _), group_queries = group
+    try:
+      return tdep.get_delay(STNS_WITH_N_MDLS, train_num, group_queries[0][1],
+                            get_admitted=get_admitted)
+    except AdmissionRejected as e:
+      log.INFO("Train: %s rejected, %s" % (train_num, str(e)))
+      return {"Error": OVERLOADED_ERROR, "Result": None}
+    except Exception as e:
+      log.ERROR("Error occurred for train: %s, Error type: %s, "
+                "Error message: %s" % (train_num, type(e), str(e)))
+      return {"Error": str(e), "Result": None}
+
+  log.INFO("Batch of %s queries in %s groups" % (len(queries), len(groups)))
+  group_delays = pool.map(get_group_delay, groups.items(), chunksize=1)
+  for ((train_num, _, _), group_queries), ret in zip(groups.items(),
+                                                     group_delays):
+    for i, _, station in group_queries:
+      if ret["Error"] is not None:
+        results[i] = {"Error": ret["Error"], "Result": None}
+      else:
+        results[i] = get_station_result_dict(ret["Result"], train_num, station)
+  return results
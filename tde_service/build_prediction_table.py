@@ -0,0 +1,92 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# This file precomputes the predicted delays of all 135 trains at their inline
+# stations for all 12 months and 7 weekdays, since the delays predicted by
+# `TDEPrediction.get_delay()` depend only on the train, month and weekday of the
+# queried date. The table is saved in "data/pickle_data" as
+# "tde_prediction_table_<mdl>_<n>ps.p" and served by "app.py" when it is run
+# with TDE_USE_PREDICTION_TABLE=1.
+#
+# To run this file execute:
+#
+# python build_prediction_table.py rfr 2 10
+#
+# where "rfr" is the model, 2 is the N in N-OMLMPF and 10 is the number of
+# nearest neighbours, same as used by "app.py" (`DEFAULT_MDL`, `DEFAULT_N` and
+# `DEFAULT_NN` in "tde_prediction.py"). They are saved in the table, and
+# "app.py" does not serve a table built with others.
+#
+
+import env
+
+import numpy as np
+import pickle
+import sys
+
+from tde_prediction import (TDEPrediction as TDEP, MONTH_DICT, WEEK_DICT,
+                            get_stns_with_n_mdls_dict)
+
+def build_prediction_table_dict(tdep, STNS_WITH_N_MDLS, trains, nn, mdl, n):
+  """
+  Returns a dict of the predicted late minutes of all the passed trains at
+  their inline stations for all months and weekdays.
+
+  {
+    "mdl": <str>, "n": <int>, "nn": <int>,
+    "months": [<str>, ...], "weekdays": [<str>, ...],
+    "trains": {<train_num>: {"stations": [<str>, ...],
+                             "late_mins": <numpy.ndarray of shape
+                                          (months, weekdays, stations)>}},
+    "errors": {<train_num>: <str: Error Message>}
+  }
+
+  Args:
+    tdep <TDEPrediction>: A TDEPrediction object.
+    STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
+                             n-prev-stns models.
+    trains <[str]>: A list of five digit train numbers.
+    nn <int>: Number of nearest neighbours.
+    mdl <str>: "rfr" for Random Forest Regressor models.
+    n <int>: N in N-OMLMPF.
+  """
+  months = [MONTH_DICT[key] for key in sorted(MONTH_DICT.keys())]
+  weekdays = [WEEK_DICT[key] for key in sorted(WEEK_DICT.keys())]
+  table_dict = {"mdl": mdl, "n": n, "nn": nn, "months": months,
+                "weekdays": weekdays, "trains": {}, "errors": {}}
+
+  for train_num in trains:
+    stations, late_mins = None, None
+    for i, month in enumerate(months):
+      for j, weekday in enumerate(weekdays):
+        ret = tdep.get_delay_of_month_weekday(
+            STNS_WITH_N_MDLS, train_num, month, weekday, nn, mdl, n)
+        if ret["Error"]:
+          table_dict["errors"][train_num] = ret["Error"]
+          break
+        if stations is None:
+          stations = sorted(ret["Result"].keys())
+          late_mins = np.zeros((len(months), len(weekdays), len(stations)))
+        late_mins[i, j] = [ret["Result"][stn] for stn in stations]
+      if train_num in table_dict["errors"]:
+        break
+
+    if train_num not in table_dict["errors"]:
+      table_dict["trains"][train_num] = {"stations": stations,
+                                         "late_mins": late_mins}
+    print "Train: ", train_num, " Done!"
+  return table_dict
+
+if __name__ == "__main__":
+  mdl = sys.argv[1] # Accept <"rfr">.
+  n = int(sys.argv[2]) # Accept the n in n-OMLMPF.
+  nn = int(sys.argv[3]) # Accept the number of nearest neighbours.
+  tdep = TDEP()
+  pdr = tdep._ttu._pdr
+  table_dict = build_prediction_table_dict(
+      tdep, get_stns_with_n_mdls_dict(pdr), pdr.get_all_trains(), nn, mdl, n)
+  pickle.dump(table_dict, open(pdr._pdpath+"tde_prediction_table_"+mdl+"_"+
+      str(n)+"ps.p", "wb"))
+  print "Trains with errors: ", table_dict["errors"]
@@ -6,6 +6,7 @@
 # This module sets up the environment for running the TDE Service.
 #
 
+import os
 import sys
 
 # This module should NOT be executed.
@@ -17,3 +18,67 @@ project_dir_path = "/Personal/train-delay-estimation/"
 # Insert the project directory path in sys.path, so that subdirecotries and code
 # files therein are able to access the other (top level) files.
 sys.path.insert(0, project_dir_path)
+
+# Service settings, these can be set as environment variables before starting
+# the service, e.g. `TDE_USE_PREDICTION_TABLE=1 python app.py`.
+
+# Serve the predicted delays from the precomputed prediction table created by
+# "build_prediction_table.py", falling back to live prediction on a miss.
+USE_PREDICTION_TABLE = os.environ.get("TDE_USE_PREDICTION_TABLE", "0") == "1"
+
+# Format <"sav"|"compact"> of the station models used for live prediction,
+# default is `station_model_format` in "code/utilities/env.py". The "compact"
+# models (and their archives) are memory mapped read-only, hence the worker
+# processes of "start_service.sh" share one copy of them in the page cache.
+MODEL_FORMAT = os.environ.get("TDE_MODEL_FORMAT") or None
+
+# Comma separated station codes whose models are loaded on warming up the
+# service, "all" for all the stations having models, e.g. "CNB,ALD,MGS".
+HOT_STATIONS = os.environ.get("TDE_HOT_STATIONS", "")
+
+# Warm up the service (load metadata, nearest neighbors tables and the hot
+# stations' models) in a background thread, so that it starts serving at once
+# and "/ready" turns 200 once warmed up. If "0", the service is warmed up before
+# it starts serving, e.g. in the master process of "start_service.sh" before
+# forking the workers (refer "gunicorn_conf.py"), which then inherit it.
+WARM_UP_IN_BACKGROUND = os.environ.get("TDE_WARM_UP_IN_BACKGROUND", "1") == "1"
+
+# Address and number of worker processes of "start_service.sh".
+SERVICE_BIND = os.environ.get("TDE_SERVICE_BIND", "127.0.0.1:5000")
+SERVICE_WORKERS = int(os.environ.get("TDE_SERVICE_WORKERS", "4"))
+
+# Default tree budget of live predictions, i.e. maximum number of trees of the
+# RFR models to predict each station with, and the deadline (milliseconds) of a
+# request within which fewer trees are used if required. 0 for no budget and no
+# deadline. Refer "code/tree_budget_rmse.py" to choose the budget. A request can
+# pass its own as "?max_trees=100&deadline_ms=50".
+MAX_TREES = int(os.environ.get("TDE_MAX_TREES", "0")) or None
+DEADLINE_MS = int(os.environ.get("TDE_DEADLINE_MS", "0")) or None
+
+# Maximum number of predicted chains of delays (per train, month and weekday)
+# kept by the prediction prefix cache, so that a query resumes the prediction
+# from the cached chain. 0 to disable it. Refer "prediction_prefix_cache.py".
+PREFIX_CACHE_SIZE = int(os.environ.get("TDE_PREFIX_CACHE_SIZE", "0"))
+
+# Coalesce the concurrent requests of the same train, month and weekday into a
+# single prediction, whose result is shared by them. Refer
+# "util/single_flight.py" and "/stats" route for the number of requests
+# deduplicated.
+COALESCE_REQUESTS = os.environ.get("TDE_COALESCE_REQUESTS", "1") == "1"
+
+# Admission control of the live predictions (per process): at most
+# MAX_CONCURRENT_PREDICTIONS requests predict at once, at most
+# MAX_QUEUED_PREDICTIONS requests wait for them (each for at most
+# MAX_QUEUE_WAIT_MS milliseconds, 0 for no limit), and the rest are rejected
+# with status 503. MAX_CONCURRENT_PREDICTIONS as 0 disables it. Refer
+# "util/admission.py" and "/stats" route for the queue depth, waits and
+# rejections.
+MAX_CONCURRENT_PREDICTIONS = int(os.environ.get(
+    "TDE_MAX_CONCURRENT_PREDICTIONS", "8"))
+MAX_QUEUED_PREDICTIONS = int(os.environ.get("TDE_MAX_QUEUED_PREDICTIONS", "32"))
+MAX_QUEUE_WAIT_MS = int(os.environ.get("TDE_MAX_QUEUE_WAIT_MS", "30000"))
+
+# Number of threads (per process) predicting the groups of a batch of queries,
+# and the maximum number of queries in a batch. Refer "batch_prediction.py".
+BATCH_WORKERS = int(os.environ.get("TDE_BATCH_WORKERS", "4"))
+BATCH_MAX_QUERIES = int(os.environ.get("TDE_BATCH_MAX_QUERIES", "1000"))
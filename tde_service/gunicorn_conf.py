@@ -0,0 +1,28 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Gunicorn configuration of the TDE Service run by "start_service.sh".
+#
+#       The app is loaded once in the master process (`preload_app`), which
+#       then forks SERVICE_WORKERS worker processes. The compact models are
+#       memory mapped read-only, so all the workers share one physical copy of
+#       them through the page cache, rather than each worker unpickling its own
+#       copy. Refer "memory_report.py" to check the memory of the workers.
+#
+
+import env
+
+from util import log
+
+bind = env.SERVICE_BIND
+workers = env.SERVICE_WORKERS
+preload_app = True
+# Live prediction of a train loads and runs a model per station, hence a higher
+# timeout than the default of 30 seconds.
+timeout = 120
+pidfile = "logs/gunicorn.pid"
+
+def post_fork(server, worker):
+  log.INFO("Forked worker: %s" % worker.pid)
@@ -0,0 +1,114 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Reports the memory of the master and worker processes of the TDE Service
+#       run by "start_service.sh", read from "/proc/<pid>/smaps" (Linux only).
+#
+#       To run this file execute (from tde_service directory):
+#       python memory_report.py [master pid]
+#
+#       where the master pid defaults to the one in "logs/gunicorn.pid". For
+#       each process it prints in MB:
+#
+#       rss: Resident memory, as reported by `ps` and `top`.
+#       pss: Proportional share, i.e. each shared page divided by the number of
+#            processes mapping it. Sum of pss is the actual memory used.
+#       shared: Resident memory shared with other processes.
+#       private: Resident memory used only by this process.
+#       models_rss: Resident memory mapped from the model files (*.cf, *.pack).
+#       models_shared: Part of models_rss shared with other processes.
+#
+#       With the compact models, models_rss of the workers is mostly shared,
+#       hence the total pss is much lower than the total rss.
+#
+
+import os
+import sys
+
+MODEL_FILE_EXTENSIONS = (".cf", ".pack")
+FIELDS = ["rss", "pss", "shared", "private", "models_rss", "models_shared"]
+
+def get_child_pids_list(pid):
+  """
+  Returns the pids of the child processes of the process.
+
+  Args:
+    pid <int>: Process ID.
+  """
+  child_pids = []
+  for name in os.listdir("/proc"):
+    if not name.isdigit():
+      continue
+    try:
+      with open("/proc/%s/stat" % name) as f:
+        stat = f.read()
+    except IOError: # Process exited meanwhile.
+      continue
+    # Parent pid is the second field after the process name in parentheses.
+    if int(stat[stat.rindex(")")+1:].split()[1]) == pid:
+      child_pids.append(int(name))
+  return sorted(child_pids)
+
+def get_memory_dict(pid):
+  """
+  Returns a dict of FIELDS vs their memory (kB) in the process, summed over
+  all its mappings.
+
+  Args:
+    pid <int>: Process ID.
+  """
+  memory = dict((field, 0) for field in FIELDS)
+  is_model_mapping = False
+  with open("/proc/%s/smaps" % pid) as f:
+    for line in f:
+      tokens = line.split()
+      if not tokens[0].endswith(":"): # Header line of a mapping.
+        is_model_mapping = (len(tokens) > 5 and
+                            tokens[-1].endswith(MODEL_FILE_EXTENSIONS))
+        continue
+      if tokens[-1] != "kB": # e.g. "VmFlags: rd ex mr mw me".
+        continue
+      field, kb = tokens[0][:-1], int(tokens[1])
+      if field == "Rss":
+        memory["rss"] += kb
+        if is_model_mapping:
+          memory["models_rss"] += kb
+      elif field == "Pss":
+        memory["pss"] += kb
+      elif field in ["Shared_Clean", "Shared_Dirty"]:
+        memory["shared"] += kb
+        if is_model_mapping:
+          memory["models_shared"] += kb
+      elif field in ["Private_Clean", "Private_Dirty"]:
+        memory["private"] += kb
+  return memory
+
+def print_memory_report(master_pid):
+  """
+  Prints the memory (MB) of the master and its worker processes, and their
+  totals.
+
+  Args:
+    master_pid <int>: Process ID of the gunicorn master.
+  """
+  total = dict((field, 0) for field in FIELDS)
+  print "process pid " + " ".join(FIELDS) + " (MB)"
+  for role, pid in ([("master", master_pid)] +
+                    [("worker", pid) for pid in get_child_pids_list(master_pid)]):
+    memory = get_memory_dict(pid)
+    for field in FIELDS:
+      total[field] += memory[field]
+    print role, pid, " ".join("%.1f" % (memory[field] / 1024.0)
+                              for field in FIELDS)
+  print "total -", " ".join("%.1f" % (total[field] / 1024.0)
+                            for field in FIELDS)
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1:
+    master_pid = int(sys.argv[1])
+  else:
+    with open("logs/gunicorn.pid") as f:
+      master_pid = int(f.read())
+  print_memory_report(master_pid)
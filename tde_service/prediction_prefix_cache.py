@@ -0,0 +1,80 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# This file implements a cache of the chains of predicted delays. N-OMLMPF
+# predicts the delays at the inline stations of a train one after the other,
+# each from the delays predicted at its previous stations, and the predictions
+# depend only on the train, month, weekday and the inline stations of its
+# journey (and n, mdl, nn). So the chain predicted up to a queried station is
+# cached, and a later query of a station downstream resumes the chain from the
+# end of the cached one.
+#
+
+import threading
+
+from collections import OrderedDict
+
+# Default maximum number of chains kept in the cache.
+DEFAULT_MAX_CHAINS = 4096
+
+class PredictionPrefixCache(object):
+  def __init__(self, max_chains=DEFAULT_MAX_CHAINS):
+    """
+    Initializes an empty LRU cache of predicted chains.
+
+    Args:
+      max_chains <int>: Maximum number of chains to keep.
+    """
+    self._max_chains = max_chains
+    # Key vs list of predicted late minutes at the first stations of journey,
+    # in LRU order.
+    self._chains = OrderedDict()
+    self._lock = threading.Lock()
+    self._stats = {"hits": 0, "partial_hits": 0, "misses": 0}
+
+  def get_prefix_list(self, key, num_stns):
+    """
+    Returns a copy of the cached chain of the key (at most num_stns long), an
+    empty list if there is none.
+
+    Args:
+      key <tuple>: (train_num, month, weekday, n, mdl, nn, inline stations).
+      num_stns <int>: Number of stations from the source, to be predicted.
+    """
+    with self._lock:
+      chain = self._chains.get(key)
+      if chain is None:
+        self._stats["misses"] += 1
+        return []
+      self._chains[key] = self._chains.pop(key) # Mark as recently used.
+      if len(chain) >= num_stns:
+        self._stats["hits"] += 1
+      else:
+        self._stats["partial_hits"] += 1
+      return chain[:num_stns]
+
+  def put_prefix(self, key, chain):
+    """
+    Caches the chain of the key, unless a longer one is cached already.
+
+    Args:
+      key <tuple>: (train_num, month, weekday, n, mdl, nn, inline stations).
+      chain <list>: Predicted late minutes at the first stations of journey.
+    """
+    with self._lock:
+      cached_chain = self._chains.pop(key, [])
+      self._chains[key] = (list(chain) if len(chain) > len(cached_chain)
+                           else cached_chain)
+      while len(self._chains) > self._max_chains:
+        self._chains.popitem(last=False)
+
+  def get_stats_dict(self):
+    """
+    Returns a dict of hits, partial hits, misses and number of cached chains.
+    """
+    with self._lock:
+      stats = dict(self._stats)
+      stats["chains"] = len(self._chains)
+      return stats
@@ -0,0 +1,94 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# This file implements the lookup of precomputed predicted delays. Predicted
+# delays of a train depend only on the month and weekday of the queried date,
+# so they are computed offline for all trains, months and weekdays by
+# "build_prediction_table.py" and served here by a dict lookup.
+#
+
+from tde_prediction import (get_modified_date_month_week_tuple,
+                            get_station_result_dict)
+
+from util import log
+
+def get_prediction_table(pdr, mdl, n, nn):
+  """
+  Returns the PredictionTable of the mdl and n, None if the table was built
+  with a different mdl, n or nn (as its predictions then differ from the live
+  ones of the passed mdl, n and nn), after logging the error.
+
+  Args:
+    pdr <PickleDataReader>: A pickle data reader object.
+    mdl <str>: "rfr" for Random Forest Regressor models.
+    n <int>: N in N-OMLMPF.
+    nn <int>: Number of nearest neighbours.
+  """
+  table_dict = pdr.get_tde_prediction_table_dict(mdl, n)
+  table_settings = (table_dict.get("mdl"), table_dict.get("n"),
+                    table_dict.get("nn"))
+  if table_settings != (mdl, n, nn):
+    log.ERROR("Prediction table is built with (mdl, n, nn): %s, not %s as the "
+              "live predictions, hence it is not used. Rebuild it by "
+              "build_prediction_table.py" % (table_settings, (mdl, n, nn)))
+    return None
+  return PredictionTable(table_dict)
+
+class PredictionTable(object):
+  def __init__(self, table_dict):
+    """
+    Args:
+      table_dict <dict>: A precomputed prediction table dict returned by
+                         `PickleDataReader.get_tde_prediction_table_dict()`.
+    """
+    self._month_index = dict(
+        (month, i) for i, month in enumerate(table_dict["months"]))
+    self._weekday_index = dict(
+        (weekday, i) for i, weekday in enumerate(table_dict["weekdays"]))
+    self._trains = table_dict["trains"]
+    log.INFO("Prediction table of %s trains loaded" % len(self._trains))
+
+  def get_late_mins_at_stns_dict(self, train_num, month, weekday):
+    """
+    Returns a dict of inline station codes vs predicted late minutes of the
+    train for the month and weekday, None if it is not in the table.
+
+    Args:
+      train_num <str>: A five digit train number e.g. "12307".
+      month <str>: A month e.g. "Jul".
+      weekday <str>: A weekday e.g. "Sunday".
+    """
+    train_table = self._trains.get(train_num)
+    if (train_table is None or month not in self._month_index or
+        weekday not in self._weekday_index):
+      return None
+    late_mins = train_table["late_mins"][
+        self._month_index[month], self._weekday_index[weekday]]
+    return dict((stn, float(lms))
+                for stn, lms in zip(train_table["stations"], late_mins))
+
+  def get_delay(self, train_num, date, station=None):
+    """
+    Returns the same dict as `TDEPrediction.get_delay()` from the table, None
+    if the train's predictions are not in the table. Returns the error dict if
+    the date is not valid e.g. "2018-02-30".
+
+    Args:
+      train_num <str>: A five digit train number e.g. "12307".
+      date <str>: A date in "YYYY-MM-DD" format e.g. "2018-07-08".
+      station <str>: A station code, e.g. "CNB".
+    """
+    try:
+      _, month, weekday = get_modified_date_month_week_tuple(date)
+    except Exception as e:
+      log.ERROR("Date: %s is not valid, Error type: %s, Error message: %s"
+                % (date, type(e), str(e)))
+      return {"Error": "Date %s not correct" % date, "Result": None}
+    lms_at_stns_dict = self.get_late_mins_at_stns_dict(train_num, month, weekday)
+    if lms_at_stns_dict is None:
+      log.INFO("Train: %s, Month: %s, Weekday: %s not in prediction table"
+               % (train_num, month, weekday))
+      return None
+    return get_station_result_dict(lms_at_stns_dict, train_num, station)
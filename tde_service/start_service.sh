@@ -0,0 +1,25 @@
+#!/bin/bash
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Desc: Starts the TDE Service under gunicorn with multiple worker processes
+#       (refer "gunicorn_conf.py"), serving the memory mapped compact models.
+#
+#       Usage: ./start_service.sh [extra gunicorn options]
+#       e.g. TDE_SERVICE_WORKERS=8 ./start_service.sh
+#
+#       The compact models and their archive are to be created first, from
+#       code directory execute:
+#       python export_compact_models.py rfr 1
+#       python create_model_archive.py build rfr 1 compact
+#
+
+cd "$(dirname "$0")"
+
+export TDE_MODEL_FORMAT=${TDE_MODEL_FORMAT:-compact}
+export TDE_HOT_STATIONS=${TDE_HOT_STATIONS:-all}
+export TDE_WARM_UP_IN_BACKGROUND=0
+
+exec gunicorn -c gunicorn_conf.py "$@" app:app
@@ -10,20 +10,210 @@ import env
 
 from datetime import datetime
 
+import time
+
 from code.utilities.tt_utils import TrainingTestUtils as TTU
 
 from util import log
 
+MONTH_DICT = {"01": "Jan", "02": "Feb", "03": "Mar", "04": "Apr",
+              "05": "May", "06": "Jun", "07": "Jul", "08": "Aug",
+              "09": "Sep", "10": "Oct", "11": "Nov", "12": "Dec"}
+WEEK_DICT = {0: "Monday", 1: "Tuesday", 2: "Wednesday", 3: "Thursday",
+             4: "Friday", 5: "Saturday", 6: "Sunday"}
+# Model, N in N-OMLMPF and number of nearest neighbours of the live predictions
+# by default, the prediction table served along must be built with the same.
+DEFAULT_MDL = "rfr"
+DEFAULT_N = 2
+DEFAULT_NN = 10
+# Minimum number of trees a station is predicted with under a deadline.
+MIN_DEADLINE_TREES = 10
+# Number of trees the first station is predicted with under a deadline, if the
+# time per tree is not known yet, to measure it for the next stations.
+PROBE_DEADLINE_TREES = 50
+
+# Time (seconds) per tree per station measured by the last TreeBudget, used as
+# the initial estimate by the next one.
+_SECS_PER_TREE = {"estimate": None}
+
+def get_modified_date_month_week_tuple(date):
+  """
+  Returns the month and weekday from the date.
+
+  Args:
+    date <str>: A valid date in "YYYY-MM-DD" in string format.
+                e.g. "2018-08-09".
+
+  Returns:
+    (str, str, str) i.e. (modified_date, month, weekday)
+  """
+  date = date.split("-")  #"2018-08-09" -> ['2018', '08', '09']
+  weekday = WEEK_DICT[
+      datetime(int(date[0]), int(date[1]), int(date[2])).date().weekday()]
+  month = MONTH_DICT[date[1]]
+  mod_date = date[2]+" "+month+" "+date[0]
+  log.INFO("Modified Date: %s, Month: %s, Weekday: %s"
+           % (mod_date, month, weekday))
+  return (mod_date, month, weekday)
+
+def get_stns_with_n_mdls_dict(pdr, nps_list=[1]):
+  """
+  Returns a dict of "<n>ps" keys vs list of stations having n-prev-stns models,
+  to be passed as STNS_WITH_N_MDLS to `TDEPrediction.get_delay()`.
+
+  Args:
+    pdr <PickleDataReader>: A pickle data reader object.
+    nps_list <[int]>: Values of n for which models are to be used. One can add
+                      more deeper models one may have tried e.g. [1, 2].
+  """
+  return dict(("%sps" % nps, pdr.get_stations_having_nps_model_list(nps=nps))
+              for nps in nps_list)
+
+def get_station_result_dict(lms_at_stns_dict, train_num, station=None):
+  """
+  Returns the result dict of the predicted late minutes at all the inline
+  stations of the train, or only at the queried station if it is passed.
+
+  Args:
+    lms_at_stns_dict <dict>: A dict of station codes as keys and predicted late
+                             minutes as values.
+    train_num <str>: A five digit train number e.g. "12307".
+    station <str>: A station code, e.g. "CNB".
+
+  Returns:
+    dict: {"Error": <None> or <str>, "Result": <dict> or <None>}
+  """
+  ret = {"Error": None, "Result": None}
+  if station:
+    try:
+      ret["Result"] = {station: lms_at_stns_dict[station]}
+    except Exception as e:
+      log.ERROR("Error occurred for train: %s, Error type: %s, "
+                "Error message: %s" % (train_num, type(e), str(e)))
+      ret["Error"] = ("Queried station: %s not found along the journey of "
+                      "train: %s. It may be because of the stale journey "
+                      "information of train: %s in database."
+                      % (station, train_num, train_num))
+      ret["Result"] = None
+    return ret
+
+  ret["Result"] = lms_at_stns_dict
+  return ret
+
+class TreeBudget(object):
+
+  def __init__(self, max_trees=None, deadline_secs=None):
+    """
+    Budget of the number of trees of the RFR models with which the stations of
+    a journey are predicted, one after the other. Predicting with the first k
+    trees of a model is cheaper, and less accurate (refer
+    "code/tree_budget_rmse.py").
+
+    Args:
+      max_trees <int>: Maximum number of trees per station, None for all.
+      deadline_secs <float>: Seconds (from now) within which all the stations
+                             are to be predicted, None for no deadline. Each
+                             station gets an equal share of the remaining time,
+                             converted to trees by the time per tree measured
+                             on the stations predicted so far (or by the last
+                             TreeBudget, before the first station).
+    """
+    self._max_trees = max_trees
+    self._deadline = (time.time() + deadline_secs
+                      if deadline_secs is not None else None)
+    self._trees_used = [] # Number of trees each station was predicted with.
+    self._secs = 0.0 # Total time taken to predict the stations.
+
+  def get_max_trees(self, num_stations_left):
+    """
+    Returns the number of trees to predict the next station with, None for all.
+
+    Args:
+      num_stations_left <int>: Number of stations yet to be predicted,
+                               including the next one.
+    """
+    if self._deadline is None:
+      return self._max_trees
+    secs_per_tree = (self._secs / sum(self._trees_used) if self._trees_used
+                     else _SECS_PER_TREE["estimate"])
+    if secs_per_tree is None:
+      trees = PROBE_DEADLINE_TREES
+    else:
+      trees = int((self._deadline - time.time()) / num_stations_left /
+                  secs_per_tree)
+    trees = max(MIN_DEADLINE_TREES, trees)
+    return trees if self._max_trees is None else min(trees, self._max_trees)
+
+  def add_prediction(self, trees_used, secs):
+    """
+    Records a station's prediction.
+
+    Args:
+      trees_used <int>: Number of trees the station was predicted with.
+      secs <float>: Time taken to predict the station.
+    """
+    self._trees_used.append(trees_used)
+    self._secs += secs
+    _SECS_PER_TREE["estimate"] = self._secs / sum(self._trees_used)
+
+  def get_min_trees_used(self):
+    """
+    Returns the minimum number of trees any station was predicted with, None if
+    no station has been predicted.
+    """
+    return min(self._trees_used) if self._trees_used else None
+
 class TDEPrediction(object):
-  def __init__(self):
-    self._ttu = TTU()
+  def __init__(self, prefix_cache=None, ttu=None, single_flight=None):
+    """
+    Args:
+      prefix_cache <PredictionPrefixCache>: Cache of the predicted chains of
+          delays shared by the TDEPrediction objects, None for no caching.
+          Refer "prediction_prefix_cache.py".
+      ttu <TrainingTestUtils>: The TrainingTestUtils object to predict with,
+                               default a new one.
+      single_flight <SingleFlight>: If passed, the concurrent predictions of
+          the same chain of delays are coalesced into one. Refer
+          "util/single_flight.py".
+    """
+    self._ttu = ttu if ttu is not None else TTU(model_format=env.MODEL_FORMAT)
+    self._prefix_cache = prefix_cache
+    self._single_flight = single_flight
     self._cdr = self._ttu._cdr
     self._tdfu = self._ttu._tdfu
-    self._month_dict = {"01": "Jan", "02": "Feb", "03": "Mar", "04": "Apr",
-                        "05": "May", "06": "Jun", "07": "Jul", "08": "Aug",
-                        "09": "Sep", "10": "Oct", "11": "Nov", "12": "Dec"}
-    self._week_dict = {0: "Monday", 1: "Tuesday", 2: "Wednesday", 3: "Thursday",
-                       4: "Friday", 5: "Saturday", 6: "Sunday"}
+    self._month_dict = MONTH_DICT
+    self._week_dict = WEEK_DICT
+
+  def warm_up(self, STNS_WITH_N_MDLS, hot_stations=None, train_num=None,
+              nn=DEFAULT_NN, mdl=DEFAULT_MDL):
+    """
+    Loads the nearest neighbours table, the models of the hot stations and
+    predicts the delays of a train once (which loads the rest of the metadata
+    used in prediction), so that the requests thereafter do not load them.
+
+    Args:
+      STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
+                               n-prev-stns models.
+      hot_stations <[str]>: Station codes whose models are to be loaded, None
+                            for all the stations having models.
+      train_num <str>: A five digit train number e.g. "12307", None to not
+                       predict.
+      nn <int>: Number of nearest neighbours to be considered if the current
+                station does not have n-prev-station models.
+      mdl <str>: "rfr" for Random Forest Regressor models.
+    """
+    start_time = time.time()
+    self._ttu._get_nearest_neighbors_table_dict(nn)
+    if hot_stations is None:
+      self._ttu._model_cache.set_bounds(max_models=None)
+    for nps, stns in STNS_WITH_N_MDLS.items():
+      if hot_stations is not None:
+        stns = [stn for stn in hot_stations if stn in stns]
+      self._ttu.preload_station_models(stns, int(nps[:-2]), mdl)
+    if train_num is not None:
+      self.get_delay(STNS_WITH_N_MDLS, train_num, str(datetime.now().date()),
+                     nn=nn, mdl=mdl)
+    log.INFO("Warmed up in %s seconds" % (time.time() - start_time))
 
   def _get_modified_date_month_week_tuple(self, date):
     """
@@ -36,14 +226,7 @@ class TDEPrediction(object):
     Returns:
       (str, str, str) i.e. (modified_date, month, weekday)
     """
-    date = date.split("-")  #"2018-08-09" -> ['2018', '08', '09']
-    weekday = self._week_dict[
-        datetime(int(date[0]), int(date[1]), int(date[2])).date().weekday()]
-    month = self._month_dict[date[1]]
-    mod_date = date[2]+" "+month+" "+date[0]
-    log.INFO("Modified Date: %s, Month: %s, Weekday: %s"
-             % (mod_date, month, weekday))
-    return (mod_date, month, weekday)
+    return get_modified_date_month_week_tuple(date)
 
   def _get_trains_modified_journey_dataframe(self, train_num, date):
     """
@@ -52,20 +235,31 @@ class TDEPrediction(object):
 
     Args:
       train_num <str>: A five digit train number e.g. "12307".
+      date <str>: A date in "YYYY-MM-DD" format e.g. "2018-07-08".
     """
-    # TODO: Save some time here by having an updated latest journey dataframe.
-    # Get the train's all journey data frame.
-    train_df = self._cdr.get_train_complete_journey_df(train_num)
-    # Extract the latest single journey data frame.
-    source_rows = train_df[train_df.scharr == "Source"].index.tolist()
-    train_latest_sj_df = self._tdfu._generate_single_journey_df(
-        train_df, len(source_rows)-1, source_rows)
+    return self._get_trains_journey_dataframe_of_month_weekday(
+        train_num, *self._get_modified_date_month_week_tuple(date))
+
+  def _get_trains_journey_dataframe_of_month_weekday(
+      self, train_num, mod_date, month, weekday):
+    """
+    Returns the latest journey dataframe of the train `train_num` with its
+    date, month and weekday columns set to the passed ones.
+
+    Args:
+      train_num <str>: A five digit train number e.g. "12307".
+      mod_date <str>: A modified date e.g. "08 Jul 2018".
+      month <str>: A month e.g. "Jul".
+      weekday <str>: A weekday e.g. "Sunday".
+    """
+    # Get the latest single journey data frame directly by the train's journey
+    # index, without parsing the train's all journey data.
+    train_latest_sj_df = self._cdr.get_train_latest_journey_df(train_num)
     num_rows_sj_df = train_latest_sj_df.shape[0]
 
     # TODO: Get a more accurate dateframe by incorporating actual previous dates
     # to the current queried date for a train which takes muliple days to
     # complete its journey. "day" column of dataframe might help.
-    mod_date, month, weekday = self._get_modified_date_month_week_tuple(date)
     mod_date = [mod_date for _ in xrange(num_rows_sj_df)]
     month = [month for _ in xrange(num_rows_sj_df)]
     weekday = [weekday for _ in xrange(num_rows_sj_df)]
@@ -84,10 +278,18 @@ class TDEPrediction(object):
     log.INFO("Train: %s single journey dataframe modified" % train_num)
     return train_latest_sj_df
 
-  def get_delay(self, STNS_WITH_N_MDLS, train_num, date, station=None, nn=10,
-                mdl="rfr", n=2):
+  def get_delay(self, STNS_WITH_N_MDLS, train_num, date, station=None,
+                nn=DEFAULT_NN, mdl=DEFAULT_MDL, n=DEFAULT_N, max_trees=None,
+                deadline_secs=None, get_admitted=None):
     """
     Gets the delay for train `train_num` at station `station` on date `date`.
+    If a station is passed, the delays are predicted only up to it. If a
+    prefix cache is set (and no tree budget is passed), the prediction resumes
+    from the delays cached for the train, month, weekday and inline stations,
+    and the delays predicted up to the first station whose prediction failed
+    are cached. If single flight is set (and no tree budget is passed), a
+    request waits for the same chain being predicted by another request and
+    resumes from it.
 
     Args:
       STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
@@ -100,6 +302,18 @@ class TDEPrediction(object):
                 station does not have n-prev-station models.
       mdl <str>: "rfr" for Random Forest Regressor models.
       n <int>: N in N-OMLMPF i.e. number of previous station to consider.
+      max_trees <int>: Maximum number of trees of the models to predict each
+                       station with, None for all. Refer `TreeBudget`.
+      deadline_secs <float>: Seconds within which the prediction should be
+                             done, by predicting with fewer trees if required.
+                             None for no deadline. Refer `TreeBudget`.
+      get_admitted <function>: If passed, the stations left to predict are
+                               predicted by get_admitted(func) (refer
+                               "app.py"), i.e. only the requests which predict
+                               (not the ones waiting for the same chain in
+                               flight, or served by the prefix cache) are
+                               admitted. AdmissionRejected raised by it is
+                               raised (also to the requests waiting for it).
 
     Returns:
       dict:
@@ -108,12 +322,16 @@ class TDEPrediction(object):
         "Error": <None> or <str: Error Message>,
         "Result": <dict: A dict of station_codes as keys and predicted late
                   minutes as values.
+        "TreesUsed": <int: Minimum number of trees any station was predicted
+                     with>, present only if max_trees or deadline_secs is passed.
       }
     """
     # Get the train's journey information.
     ret = {"Error": None, "Result": None}
     try:
-      train_sj_df = self._get_trains_modified_journey_dataframe(train_num, date)
+      mod_date, month, weekday = self._get_modified_date_month_week_tuple(date)
+      train_sj_df = self._get_trains_journey_dataframe_of_month_weekday(
+          train_num, mod_date, month, weekday)
     except Exception as e:
       log.ERROR("Error occurred for train: %s, Error type: %s, Error message: %s"
                 % (train_num, type(e), str(e)))
@@ -121,12 +339,201 @@ class TDEPrediction(object):
       return ret
 
     inline_stns = train_sj_df["station_code"].tolist()
+    num_stns = len(inline_stns)
+    if station:
+      # Predict up to the (last occurrence of) queried station, none if it is
+      # not along the journey.
+      num_stns = (len(inline_stns) - inline_stns[::-1].index(station)
+                  if station in inline_stns else 0)
+
+    # The inline stations identify the journey, which may change on updating
+    # the journey data of the train.
+    chain_key = (train_num, month, weekday, n, mdl, nn, tuple(inline_stns))
+    tree_budget, lms_at_stns = None, [0]
+    if max_trees is not None or deadline_secs is not None:
+      tree_budget = TreeBudget(max_trees, deadline_secs)
+    elif self._prefix_cache is not None and num_stns:
+      lms_at_stns = (self._prefix_cache.get_prefix_list(chain_key, num_stns)
+                     or lms_at_stns)
+
+    def get_chain_tuple(lms_at_stns, failed_indices=()):
+      # Returns the chain extended from lms_at_stns and the indices of its
+      # stations whose prediction failed, along with the passed ones.
+      failed_indices = list(failed_indices)
+      lms_at_stns = self._get_late_mins_at_inline_stations_list(
+          STNS_WITH_N_MDLS, train_num, train_sj_df, nn, mdl, n, tree_budget,
+          num_stns, lms_at_stns, failed_indices)
+      return lms_at_stns, failed_indices
+
+    def get_admitted_chain_tuple(lms_at_stns, failed_indices=()):
+      # Same as get_chain_tuple(), admitted only if there are stations left.
+      if get_admitted is None or len(lms_at_stns) >= num_stns:
+        return get_chain_tuple(lms_at_stns, failed_indices)
+      return get_admitted(lambda: get_chain_tuple(lms_at_stns, failed_indices))
+
+    if (tree_budget is None and self._single_flight is not None and
+        len(lms_at_stns) < num_stns):
+      # The chain predicted by the request in flight may end before the queried
+      # station, hence it is extended if required.
+      lms_at_stns, failed_indices = get_admitted_chain_tuple(
+          *self._single_flight.do(
+              chain_key, lambda: get_admitted_chain_tuple(lms_at_stns)))
+    else:
+      lms_at_stns, failed_indices = get_admitted_chain_tuple(lms_at_stns)
+    if tree_budget is None and self._prefix_cache is not None and num_stns:
+      # The late minutes set on a failed prediction are not cached, so that the
+      # next query predicts them again.
+      self._prefix_cache.put_prefix(
+          chain_key, lms_at_stns[:min(failed_indices or [num_stns])])
+
+    lms_at_stns_dict = {} # Store the predicted late minutes in a dict.
+    for index in range(num_stns):
+      lms_at_stns_dict[inline_stns[index]] = lms_at_stns[index]
+    ret = get_station_result_dict(lms_at_stns_dict, train_num, station)
+    if tree_budget is not None:
+      ret["TreesUsed"] = tree_budget.get_min_trees_used()
+    return ret
+
+  def get_delay_of_month_weekday(self, STNS_WITH_N_MDLS, train_num, month,
+                                 weekday, nn=DEFAULT_NN, mdl=DEFAULT_MDL,
+                                 n=DEFAULT_N):
+    """
+    Gets the delay for train `train_num` at all its inline stations for a
+    journey in the passed month and weekday. Delays predicted by `get_delay()`
+    depend only on the month and weekday of the queried date.
+
+    Args:
+      STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
+                               n-prev-stns models.
+      train_num <str>: A five digit train number e.g. "12307".
+      month <str>: A month e.g. "Jul".
+      weekday <str>: A weekday e.g. "Sunday".
+      nn <int>: Number of nearest neighbour to be considered if the current
+                station does not have n-prev-station models.
+      mdl <str>: "rfr" for Random Forest Regressor models.
+      n <int>: N in N-OMLMPF i.e. number of previous station to consider.
+
+    Returns:
+      dict: Same as returned by `get_delay()` when no station is passed.
+    """
+    ret = {"Error": None, "Result": None}
+    try:
+      # The date columns are not features of N-OMLMPF, so any date of the month
+      # is fine as the modified date.
+      train_sj_df = self._get_trains_journey_dataframe_of_month_weekday(
+          train_num, "01 "+month+" 2018", month, weekday)
+    except Exception as e:
+      log.ERROR("Error occurred for train: %s, Error type: %s, Error message: %s"
+                % (train_num, type(e), str(e)))
+      ret["Error"] = str(e)
+      return ret
+
+    ret["Result"] = self._get_late_mins_at_inline_stations_dict(
+        STNS_WITH_N_MDLS, train_num, train_sj_df, nn, mdl, n)
+    return ret
+
+  def _get_predicted_late_mins_float(self, train_num, train_sj_df, index, k,
+                                     stn, lms_at_stns, mdl, row_builder,
+                                     tree_budget, num_stns):
+    """
+    Returns the predicted late minutes at the station at index of the journey,
+    by the k previous station model of stn, within the tree budget if passed.
+
+    Args:
+      train_num <str>: A five digit train number e.g. "12307".
+      train_sj_df <pandas.DataFrame>: The train's modified journey dataframe.
+      index <int>: Index of the current station in the journey.
+      k <int>: Number of previous stations of the model.
+      stn <str>: Station code whose model is used, the current station or its
+                 nearest neighbour.
+      lms_at_stns <list>: Predicted late minutes at the previous stations.
+      mdl <str>: "rfr" for Random Forest Regressor models.
+      row_builder <JourneyRowBuilder>: Row builder of the journey.
+      tree_budget <TreeBudget>: Budget of trees, None for all the trees.
+      num_stns <int>: Number of stations from the source to be predicted.
+    """
+    if tree_budget is None:
+      return self._ttu.get_predicted_late_mins_at_station_float(
+          train_num, train_sj_df, index, k, stn, lms_at_stns, index, mdl,
+          row_builder)
+
+    # Load the model (if not in cache) before timing, so that the time per tree
+    # is of prediction only.
+    num_trees = self._ttu.get_station_model_num_trees(stn, k, mdl)
+    start_time = time.time()
+    max_trees = tree_budget.get_max_trees(num_stns - index)
+    plm = self._ttu.get_predicted_late_mins_at_station_float(
+        train_num, train_sj_df, index, k, stn, lms_at_stns, index, mdl,
+        row_builder, max_trees)
+    tree_budget.add_prediction(min(max_trees or num_trees, num_trees),
+                               time.time() - start_time)
+    return plm
+
+  def _get_late_mins_at_inline_stations_dict(
+      self, STNS_WITH_N_MDLS, train_num, train_sj_df, nn, mdl, n):
+    """
+    Returns a dict of inline station codes as keys and their predicted late
+    minutes as values, predicted by N-OMLMPF on the train's journey dataframe.
+
+    Args:
+      STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
+                               n-prev-stns models.
+      train_num <str>: A five digit train number e.g. "12307".
+      train_sj_df <pandas.DataFrame>: The train's modified journey dataframe.
+      nn <int>: Number of nearest neighbour to be considered if the current
+                station does not have n-prev-station models.
+      mdl <str>: "rfr" for Random Forest Regressor models.
+      n <int>: N in N-OMLMPF i.e. number of previous station to consider.
+    """
+    inline_stns = train_sj_df["station_code"].tolist()
+    lms_at_stns = self._get_late_mins_at_inline_stations_list(
+        STNS_WITH_N_MDLS, train_num, train_sj_df, nn, mdl, n)
+    lms_at_stns_dict = {} # Store the predicted late minutes in a dict.
+    for index in range(len(inline_stns)):
+      lms_at_stns_dict[inline_stns[index]] = lms_at_stns[index]
+    return lms_at_stns_dict
+
+  def _get_late_mins_at_inline_stations_list(
+      self, STNS_WITH_N_MDLS, train_num, train_sj_df, nn, mdl, n,
+      tree_budget=None, num_stns=None, lms_at_stns=None, failed_indices=None):
+    """
+    Returns a list of predicted late minutes at the first num_stns inline
+    stations, predicted by N-OMLMPF on the train's journey dataframe. If the
+    late minutes predicted at the first few stations are passed, the
+    prediction resumes from the station next to them.
+
+    Args:
+      STNS_WITH_N_MDLS <dict>: A dict having values as list of stations with
+                               n-prev-stns models.
+      train_num <str>: A five digit train number e.g. "12307".
+      train_sj_df <pandas.DataFrame>: The train's modified journey dataframe.
+      nn <int>: Number of nearest neighbour to be considered if the current
+                station does not have n-prev-station models.
+      mdl <str>: "rfr" for Random Forest Regressor models.
+      n <int>: N in N-OMLMPF i.e. number of previous station to consider.
+      tree_budget <TreeBudget>: Budget of trees to predict the stations with,
+                                None for all the trees.
+      num_stns <int>: Number of stations from the source to predict, None for
+                      all the inline stations.
+      lms_at_stns <list>: Predicted late minutes at the first few stations to
+                          resume from, None to start from the source.
+      failed_indices <list>: If passed, the indices of the stations whose
+                             prediction failed (hence set as the late minutes
+                             at their previous station) are appended to it.
+    """
+    inline_stns = train_sj_df["station_code"].tolist()
+    if num_stns is None:
+      num_stns = len(inline_stns)
     # Store the predicted late minutes at inline stations in a list.
-    lms_at_stns = [0]
+    lms_at_stns = list(lms_at_stns) if lms_at_stns else [0]
+    if len(lms_at_stns) >= num_stns:
+      return lms_at_stns
+    row_builder = self._ttu.get_journey_row_builder(train_num, train_sj_df)
+    # Late minutes at the previous station, set as the late minutes at the
+    # current station if its prediction fails.
+    plm = lms_at_stns[-1]
 
-    for index in range(1, len(inline_stns)):
-      # TODO: In case a station is given, can we exit the for loop, once late
-      # minutes for the queried station is predicted?
+    for index in range(len(lms_at_stns), num_stns):
       stn = inline_stns[index]
       try:
         if (index == 1 or n == 1): # Valid for only 1 previous station.
@@ -141,63 +548,52 @@ class TDEPrediction(object):
           # with no models, `stn` would be the nearest neighbour station, however
           # the `index` would make sure that the row data frame is calculated for
           # the correct current station.
-          plm = self._ttu.get_predicted_late_mins_at_station_float(
-              train_num, train_sj_df, index, 1, stn, lms_at_stns, index, mdl)
+          plm = self._get_predicted_late_mins_float(
+              train_num, train_sj_df, index, 1, stn, lms_at_stns, mdl,
+              row_builder, tree_budget, num_stns)
           lms_at_stns.append(plm)
           continue
 
         if (index == 2 or n == 2): # Valid for only 2 previous stations.
           if stn not in STNS_WITH_N_MDLS["2ps"]:
             stn = self._ttu.get_station_nearest_neighbors_list(stn, 2, nn)[0]
-          plm = self._ttu.get_predicted_late_mins_at_station_float(
-              train_num, train_sj_df, index, 2, stn, lms_at_stns, index, mdl)
+          plm = self._get_predicted_late_mins_float(
+              train_num, train_sj_df, index, 2, stn, lms_at_stns, mdl,
+              row_builder, tree_budget, num_stns)
           lms_at_stns.append(plm)
           continue
 
         if (index == 3 or n == 3): # Valid for only 3 previous stations.
           if stn not in STNS_WITH_N_MDLS["3ps"]:
             stn = self._ttu.get_station_nearest_neighbors_list(stn, 3, nn)[0]
-          plm = self._ttu.get_predicted_late_mins_at_station_float(
-              train_num, train_sj_df, index, 3, stn, lms_at_stns, index, mdl)
+          plm = self._get_predicted_late_mins_float(
+              train_num, train_sj_df, index, 3, stn, lms_at_stns, mdl,
+              row_builder, tree_budget, num_stns)
           lms_at_stns.append(plm)
           continue
 
         if (index == 4 or n == 4): # Valid for only 4 previous stations.
           if stn not in STNS_WITH_N_MDLS["4ps"]:
             stn = self._ttu.get_station_nearest_neighbors_list(stn, 4, nn)[0]
-          plm = self._ttu.get_predicted_late_mins_at_station_float(
-              train_num, train_sj_df, index, 4, stn, lms_at_stns, index, mdl)
+          plm = self._get_predicted_late_mins_float(
+              train_num, train_sj_df, index, 4, stn, lms_at_stns, mdl,
+              row_builder, tree_budget, num_stns)
           lms_at_stns.append(plm)
           continue
 
         if (index == 5 or n == 5): # Valid for only 5 previous stations.
           if stn not in STNS_WITH_N_MDLS["5ps"]:
             stn = self._ttu.get_station_nearest_neighbors_list(stn, 5, nn)[0]
-          plm = self._ttu.get_predicted_late_mins_at_station_float(
-              train_num, train_sj_df, index, 5, stn, lms_at_stns, index, mdl)
+          plm = self._get_predicted_late_mins_float(
+              train_num, train_sj_df, index, 5, stn, lms_at_stns, mdl,
+              row_builder, tree_budget, num_stns)
           lms_at_stns.append(plm)
 
       except Exception as e:
         log.WARN("Error occurred for train: %s, Error type: %s, Error message: %s"
                  % (train_num, type(e), str(e)))
+        if failed_indices is not None:
+          failed_indices.append(index)
         lms_at_stns.append(plm)
 
-    lms_at_stns_dict = {} # Store the predicted late minutes in a dict.
-    for index in range(len(inline_stns)):
-      lms_at_stns_dict[inline_stns[index]] = lms_at_stns[index]
-
-    if station:
-      try:
-        ret["Result"] = {station: lms_at_stns_dict[station]}
-      except Exception as e:
-        log.ERROR("Error occurred for train: %s, Error type: %s, "
-                  "Error message: %s" % (train_num, type(e), str(e)))
-        ret["Error"] = ("Queried station: %s not found along the journey of "
-                        "train: %s. It may be because of the stale journey "
-                        "information of train: %s in database."
-                        % (station, train_num, train_num))
-        ret["Result"] = None
-      return ret
-
-    ret["Result"] = lms_at_stns_dict
-    return ret
+    return lms_at_stns
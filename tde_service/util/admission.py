@@ -0,0 +1,108 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Admission control of the requests. At most a fixed number of requests are let
+# in at once, the ones arriving meanwhile wait in a bounded queue, and the ones
+# arriving when the queue is full (or waiting too long in it) are rejected at
+# once, instead of all of them slowing down each other.
+#
+
+import threading
+import time
+
+from contextlib import contextmanager
+
+# Error message of the requests rejected by admission control.
+OVERLOADED_ERROR = "Service is overloaded, please retry later."
+
+class AdmissionRejected(Exception):
+  pass
+
+class AdmissionController(object):
+  def __init__(self, max_concurrency, max_queue, max_wait_secs=None):
+    """
+    Args:
+      max_concurrency <int>: Maximum number of requests let in at once.
+      max_queue <int>: Maximum number of requests waiting to be let in.
+      max_wait_secs <float>: Maximum seconds a request waits in queue before
+                             being rejected, None for no limit.
+    """
+    self._max_concurrency = max_concurrency
+    self._max_queue = max_queue
+    self._max_wait_secs = max_wait_secs
+    self._cond = threading.Condition(threading.Lock())
+    self._running = 0
+    self._queued = 0
+    self._stats = {"admitted": 0, "rejected": 0, "timed_out": 0,
+                   "max_queued": 0, "wait_secs": 0.0, "max_wait_secs": 0.0}
+
+  def acquire(self):
+    """
+    Lets the request in, after waiting in queue if required. Raises
+    AdmissionRejected if the queue is full or the wait times out.
+    """
+    start_time = time.time()
+    with self._cond:
+      if self._running >= self._max_concurrency or self._queued:
+        if self._queued >= self._max_queue:
+          self._stats["rejected"] += 1
+          raise AdmissionRejected("Admission queue is full.")
+        self._queued += 1
+        self._stats["max_queued"] = max(self._stats["max_queued"], self._queued)
+        try:
+          while self._running >= self._max_concurrency:
+            wait_secs = None
+            if self._max_wait_secs is not None:
+              wait_secs = start_time + self._max_wait_secs - time.time()
+              if wait_secs <= 0:
+                self._stats["rejected"] += 1
+                self._stats["timed_out"] += 1
+                raise AdmissionRejected("Timed out waiting in admission queue.")
+            self._cond.wait(wait_secs)
+        finally:
+          self._queued -= 1
+
+      self._running += 1
+      wait_secs = time.time() - start_time
+      self._stats["admitted"] += 1
+      self._stats["wait_secs"] += wait_secs
+      self._stats["max_wait_secs"] = max(self._stats["max_wait_secs"],
+                                         wait_secs)
+
+  def release(self):
+    """
+    Lets the next request in queue in, to be called once a request is done.
+    """
+    with self._cond:
+      self._running -= 1
+      self._cond.notify()
+
+  @contextmanager
+  def admitted(self):
+    """
+    Context manager which lets the request in for its duration, refer
+    `acquire()`.
+    """
+    self.acquire()
+    try:
+      yield
+    finally:
+      self.release()
+
+  def get_stats_dict(self):
+    """
+    Returns a dict of the limits, number of requests running and queued now,
+    maximum queued so far, number of requests admitted, rejected and timed out
+    (included in rejected), and the mean and maximum wait (in seconds) of the
+    admitted requests.
+    """
+    with self._cond:
+      stats = dict(self._stats)
+      stats["mean_wait_secs"] = (stats.pop("wait_secs") /
+                                 max(1, stats["admitted"]))
+      stats.update({"max_concurrency": self._max_concurrency,
+                    "max_queue": self._max_queue, "running": self._running,
+                    "queued": self._queued})
+      return stats
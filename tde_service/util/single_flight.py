@@ -0,0 +1,71 @@
+#
+# Train Delay Estimation Project
+#
+# Author: Ramashish Gaurav
+#
+# Coalescing of concurrent identical computations. The first caller of a key
+# computes it, while the callers of the same key arriving meanwhile wait for it
+# and share its result (or exception) instead of computing it again.
+#
+
+import threading
+
+class _Call(object):
+  def __init__(self):
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+class SingleFlight(object):
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._calls = {} # Key vs its _Call in flight.
+    self._stats = {"calls": 0, "executions": 0, "deduplicated": 0}
+
+  def do(self, key, func):
+    """
+    Returns the result of func(), called only if no call of the key is in
+    flight, else the result of the call in flight. Raises the exception raised
+    by func() in either case.
+
+    Args:
+      key <tuple>: Key of the computation, e.g. (train_num, month, weekday).
+      func <function>: Function without arguments which computes the result.
+    """
+    with self._lock:
+      self._stats["calls"] += 1
+      call = self._calls.get(key)
+      is_leader = call is None
+      if is_leader:
+        call = _Call()
+        self._calls[key] = call
+        self._stats["executions"] += 1
+      else:
+        self._stats["deduplicated"] += 1
+
+    if not is_leader:
+      call.done.wait()
+      if call.error is not None:
+        raise call.error
+      return call.result
+
+    try:
+      call.result = func()
+    except Exception as e:
+      call.error = e
+      raise
+    finally:
+      with self._lock:
+        del self._calls[key]
+      call.done.set()
+    return call.result
+
+  def get_stats_dict(self):
+    """
+    Returns a dict of number of calls, executions of func, calls deduplicated
+    (i.e. which shared the result of a call in flight) and keys in flight.
+    """
+    with self._lock:
+      stats = dict(self._stats)
+      stats["in_flight"] = len(self._calls)
+      return stats